@@ -0,0 +1,165 @@
+"""Precomputed plays-like adjustment tables shared by every shot recommender.
+
+The condition model is evaluated once over a grid of
+distance x elevation x headwind x crosswind x temperature x humidity and
+saved as a ``.npy`` file. Workers memory-map that file on first use and answer
+lookups with vectorized multilinear interpolation, so a batch of shots costs
+a single gather. Inputs outside the grid are clamped to its edges.
+
+Units: distances and elevation in yards, wind in m/s, temperature in degrees C,
+humidity in percent. Wind direction follows the weather feed (the direction
+the wind blows *from*), measured against the compass bearing of the shot.
+"""
+import math
+import os
+import tempfile
+
+import numpy as np
+
+TABLE_PATH = os.getenv('ADJUSTMENT_TABLE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'adjustments.npy'))
+
+REFERENCE_TEMPERATURE = 21.0   # degrees C (70F), the conditions club distances are quoted for
+REFERENCE_HUMIDITY = 50.0      # percent
+
+# Condition model, applied to the shot distance
+ELEVATION_FACTOR = 1.0         # yards of plays-like per yard of rise
+HEADWIND_FACTOR = 0.022        # fraction longer per m/s into the wind (~1% per mph)
+TAILWIND_FACTOR = 0.011        # fraction shorter per m/s downwind (~0.5% per mph)
+CROSSWIND_FACTOR = 0.011       # fraction of distance drifted sideways per m/s
+TEMPERATURE_FACTOR = 0.0018    # fraction shorter per degree C above reference (1% per 10F)
+HUMIDITY_FACTOR = 0.00005      # fraction shorter per percent humidity above reference
+
+# Grid axes as (start, stop, step); the model is multilinear between grid lines
+AXES = (
+    ('distance', 0.0, 400.0, 25.0),
+    ('elevation', -40.0, 40.0, 10.0),
+    ('headwind', -20.0, 20.0, 5.0),
+    ('crosswind', -20.0, 20.0, 10.0),
+    ('temperature', -10.0, 40.0, 10.0),
+    ('humidity', 0.0, 100.0, 50.0),
+)
+OUTPUTS = ('plays_like', 'drift')
+
+_START = np.array([axis[1] for axis in AXES])
+_STOP = np.array([axis[2] for axis in AXES])
+_STEP = np.array([axis[3] for axis in AXES])
+SHAPE = tuple(int(round((stop - start) / step)) + 1 for _, start, stop, step in AXES) + (len(OUTPUTS),)
+
+_table = None
+
+
+def model(distance, elevation, headwind, crosswind, temperature, humidity):
+    """Evaluate the condition model directly; used to build the table."""
+    wind = np.where(headwind >= 0, HEADWIND_FACTOR * headwind, TAILWIND_FACTOR * headwind)
+    air = (1.0 - TEMPERATURE_FACTOR * (temperature - REFERENCE_TEMPERATURE)) \
+        * (1.0 - HUMIDITY_FACTOR * (humidity - REFERENCE_HUMIDITY))
+    plays_like = distance * (1.0 + wind) * air + ELEVATION_FACTOR * elevation
+    drift = distance * CROSSWIND_FACTOR * crosswind
+    return plays_like, drift
+
+
+def build_table():
+    """Evaluate the model at every grid point."""
+    grids = np.meshgrid(
+        *[np.linspace(start, stop, size) for (_, start, stop, _), size in zip(AXES, SHAPE)],
+        indexing='ij'
+    )
+    plays_like, drift = model(*grids)
+    return np.stack([plays_like, drift], axis=-1)
+
+
+def save_table(path=TABLE_PATH):
+    """Build the table and atomically write it to ``path``."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, build_table())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_table(path=TABLE_PATH):
+    """Return the memory-mapped table, building the file first if it is missing or stale."""
+    global _table
+    if _table is None:
+        table = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+        if table is None or table.shape != SHAPE:
+            save_table(path)
+            table = np.load(path, mmap_mode='r')
+        _table = table
+    return _table
+
+
+def plays_like(distance, elevation_change=0.0, headwind=0.0, crosswind=0.0,
+               temperature=REFERENCE_TEMPERATURE, humidity=REFERENCE_HUMIDITY):
+    """Return ``(plays_like_distance, drift)`` for scalars or arrays of shots.
+
+    All arguments broadcast against each other; positive drift is to the right.
+    """
+    values = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in
+                                   (distance, elevation_change, headwind, crosswind, temperature, humidity)])
+    shape = values[0].shape
+    points = np.stack([v.ravel() for v in values], axis=-1)
+
+    position = (np.clip(points, _START, _STOP) - _START) / _STEP
+    lower = np.minimum(position.astype(np.intp), np.array(SHAPE[:-1]) - 2)
+    weight = position - lower
+
+    # Gather the surrounding 2**6 corners in one fancy-index and blend them axis by axis
+    n_axes = len(AXES)
+    index = []
+    for axis in range(n_axes):
+        offsets = np.arange(2).reshape((1,) + (1,) * axis + (2,) + (1,) * (n_axes - axis - 1))
+        index.append(lower[:, axis].reshape((-1,) + (1,) * n_axes) + offsets)
+    corners = load_table()[tuple(index)]
+    for axis in range(n_axes):
+        w = weight[:, axis].reshape((-1,) + (1,) * (n_axes - axis))
+        corners = corners[:, 0] * (1.0 - w) + corners[:, 1] * w
+
+    result = corners.reshape(shape + (len(OUTPUTS),))
+    if not shape:
+        return float(result[0]), float(result[1])
+    return result[..., 0], result[..., 1]
+
+
+def wind_components(wind_speed, wind_direction, shot_bearing=0.0):
+    """Split a wind (direction it blows *from*) into headwind and crosswind.
+
+    Positive headwind blows against the shot; positive crosswind pushes it right.
+    """
+    angle = math.radians(wind_direction - shot_bearing)
+    return wind_speed * math.cos(angle), -wind_speed * math.sin(angle)
+
+
+def adjust(distance, elevation_change=0.0, wind_speed=0.0, wind_direction=0.0, shot_bearing=0.0,
+           temperature=REFERENCE_TEMPERATURE, humidity=REFERENCE_HUMIDITY):
+    """Return ``(plays_like_distance, drift)`` for a shot given raw weather readings."""
+    headwind, crosswind = wind_components(wind_speed, wind_direction, shot_bearing)
+    return plays_like(distance, elevation_change, headwind, crosswind, temperature, humidity)
+
+
+def effects(distance, elevation_change=0.0, headwind=0.0, crosswind=0.0,
+            temperature=REFERENCE_TEMPERATURE, humidity=REFERENCE_HUMIDITY):
+    """Break the plays-like change into per-condition effects with a single lookup."""
+    ref_t, ref_h = REFERENCE_TEMPERATURE, REFERENCE_HUMIDITY
+    scenarios = np.array([
+        (elevation_change, headwind, crosswind, temperature, humidity),
+        (elevation_change, 0.0, 0.0, ref_t, ref_h),
+        (0.0, headwind, crosswind, ref_t, ref_h),
+        (0.0, 0.0, 0.0, temperature, ref_h),
+        (0.0, 0.0, 0.0, ref_t, humidity),
+    ])
+    distances, drifts = plays_like(distance, *scenarios.T)
+    changes = distances - distance
+    return {
+        "plays_like_distance": float(distances[0]),
+        "drift": float(drifts[0]),
+        "elevation_effect": float(changes[1]),
+        "wind_effect": float(changes[2]),
+        "temperature_effect": float(changes[3]),
+        "humidity_effect": float(changes[4]),
+    }
+
+
+if __name__ == '__main__':
+    print(f"Wrote adjustment table to {save_table()}")
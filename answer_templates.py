@@ -0,0 +1,105 @@
+"""Deterministic answers for common distance questions, without the LLM.
+
+Facts the plugin already computed (object name, position, course, distance)
+are rendered through preformatted templates in microseconds. :func:`choose`
+routes a request: ``template`` and ``llm`` force a path, ``auto`` keeps the
+template unless the caller's question asks for something beyond restating the
+lookup. :data:`stats` keeps per-path request counts and latencies.
+"""
+import collections
+import re
+import threading
+import time
+
+from live_round import distance_and_bearing
+
+TEMPLATE, LLM = 'template', 'llm'
+MODES = ('auto', TEMPLATE, LLM)
+
+TEMPLATES = {
+    'closest_object': (
+        "The closest object to {latitude:.5f}, {longitude:.5f} is {name} on {course}, "
+        "{yards:.0f} yards away (at {object_latitude:.5f}, {object_longitude:.5f})."
+    ),
+}
+
+# Questions the closest-object facts answer directly, unless they also ask for judgement
+_DISTANCE_QUESTION = re.compile(r"\b(closest|nearest|how far|distance|how many yards|yardage)\b", re.IGNORECASE)
+_REASONING = re.compile(r"\b(should|why|recommend|advice|advise|strategy|compare|better|club|if)\b", re.IGNORECASE)
+
+
+def choose(mode='auto', question=None):
+    """Pick the response path for a request."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if mode != 'auto':
+        return mode
+    if not question or (_DISTANCE_QUESTION.search(question) and not _REASONING.search(question)):
+        return TEMPLATE
+    return LLM
+
+
+def closest_object(latitude, longitude, name, object_latitude, object_longitude, course):
+    """One-sentence answer naming the closest object and its great-circle distance in yards."""
+    yards, _ = distance_and_bearing(latitude, longitude, object_latitude, object_longitude)
+    return TEMPLATES['closest_object'].format(
+        latitude=latitude, longitude=longitude, name=name, course=course, yards=yards,
+        object_latitude=object_latitude, object_longitude=object_longitude,
+    )
+
+
+class PathStats:
+    """Request counts and recent latencies per response path."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._counts = collections.Counter()
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, path, seconds):
+        with self._lock:
+            self._counts[path] += 1
+            self._latencies[path].append(seconds)
+
+    def timed(self, path):
+        """Context manager recording the duration of the block under ``path``."""
+        return _Timer(self, path)
+
+    def snapshot(self):
+        """``{path: {count, mean_ms, p50_ms, p95_ms, max_ms}}`` over the last ``window`` requests per path."""
+        with self._lock:
+            samples = {path: sorted(latencies) for path, latencies in self._latencies.items()}
+            counts = dict(self._counts)
+        report = {}
+        for path, values in samples.items():
+            report[path] = {
+                "count": counts[path],
+                "mean_ms": round(1000 * sum(values) / len(values), 3),
+                "p50_ms": round(1000 * values[len(values) // 2], 3),
+                "p95_ms": round(1000 * values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max_ms": round(1000 * values[-1], 3),
+            }
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._latencies.clear()
+
+
+class _Timer:
+    def __init__(self, stats, path):
+        self.stats, self.path = stats, path
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        self.stats.record(self.path, self.seconds)
+        return False
+
+
+stats = PathStats()
@@ -1,29 +1,39 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_from_directory, stream_with_context
+import logging
 import os, sqlite3
+import json_provider
+import profile_cache
+import response_compression
+
+# Heavy modules (numpy via adjustments/functional, pyarrow via shot_export,
+# requests via functional) are imported inside the views that need them so
+# that worker start-up only pays for Flask itself.
 
-app = Flask(__name__)
 DB_PATH = 'golfers.db'
+LOCATIONS_DB_PATH = 'optimized_data.db'
+LOG_FILE = 'debug_recommend_shot.log'
 
-app = Flask(__name__)
+core_bp = Blueprint('core', __name__)
+profiles_bp = Blueprint('profiles', __name__)
+shots_bp = Blueprint('shots', __name__)
+courses_bp = Blueprint('courses', __name__)
+tracking_bp = Blueprint('tracking', __name__)
 
 # Route for favicon
-@app.route('/favicon.ico')
+@core_bp.route('/favicon.ico')
 def favicon():
-    return send_from_directory(os.path.join(app.root_path, 'static'), 'favicon.ico', mimetype='image/vnd.microsoft.icon')
+    return send_from_directory(os.path.join(current_app.root_path, 'static'), 'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
-@app.route('/')
+@core_bp.route('/')
 def home():
     return "Welcome to CaddyGPT!"
 
-if __name__ == "__main__":
-    app.run(debug=True)
-
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(current_app.config['DATABASE'])
     conn.row_factory = sqlite3.Row
     return conn
 
-@app.route('/create_profile', methods=['POST'])
+@profiles_bp.route('/create_profile', methods=['POST'])
 def create_profile():
     data = request.json
     name = data.get("name")
@@ -39,23 +49,54 @@ def create_profile():
         golfer_id = cursor.lastrowid
 
         # Insert clubs
-        for club in clubs:
-            cursor.execute(
-                """
-                INSERT INTO clubs (golfer_id, club_name, carry_distance, rollout_distance, dispersion_radius)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (golfer_id, club['club_name'], club['carry_distance'], club['rollout_distance'], club['dispersion_radius'])
-            )
+        upsert_clubs(conn, golfer_id, clubs)
 
         conn.commit()
+        profile_cache.invalidate(email)
         return jsonify({"message": "Profile created successfully", "golfer_id": golfer_id}), 201
     except sqlite3.IntegrityError:
         return jsonify({"error": "Email already exists"}), 400
     finally:
         conn.close()
 
-@app.route('/update_profile', methods=['PUT'])
+CLUB_FIELDS = ('carry_distance', 'rollout_distance', 'dispersion_radius')
+
+
+def upsert_clubs(conn, golfer_id, clubs):
+    """Make the golfer's bag match ``clubs`` touching only rows that differ.
+
+    Rows are keyed on ``(golfer_id, club_name)`` so unchanged clubs keep their
+    ids. Runs inside the caller's transaction and returns the club names that
+    were added, updated and removed.
+    """
+    existing = {
+        row['club_name']: tuple(row[field] for field in CLUB_FIELDS)
+        for row in conn.execute(
+            "SELECT club_name, carry_distance, rollout_distance, dispersion_radius FROM clubs WHERE golfer_id = ?",
+            (golfer_id,)
+        )
+    }
+    wanted = {club['club_name']: tuple(float(club[field]) for field in CLUB_FIELDS) for club in clubs}
+
+    added = [name for name in wanted if name not in existing]
+    updated = [name for name in wanted if name in existing and wanted[name] != existing[name]]
+    removed = [name for name in existing if name not in wanted]
+
+    conn.executemany(
+        """
+        INSERT INTO clubs (golfer_id, club_name, carry_distance, rollout_distance, dispersion_radius)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (golfer_id, club_name) DO UPDATE SET
+            carry_distance = excluded.carry_distance,
+            rollout_distance = excluded.rollout_distance,
+            dispersion_radius = excluded.dispersion_radius
+        """,
+        [(golfer_id, name) + wanted[name] for name in added + updated]
+    )
+    conn.executemany("DELETE FROM clubs WHERE golfer_id = ? AND club_name = ?", [(golfer_id, name) for name in removed])
+    return {"added": added, "updated": updated, "removed": removed}
+
+@profiles_bp.route('/update_profile', methods=['PUT'])
 def update_profile():
     data = request.json
     email = data.get("email")
@@ -73,56 +114,57 @@ def update_profile():
 
         golfer_id = golfer['id']
 
-        # Delete existing clubs
-        cursor.execute("DELETE FROM clubs WHERE golfer_id = ?", (golfer_id,))
-
-        # Insert updated clubs
-        for club in clubs:
-            cursor.execute(
-                """
-                INSERT INTO clubs (golfer_id, club_name, carry_distance, rollout_distance, dispersion_radius)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (golfer_id, club['club_name'], club['carry_distance'], club['rollout_distance'], club['dispersion_radius'])
-            )
+        # Write only the clubs that were added, changed or removed
+        changes = upsert_clubs(conn, golfer_id, clubs)
+        if any(changes.values()):
+            profile_cache.bump_version(conn, golfer_id)
 
         conn.commit()
-        return jsonify({"message": "Profile updated successfully"}), 200
+        if any(changes.values()):
+            profile_cache.invalidate(email)
+        return jsonify({"message": "Profile updated successfully", "changes": changes}), 200
     finally:
         conn.close()
 
-@app.route('/get_profile', methods=['GET'])
+@profiles_bp.route('/get_profile', methods=['GET'])
 def get_profile():
     email = request.args.get("email")
 
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
 
-        # Get golfer profile
-        cursor.execute("SELECT * FROM golfer_profiles WHERE email = ?", (email,))
-        golfer = cursor.fetchone()
-        if not golfer:
+        # Golfer and clubs in one query; unchanged profiles are served from the cache
+        cached = profile_cache.get(conn, email, current_app.config['DATABASE'])
+        if cached is None:
             return jsonify({"error": "Golfer profile not found"}), 404
 
-        # Get clubs
-        cursor.execute("SELECT * FROM clubs WHERE golfer_id = ?", (golfer['id'],))
-        clubs = cursor.fetchall()
-
-        return jsonify({
-            "golfer": dict(golfer),
-            "clubs": [dict(club) for club in clubs]
-        }), 200
+        etag, body = cached
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
     finally:
         conn.close()
 
-@app.route('/recommend_shot', methods=['POST'])
+@shots_bp.route('/recommend_shot', methods=['POST'])
 def recommend_shot():
     data = request.json
+    # ShotRecommendations.js sends the full golfer profile and course position
+    if "golfer_profile" in data:
+        return recommend_shot_from_profile(data)
+
     golfer_id = data.get("golfer_id")
     target_distance = data.get("target_distance")
-    elevation_change = data.get("elevation_change", 0)
+    elevation_change = data.get("elevation_change")
     wind_speed = data.get("wind_speed", 0)
+    if elevation_change is None:
+        positions = [data.get(key) for key in ("latitude", "longitude", "target_latitude", "target_longitude")]
+        if None in positions:
+            elevation_change = 0
+        else:
+            import elevation
+
+            elevation_change = elevation.elevation_change(*positions)
 
     try:
         conn = get_db_connection()
@@ -132,10 +174,13 @@ def recommend_shot():
         cursor.execute("SELECT * FROM clubs WHERE golfer_id = ?", (golfer_id,))
         clubs = cursor.fetchall()
 
-        # Calculate adjusted distance
-        elevation_adjustment = elevation_change * 0.3
-        wind_adjustment = wind_speed * 0.5
-        adjusted_distance = target_distance + elevation_adjustment - wind_adjustment
+        import adjustments
+
+        # Calculate adjusted distance from the shared plays-like tables
+        # (wind_speed here is the helping wind along the shot line)
+        adjusted_distance, _ = adjustments.plays_like(
+            target_distance, elevation_change, headwind=-wind_speed
+        )
 
         # Find best club
         best_club = None
@@ -156,34 +201,39 @@ def recommend_shot():
     finally:
         conn.close()
 
-if __name__ == '__main__':
-    app.run(debug=True)
-
-
-# Import necessary functions from functional.py
-from functional import get_courses_from_db, handle_kml_upload
-
-@app.route('/get_courses', methods=['GET'])
-def get_courses():
-    try:
-        # Simplified test: Return static data
-        test_data = [
-            {"name": "Test Course 1", "location": "Location A"},
-            {"name": "Test Course 2", "location": "Location B"},
-            {"name": "Test Course 3", "location": "Location C"}
-        ]
-        return jsonify({"success": True, "courses": test_data})
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+@courses_bp.route('/get_courses', methods=['GET'])
 def get_courses():
+    from functional import get_courses_from_db
+
     try:
-        # Query the database for available courses
-        courses = get_courses_from_db("SELECT * FROM courses")
-        return jsonify({"success": True, "courses": courses})
+        # Query the database for available courses, optionally filtered by name
+        courses = get_courses_from_db(request.args.get("query", ""), current_app.config['DATABASE'])
+        # Tag the catalog so clients can revalidate and the compressed copy is reused
+        response = jsonify({"success": True, "courses": courses})
+        response.add_etag()
+        response.cache_control.public = True
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/upload_kml', methods=['POST'])
+@courses_bp.route('/hole_distances', methods=['GET'])
+def hole_distances():
+    import green_distances
+
+    course = request.args.get("course")
+    hole = request.args.get("hole", type=int)
+    # Repeat latitude/longitude to get yardages for several positions in one call
+    latitudes = request.args.getlist("latitude", type=float)
+    longitudes = request.args.getlist("longitude", type=float)
+    if not course or hole is None or not latitudes or len(latitudes) != len(longitudes):
+        return jsonify({"error": "course, hole and matching latitude/longitude values are required"}), 400
+
+    distances = green_distances.load(current_app.config['LOCATIONS_DATABASE']).distances(course, hole, latitudes, longitudes)
+    if distances is None:
+        return jsonify({"error": "Hole not found in course map"}), 404
+    return jsonify({"course": course, "hole": hole, "distances": distances}), 200
+
+@courses_bp.route('/upload_kml', methods=['POST'])
 def upload_kml():
     if 'kml_file' not in request.files:
         return jsonify({"success": False, "error": "No file provided"}), 400
@@ -192,39 +242,65 @@ def upload_kml():
     if kml_file.filename == '':
         return jsonify({"success": False, "error": "Empty file name"}), 400
 
+    from functional import handle_kml_upload
+    import geofence
+
     try:
         # Use the handle_kml_upload function to process the file
-        result = handle_kml_upload(kml_file)
+        # Pass course_id to update a course imported before instead of adding a new one
+        result = handle_kml_upload(kml_file, current_app.config['DATABASE'], request.form.get('course_id', type=int))
+        geofence.invalidate(current_app.config['DATABASE'])
         return jsonify({"success": True, "message": "KML file uploaded successfully", "details": result})
+    except LookupError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/get_clubs', methods=['GET'])
+@courses_bp.route('/bulk_upload_kml', methods=['POST'])
+def bulk_upload_kml():
+    files = [f for f in request.files.getlist('kml_files') if f.filename]
+    if not files:
+        return jsonify({"success": False, "error": "No files provided"}), 400
+
+    import geofence
+    import kml_bulk_import
+
+    documents = (document for f in files for document in kml_bulk_import.file_documents(f.filename, f.stream))
+    conn = get_db_connection()
+    try:
+        # Parse in-process by default. A configured pool must not fork this worker, which would copy
+        # its threads (weather refresher) mid-request; the CPU-wide fan-out is for the CLI.
+        stats = kml_bulk_import.bulk_import(conn, documents, current_app.config['KML_IMPORT_WORKERS'],
+                                            start_method=kml_bulk_import.SERVER_START_METHOD)
+        geofence.invalidate(current_app.config['DATABASE'])
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        conn.close()
+    return jsonify({"success": True, "details": stats})
+
+@profiles_bp.route('/get_clubs', methods=['GET'])
 def get_clubs():
     try:
         # Query the database for clubs (example query)
         connection = get_db_connection()
-        clubs = connection.execute("SELECT * FROM clubs").fetchall()
+        clubs = connection.execute("SELECT club_name, carry_distance, rollout_distance, dispersion_radius FROM clubs").fetchall()
         connection.close()
 
         # Format the response
-        clubs_list = [{"club_name": club["club_name"], "carry": club["carry"], "run": club["run"], "dispersion": club["dispersion"]} for club in clubs]
+        clubs_list = [{"club_name": club["club_name"], "carry": club["carry_distance"], "run": club["rollout_distance"], "dispersion": club["dispersion_radius"]} for club in clubs]
         return jsonify({"success": True, "clubs": clubs_list})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# Weather-aware recommendation for requests that carry the golfer's profile
+def recommend_shot_from_profile(input_data):
+    import functional
 
-import logging
-
-# Configure logging to write debug information to a file
-logging.basicConfig(filename='debug_recommend_shot.log', level=logging.DEBUG, format='%(asctime)s - %(message)s')
-
-@app.route('/recommend_shot', methods=['POST'])
-def recommend_shot_endpoint():
     try:
-        # Parse input JSON data
-        input_data = request.get_json()
         logging.debug("Input Data Received: %s", input_data)
 
         golfer_profile = input_data["golfer_profile"]
@@ -234,30 +310,61 @@ def recommend_shot_endpoint():
         logging.debug("Parsed Golfer Profile: %s", golfer_profile)
         logging.debug("Parsed Course Details: %s", course_details)
 
-        # Fetch weather data
-        weather = get_weather(lat, lon)
+        # Without an explicit target, play to the middle of the green from the golfer's position
+        green = None
+        target = None
+        if "course" in course_details and "hole" in course_details:
+            import green_distances
+
+            course_map = green_distances.load(current_app.config['LOCATIONS_DATABASE'])
+            if "target_distance" not in course_details:
+                distances = course_map.distances(course_details["course"], course_details["hole"], lat, lon)
+                if not distances or distances[0]["middle"] is None:
+                    return jsonify({"success": False, "error": "Green not found in course map"}), 404
+                green = distances[0]
+                course_details = dict(course_details, target_distance=green["middle"])
+            target = course_map.green_center(course_details["course"], course_details["hole"])
+        if "target_latitude" in course_details and "target_longitude" in course_details:
+            target = (course_details["target_latitude"], course_details["target_longitude"])
+
+        # Clients rarely know the rise to the target; read it from the local elevation model
+        if "elevation_change" not in course_details and target is not None:
+            import elevation
+
+            course_details = dict(course_details, elevation_change=elevation.elevation_change(lat, lon, *target))
+
+        # Weather for the course, kept warm in memory by the background refresher
+        import weather_cache
+
+        weather = weather_cache.get(lat, lon)
         logging.debug("Weather Data Fetched: %s", weather)
 
         if "error" in weather:
+            # No reading at all, not even a stale one: fail fast rather than wait on the feed
             error_msg = "Failed to fetch weather data: " + weather["error"]
             logging.debug("Error: %s", error_msg)
-            return jsonify({"success": False, "error": error_msg}), 500
+            return jsonify({"success": False, "error": error_msg}), 503
 
         # Get shot recommendation using enhanced logic
-        recommendation = recommend_shot(golfer_profile, weather, course_details)
+        recommendation = functional.recommend_shot(golfer_profile, weather, course_details)
         logging.debug("Shot Recommendation: %s", recommendation)
 
         if "error" in recommendation:
             logging.debug("Recommendation Error: %s", recommendation["error"])
             return jsonify({"success": False, "error": recommendation["error"]}), 400
 
+        if green is not None:
+            recommendation["green_distances"] = green
+        if weather.get("stale"):
+            # Served from the last known good reading while the weather feed is down
+            recommendation["weather_fallback"] = {"stale": True, "age_seconds": weather["age_seconds"]}
         return jsonify(recommendation)
     except Exception as e:
         logging.debug("Exception Occurred: %s", str(e))
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route('/track_shot', methods=['POST'])
+@shots_bp.route('/track_shot', methods=['POST'])
 def track_shot():
     data = request.json
     golfer_id = data.get("golfer_id")
@@ -283,7 +390,7 @@ def track_shot():
     finally:
         conn.close()
 
-@app.route('/get_shot_history', methods=['GET'])
+@shots_bp.route('/get_shot_history', methods=['GET'])
 def get_shot_history():
     golfer_id = request.args.get("golfer_id")
 
@@ -295,8 +402,102 @@ def get_shot_history():
         cursor.execute("SELECT * FROM shot_tracking WHERE golfer_id = ?", (golfer_id,))
         shots = cursor.fetchall()
 
-        return jsonify({"shots": [dict(shot) for shot in shots]}), 200
+        return jsonify({"shots": shots}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
         conn.close()
+
+@shots_bp.route('/export_shot_history', methods=['GET'])
+def export_shot_history():
+    import shot_export
+
+    golfer_ids = request.args.getlist("golfer_id", type=int)
+    club_names = request.args.getlist("club")
+    since = request.args.get("since")
+    until = request.args.get("until")
+
+    try:
+        fmt = shot_export.resolve_format(request.args.get("format", "auto"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        conn = get_db_connection()
+        try:
+            yield from shot_export.stream_shots(
+                conn, fmt,
+                golfer_ids=golfer_ids, club_names=club_names, since=since, until=until
+            )
+        finally:
+            conn.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=shot_export.CONTENT_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=shot_history.{fmt}"}
+    )
+
+
+@tracking_bp.route('/track_positions', methods=['POST'])
+def track_positions():
+    import gps_tracking
+
+    data = request.json
+    points = data.get("points", [])
+
+    try:
+        conn = get_db_connection()
+        # One transaction per batch, however many golfers it covers
+        result = gps_tracking.ingest(conn, points, data.get("course"), current_app.config['DATABASE'])
+        conn.commit()
+        return jsonify(result), 201
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid position batch: {e}"}), 400
+    finally:
+        conn.close()
+
+@tracking_bp.route('/latest_position', methods=['GET'])
+def latest_position():
+    import gps_tracking
+
+    golfer_id = request.args.get("golfer_id", type=int)
+    conn = get_db_connection()
+    try:
+        position = gps_tracking.latest_position(conn, golfer_id)
+    finally:
+        conn.close()
+    if position is None:
+        return jsonify({"error": "No position recorded for golfer"}), 404
+    return jsonify(position), 200
+
+
+def create_app(config=None):
+    """Application factory: build a configured app with every blueprint registered."""
+    app = Flask(__name__)
+    app.json = json_provider.FastJSONProvider(app)
+    app.config.update(DATABASE=DB_PATH, LOCATIONS_DATABASE=LOCATIONS_DB_PATH, LOG_FILE=LOG_FILE,
+                      KML_IMPORT_WORKERS=int(os.getenv('KML_IMPORT_WORKERS', 0)))
+    app.config.update(config or {})
+
+    if app.config['LOG_FILE']:
+        # Configure logging to write debug information to a file
+        logging.basicConfig(filename=app.config['LOG_FILE'], level=logging.DEBUG, format='%(asctime)s - %(message)s')
+
+    for blueprint in (core_bp, profiles_bp, shots_bp, courses_bp, tracking_bp):
+        app.register_blueprint(blueprint)
+    response_compression.init_app(app)
+    return app
+
+
+def __getattr__(name):
+    # Keeps `gunicorn app:app` and `from app import app` working; built on first access
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    create_app().run(debug=True)
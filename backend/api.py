@@ -1,27 +1,26 @@
 
 from flask import Flask, jsonify, request
 from database_connection import db, courses, holes
+import hole_planner
+import json_provider
+import profile_cache
+import response_compression
 
 app = Flask(__name__)
+app.json = json_provider.FastJSONProvider(app)
+response_compression.init_app(app)
 
 # List all golf courses with latitude and longitude for map plotting
 @app.route('/api/courses', methods=['GET'])
 def get_courses():
     try:
-        query = db.execute("SELECT id, name, location, latitude, longitude, par, yardage FROM courses")
-        courses_list = [
-            {
-                "id": row[0],
-                "name": row[1],
-                "location": row[2],
-                "latitude": row[3],
-                "longitude": row[4],
-                "par": row[5],
-                "yardage": row[6],
-            }
-            for row in query.fetchall()
-        ]
-        return jsonify(courses_list), 200
+        cursor = db.execute("SELECT id, name, location, latitude, longitude, par, yardage FROM courses")
+        columns = [column[0] for column in cursor.description]
+        courses_list = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        response = jsonify(courses_list)
+        response.add_etag()
+        response.cache_control.public = True
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -61,11 +60,51 @@ def get_course_details(course_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Plan every hole of a course for a golfer's bag
+@app.route('/api/course/<int:course_id>/plan', methods=['GET'])
+def get_course_plan(course_id):
+    golfer_id = request.args.get("golfer_id", type=int)
+    if golfer_id is None:
+        return jsonify({"error": "golfer_id is required"}), 400
+    try:
+        holes_query = db.execute(
+            "SELECT hole_number, par, yardage FROM holes WHERE course_id = ? ORDER BY hole_number",
+            (course_id,),
+        )
+        holes_list = [
+            {"hole_number": row[0], "par": row[1], "yardage": row[2]}
+            for row in holes_query.fetchall()
+        ]
+        if not holes_list:
+            return jsonify({"error": "Course not found"}), 404
+
+        clubs_query = db.execute(
+            "SELECT club_name, carry_distance, rollout_distance, dispersion_radius FROM clubs WHERE golfer_id = ?",
+            (golfer_id,),
+        )
+        clubs_list = [
+            {
+                "club_name": row[0],
+                "carry_distance": row[1],
+                "rollout_distance": row[2],
+                "dispersion_radius": row[3],
+            }
+            for row in clubs_query.fetchall()
+        ]
+        if not clubs_list:
+            return jsonify({"error": "No clubs found for golfer"}), 404
+
+        plan = hole_planner.plan_course(clubs_list, holes_list)
+        plan["course_id"] = course_id
+        return jsonify(plan), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Retrieve user clubs for "My Profile"
 @app.route('/get_clubs', methods=['GET'])
 def get_clubs():
     try:
-        query = db.execute("SELECT id, name, carry, run, dispersion FROM clubs")
+        query = db.execute("SELECT id, club_name, carry_distance, rollout_distance, dispersion_radius FROM clubs")
         clubs_list = [
             {
                 "id": row[0],
@@ -88,10 +127,13 @@ def update_clubs():
         db.execute("DELETE FROM clubs")  # Clear existing clubs (simplified for example)
         for club in clubs:
             db.execute(
-                "INSERT INTO clubs (name, carry, run, dispersion) VALUES (?, ?, ?, ?)",
+                "INSERT INTO clubs (club_name, carry_distance, rollout_distance, dispersion_radius) VALUES (?, ?, ?, ?)",
                 (club["name"], club["carry"], club["run"], club["dispersion"]),
             )
+        # The clubs here are not scoped to a golfer, so every cached profile is stale
+        profile_cache.bump_version(db)
         db.commit()
+        profile_cache.invalidate()
         return jsonify({"message": "Clubs updated successfully!"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
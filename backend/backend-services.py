@@ -31,24 +31,35 @@ class ShotRecommendationSchema(Schema):
     """Validation schema for shot recommendations."""
     golfer_id = fields.Int(required=True)
     target_distance = fields.Float(required=True)
-    elevation_change = fields.Float(missing=0)
+    elevation_change = fields.Float(allow_none=True)
+    latitude = fields.Float()
+    longitude = fields.Float()
+    target_latitude = fields.Float()
+    target_longitude = fields.Float()
     wind_speed = fields.Float(missing=0)
     wind_direction = fields.Float(missing=0)
 
 # services/caching.py
 from functools import wraps
 from typing import Optional, Any, Callable
-import redis
 import json
 import os
 from datetime import timedelta
 
-redis_client = redis.Redis(
-    host=os.getenv('REDIS_HOST', 'localhost'),
-    port=int(os.getenv('REDIS_PORT', 6379)),
-    db=0,
-    decode_responses=True
-)
+_redis_client = None
+
+def get_redis():
+    """Create the Redis client on first use; importing redis is deferred until then."""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            db=0,
+            decode_responses=True
+        )
+    return _redis_client
 
 class CacheService:
     @staticmethod
@@ -68,7 +79,7 @@ class CacheService:
                 cache_key = CacheService.cache_key(func.__name__, *args, **kwargs)
                 
                 # Try to get from cache
-                cached_value = redis_client.get(cache_key)
+                cached_value = get_redis().get(cache_key)
                 if cached_value:
                     return json.loads(cached_value)
                 
@@ -76,7 +87,7 @@ class CacheService:
                 result = await func(*args, **kwargs)
                 
                 # Cache the result
-                redis_client.setex(
+                get_redis().setex(
                     cache_key,
                     timedelta(seconds=ttl),
                     json.dumps(result)
@@ -89,9 +100,9 @@ class CacheService:
     @staticmethod
     def invalidate_pattern(pattern: str) -> None:
         """Invalidate all keys matching pattern."""
-        keys = redis_client.keys(pattern)
+        keys = get_redis().keys(pattern)
         if keys:
-            redis_client.delete(*keys)
+            get_redis().delete(*keys)
 
 # services/error_handling.py
 from typing import Dict, Any, Optional
@@ -206,13 +217,21 @@ class DatabaseService:
 # services/shot_recommendation.py
 from typing import Dict, Any, Optional
 from .caching import CacheService
-from validation.schemas import ShotRecommendationSchema
-import math
+import adjustments
+import elevation
 
 class ShotRecommendationService:
     def __init__(self, db_service: DatabaseService):
         self.db = db_service
-        self.validation_schema = ShotRecommendationSchema()
+        self._validation_schema = None
+
+    @property
+    def validation_schema(self):
+        # marshmallow is imported on the first validated request, not at start-up
+        if self._validation_schema is None:
+            from validation.schemas import ShotRecommendationSchema
+            self._validation_schema = ShotRecommendationSchema()
+        return self._validation_schema
 
     @CacheService.cache(ttl=60)  # Cache for 1 minute
     async def recommend_shot(self, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -233,12 +252,13 @@ class ShotRecommendationService:
                 raise DataValidationError("No clubs found for golfer")
 
             # Calculate adjusted distance based on conditions
-            adjusted_distance = self._calculate_adjusted_distance(
+            conditions = self._calculate_conditions(
                 data['target_distance'],
-                data.get('elevation_change', 0),
+                self._elevation_change(data),
                 data.get('wind_speed', 0),
                 data.get('wind_direction', 0)
             )
+            adjusted_distance = conditions['plays_like_distance']
 
             # Find best club
             recommended_club = self._find_best_club(clubs, adjusted_distance)
@@ -250,8 +270,9 @@ class ShotRecommendationService:
                 'total_distance': recommended_club['carry_distance'] + recommended_club['rollout_distance'],
                 'dispersion_radius': recommended_club['dispersion_radius'],
                 'conditions': {
-                    'elevation_effect': data.get('elevation_change', 0) * 0.1,
-                    'wind_effect': data.get('wind_speed', 0) * 0.2
+                    'elevation_effect': conditions['elevation_effect'],
+                    'wind_effect': conditions['wind_effect'],
+                    'aim_offset': -conditions['drift']
                 }
             }
 
@@ -259,21 +280,25 @@ class ShotRecommendationService:
             logger.error(f"Shot recommendation error: {str(e)}")
             raise DatabaseError("Failed to generate shot recommendation", e)
 
-    def _calculate_adjusted_distance(
+    def _elevation_change(self, data: Dict[str, Any]) -> float:
+        """Client-supplied elevation change, else the rise between the given positions from the local DEM."""
+        if data.get('elevation_change') is not None:
+            return data['elevation_change']
+        positions = [data.get(key) for key in ('latitude', 'longitude', 'target_latitude', 'target_longitude')]
+        if None in positions:
+            return 0.0
+        return elevation.elevation_change(*positions)
+
+    def _calculate_conditions(
         self,
         target_distance: float,
         elevation_change: float,
         wind_speed: float,
         wind_direction: float
-    ) -> float:
-        """Calculate distance adjusted for conditions."""
-        # Adjust for elevation (rough approximation)
-        elevation_effect = elevation_change * 0.1
-        
-        # Adjust for wind (rough approximation)
-        wind_effect = wind_speed * 0.2 * math.cos(math.radians(wind_direction))
-        
-        return target_distance - elevation_effect - wind_effect
+    ) -> Dict[str, float]:
+        """Look up the plays-like distance and per-condition effects."""
+        headwind, crosswind = adjustments.wind_components(wind_speed, wind_direction)
+        return adjustments.effects(target_distance, elevation_change, headwind, crosswind)
 
     def _find_best_club(
         self,
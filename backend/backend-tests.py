@@ -168,6 +168,69 @@ def test_database_transaction(app):
                                 ('transaction@test.com',))
         assert len(result) == 1
 
+# tests/test_shot_export.py
+import io
+import numpy as np
+import shot_export
+
+SHOT_TRACKING_SQL = """
+    CREATE TABLE shot_tracking (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        golfer_id INTEGER NOT NULL,
+        club_name TEXT NOT NULL,
+        distance REAL NOT NULL,
+        accuracy REAL NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+def test_export_shot_history_round_trips(tmp_path):
+    """Test that Arrow and npz exports decode back to the stored rows."""
+    pa = pytest.importorskip('pyarrow')
+
+    db = sqlite3.connect(str(tmp_path / 'export.db'))
+    db.execute(SHOT_TRACKING_SQL)
+    db.executemany("INSERT INTO shot_tracking (golfer_id, club_name, distance, accuracy, timestamp) VALUES (?, ?, ?, ?, ?)",
+                   [(1 + i % 3, ('7 Iron', 'Driver')[i % 2], 100.0 + i, 0.5, '2024-05-01 10:00:00') for i in range(50)])
+    db.commit()
+    expected = db.execute("SELECT id, golfer_id, club_name, distance FROM shot_tracking WHERE golfer_id = 2 ORDER BY id").fetchall()
+
+    arrow = b''.join(shot_export.stream_shots(db, 'arrow', chunk_size=7, golfer_ids=[2]))
+    table = pa.ipc.open_stream(arrow).read_all()
+    assert list(zip(*(table.column(name).to_pylist() for name in ('id', 'golfer_id', 'club_name', 'distance')))) == expected
+    assert set(table.column('timestamp').to_pylist()) == {1714557600}
+
+    archive = np.load(io.BytesIO(b''.join(shot_export.stream_shots(db, 'npz', chunk_size=7, golfer_ids=[2]))))
+    clubs = archive['club_name_categories'][archive['club_name']].tolist()
+    assert list(zip(archive['id'].tolist(), archive['golfer_id'].tolist(), clubs, archive['distance'].tolist())) == expected
+    db.close()
+
+def test_npz_export_ignores_rows_written_mid_export(tmp_path, monkeypatch):
+    """Test that shots inserted between the count and the scan do not overflow the npz buffers."""
+    db_path = str(tmp_path / 'export.db')
+    writer = sqlite3.connect(db_path)
+    # In WAL mode the writer is not blocked by the export's read, so the insert really lands mid-export
+    writer.execute("PRAGMA journal_mode = WAL")
+    writer.execute(SHOT_TRACKING_SQL)
+    insert = "INSERT INTO shot_tracking (golfer_id, club_name, distance, accuracy) VALUES (1, '7 Iron', 150, 0.8)"
+    for _ in range(5):
+        writer.execute(insert)
+    writer.commit()
+
+    count_shots = shot_export.count_shots
+    def count_then_write(conn, **filters):
+        total = count_shots(conn, **filters)
+        writer.execute(insert)
+        writer.commit()
+        return total
+    monkeypatch.setattr(shot_export, 'count_shots', count_then_write)
+
+    conn = sqlite3.connect(db_path)
+    archive = np.load(io.BytesIO(b''.join(shot_export.stream_shots(conn, 'npz', chunk_size=2))))
+    assert len(archive['id']) == 5 and not conn.in_transaction
+    conn.close()
+    writer.close()
+
 # tests/test_validation.py
 from validation.schemas import GolferProfileSchema, ClubSchema, ShotRecommendationSchema
 
@@ -223,6 +286,926 @@ def test_club_validation():
     }
     errors = schema.validate(invalid_data)
     assert len(errors) > 0
+
+# tests/test_shot_simulator.py
+import shot_simulator
+
+SIM_CLUBS = [
+    {'club_name': 'Driver', 'carry_distance': 250, 'rollout_distance': 20, 'dispersion_radius': 15},
+    {'club_name': '5 Iron', 'carry_distance': 180, 'rollout_distance': 5, 'dispersion_radius': 8},
+    {'club_name': 'PW', 'carry_distance': 120, 'rollout_distance': 3, 'dispersion_radius': 5}
+]
+
+def test_simulation_is_reproducible():
+    """Test that the seeded simulator returns identical probabilities."""
+    first = shot_simulator.recommend_club(SIM_CLUBS, 185, wind_speed=4, wind_direction=30)
+    second = shot_simulator.recommend_club(SIM_CLUBS, 185, wind_speed=4, wind_direction=30)
+    assert first == second
+    assert first['club'] == '5 Iron'
+    assert 0 < first['probability'] <= 1
+
+def test_simulation_matches_per_club_reference():
+    """Test that simulating the whole bag in one pass gives each club's own single-club probability."""
+    names, carry, rollout, dispersion = shot_simulator.club_arrays(SIM_CLUBS)
+    conditions = dict(wind_speed=5, wind_direction=45, elevation_change=3)
+    bag = shot_simulator.simulate(carry, rollout, dispersion, 150, **conditions)
+    reference = [shot_simulator.simulate(carry[i:i + 1], rollout[i:i + 1], dispersion[i:i + 1], 150, **conditions)[0]
+                 for i in range(len(names))]
+    assert np.array_equal(bag, reference)
+
+# tests/test_adjustments.py
+import numpy as np
+import adjustments
+
+def test_adjustment_table_matches_model(tmp_path):
+    """Test that interpolated lookups reproduce the condition model."""
+    adjustments._table = None
+    adjustments.load_table(str(tmp_path / 'adjustments.npy'))
+    rng = np.random.default_rng(0)
+    shots = [rng.uniform(start, stop, 500) for _, start, stop, _ in adjustments.AXES]
+    plays_like, drift = adjustments.plays_like(*shots)
+    expected_plays_like, expected_drift = adjustments.model(*shots)
+    assert np.allclose(plays_like, expected_plays_like, atol=0.01)
+    assert np.allclose(drift, expected_drift, atol=0.01)
+    adjustments._table = None
+
+def test_adjustment_effects():
+    """Test that uphill and into-the-wind shots play longer."""
+    effects = adjustments.effects(150, elevation_change=10, headwind=5)
+    assert effects['elevation_effect'] > 0
+    assert effects['wind_effect'] > 0
+    assert effects['plays_like_distance'] > 150
+
+# tests/test_hole_planner.py
+import hole_planner
+
+def test_course_plan_shared_across_bags():
+    """Test that golfers with the same bag reuse one memoized solution."""
+    hole_planner.clear_cache()
+    clubs = [
+        {'club_name': 'Driver', 'carry_distance': 250, 'rollout_distance': 20, 'dispersion_radius': 15},
+        {'club_name': '5 Iron', 'carry_distance': 180, 'rollout_distance': 5, 'dispersion_radius': 8},
+        {'club_name': 'PW', 'carry_distance': 120, 'rollout_distance': 3, 'dispersion_radius': 5}
+    ]
+    holes = [
+        {'hole_number': 1, 'par': 4, 'yardage': 377},
+        {'hole_number': 2, 'par': 3, 'yardage': 180}
+    ]
+    plan = hole_planner.plan_course(clubs, holes)
+    assert [hole['hole_number'] for hole in plan['holes']] == [1, 2]
+    assert plan['holes'][1]['clubs'] == ['5 Iron']
+    assert plan['par'] == 7
+
+    hole_planner.plan_course(list(reversed(clubs)), holes)
+    assert hole_planner.solve_bag.cache_info().misses == 1
+
+# tests/test_migrations.py
+import migrations
+
+def test_migrations_converge_legacy_clubs(tmp_path):
+    """Test that the legacy clubs schema is converged and indexed."""
+    db_path = str(tmp_path / 'legacy.db')
+    db = sqlite3.connect(db_path)
+    db.execute("""
+        CREATE TABLE clubs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            club_name TEXT NOT NULL,
+            carry INTEGER NOT NULL,
+            run INTEGER NOT NULL,
+            dispersion INTEGER NOT NULL
+        )
+    """)
+    db.execute("INSERT INTO clubs (club_name, carry, run, dispersion) VALUES ('Driver', 250, 20, 15)")
+    db.commit()
+    db.close()
+
+    assert migrations.migrate(db_path) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.migrate(db_path) == []
+
+    db = sqlite3.connect(db_path)
+    club = db.execute("SELECT club_name, carry_distance, rollout_distance, dispersion_radius FROM clubs").fetchone()
+    assert club == ('Driver', 250, 20, 15)
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_clubs_golfer_club', 'idx_holes_course_hole', 'idx_shot_tracking_golfer_time'} <= indexes
+    db.close()
+
+# tests/test_startup.py
+import subprocess
+import sys
+import time
+
+STARTUP_BUDGET_SECONDS = 2.0
+
+def test_create_app_defers_heavy_imports():
+    """Test that building the app imports none of the heavy dependencies and starts quickly."""
+    heavy = ['openai', 'requests', 'numpy', 'pyarrow', 'marshmallow', 'redis']
+    snippet = (
+        "import sys, app; app.create_app(); "
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    start = time.perf_counter()
+    loaded = subprocess.run([sys.executable, '-c', snippet], check=True, capture_output=True, text=True).stdout.strip()
+    assert loaded == ''
+    assert time.perf_counter() - start < STARTUP_BUDGET_SECONDS
+
+# tests/test_profile_cache.py
+def test_get_profile_etag_and_invalidation(tmp_path):
+    """Test that unchanged profiles return 304 and updates produce a new ETag."""
+    db_path = str(tmp_path / 'profiles.db')
+    migrations.migrate(db_path)
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+    club = {'club_name': '7 Iron', 'carry_distance': 150, 'rollout_distance': 5, 'dispersion_radius': 8}
+    client.post('/create_profile', json={'name': 'Ann', 'email': 'ann@example.com', 'clubs': [club]})
+
+    first = client.get('/get_profile', query_string={'email': 'ann@example.com'})
+    assert first.status_code == 200
+    assert [c['club_name'] for c in first.get_json()['clubs']] == ['7 Iron']
+    etag = first.headers['ETag']
+    cached = client.get('/get_profile', query_string={'email': 'ann@example.com'}, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+    client.put('/update_profile', json={'email': 'ann@example.com', 'clubs': [dict(club, club_name='8 Iron')]})
+    updated = client.get('/get_profile', query_string={'email': 'ann@example.com'}, headers={'If-None-Match': etag})
+    assert updated.status_code == 200
+    assert updated.headers['ETag'] != etag
+    assert [c['club_name'] for c in updated.get_json()['clubs']] == ['8 Iron']
+
+    # Same email, id and version in another database is a different profile
+    other_path = str(tmp_path / 'other.db')
+    migrations.migrate(other_path)
+    other = create_app({'DATABASE': other_path, 'LOG_FILE': None}).test_client()
+    other.post('/create_profile', json={'name': 'Ann Other', 'email': 'ann@example.com', 'clubs': [club]})
+    other.put('/update_profile', json={'email': 'ann@example.com', 'clubs': [dict(club, club_name='8 Iron')]})
+    assert client.get('/get_profile', query_string={'email': 'ann@example.com'}).get_json()['golfer']['name'] == 'Ann'
+    response = other.get('/get_profile', query_string={'email': 'ann@example.com'})
+    assert response.headers['ETag'] == updated.headers['ETag'] and response.get_json()['golfer']['name'] == 'Ann Other'
+
+# tests/test_upsert_clubs.py
+from app import upsert_clubs
+
+def test_upsert_clubs_only_touches_changed_rows(tmp_path):
+    """Test that unchanged clubs keep their ids and changes are reported."""
+    db_path = str(tmp_path / 'clubs.db')
+    migrations.migrate(db_path)
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    bag = [
+        {'club_name': 'Driver', 'carry_distance': 250, 'rollout_distance': 20, 'dispersion_radius': 15},
+        {'club_name': '7 Iron', 'carry_distance': 150, 'rollout_distance': 5, 'dispersion_radius': 8},
+    ]
+    assert upsert_clubs(db, 1, bag) == {'added': ['Driver', '7 Iron'], 'updated': [], 'removed': []}
+    ids = dict(db.execute("SELECT club_name, id FROM clubs").fetchall())
+
+    edited = [dict(bag[0], carry_distance=255), {'club_name': 'PW', 'carry_distance': 120, 'rollout_distance': 3, 'dispersion_radius': 5}]
+    assert upsert_clubs(db, 1, edited) == {'added': ['PW'], 'updated': ['Driver'], 'removed': ['7 Iron']}
+    rows = {row['club_name']: row for row in db.execute("SELECT * FROM clubs WHERE golfer_id = 1")}
+    assert set(rows) == {'Driver', 'PW'}
+    assert rows['Driver']['id'] == ids['Driver']
+    assert rows['Driver']['carry_distance'] == 255
+    assert upsert_clubs(db, 1, edited) == {'added': [], 'updated': [], 'removed': []}
+    db.close()
+
+# tests/test_json_provider.py
+import json
+import json_provider
+
+def test_json_provider_serializes_rows_directly():
+    """Test that sqlite3.Row results and NumPy values encode without manual conversion."""
+    db = sqlite3.connect(':memory:')
+    db.row_factory = sqlite3.Row
+    rows = db.execute("SELECT 1 AS id, 'Driver' AS club_name UNION ALL SELECT 2, '7 Iron'").fetchall()
+    payload = {"shots": rows, "probability": np.float64(0.5), "scores": np.array([3, 4])}
+    expected = {"shots": [{"id": 1, "club_name": "Driver"}, {"id": 2, "club_name": "7 Iron"}],
+                "probability": 0.5, "scores": [3, 4]}
+    assert json.loads(json_provider.dumps(payload)) == expected
+    assert json.loads(json_provider.stdlib_dumps(payload)) == expected
+    db.close()
+
+# tests/test_response_compression.py
+import gzip
+import json
+import response_compression
+
+def test_compression_negotiation_and_streaming(tmp_path):
+    """Test that large and streamed responses are gzip encoded when accepted."""
+    assert response_compression.negotiate('gzip;q=0, identity') is None
+    assert response_compression.negotiate('br;q=0.5, gzip') in ('br', 'gzip', 'zstd')
+
+    db_path = str(tmp_path / 'compress.db')
+    migrations.migrate(db_path)
+    db = sqlite3.connect(db_path)
+    db.executemany("INSERT INTO shot_tracking (golfer_id, club_name, distance, accuracy) VALUES (1, '7 Iron', ?, 0.8)",
+                   [(150 + i % 10,) for i in range(200)])
+    db.commit()
+    db.close()
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+
+    plain = client.get('/get_shot_history', query_string={'golfer_id': 1})
+    assert 'Content-Encoding' not in plain.headers
+    encoded = client.get('/get_shot_history', query_string={'golfer_id': 1}, headers={'Accept-Encoding': 'gzip'})
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in encoded.headers['Vary']
+    assert gzip.decompress(encoded.data) == plain.data
+
+    streamed = client.get('/export_shot_history', query_string={'format': 'arrow'}, headers={'Accept-Encoding': 'gzip'})
+    assert streamed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(streamed.data) == client.get('/export_shot_history', query_string={'format': 'arrow'}).data
+
+def test_precompressed_bodies_are_keyed_on_content(tmp_path, monkeypatch):
+    """Test that per-user bodies with the same ETag in two databases never share a compressed copy."""
+    monkeypatch.setattr(response_compression, 'MIN_SIZE', 0)
+    response_compression.clear_cache()
+    bodies = []
+    for name in ('Ann', 'Bea'):
+        db_path = str(tmp_path / f'{name}.db')
+        migrations.migrate(db_path)
+        client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+        email = f'{name.lower()}@example.com'
+        client.post('/create_profile', json={'name': name, 'email': email, 'clubs': []})
+        response = client.get('/get_profile', query_string={'email': email}, headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['ETag'] == 'W/"1-0"'
+        assert response.headers['Content-Encoding'] == 'gzip' and 'private' in response.headers['Cache-Control']
+        bodies.append(json.loads(gzip.decompress(response.data)))
+    assert [body['golfer']['name'] for body in bodies] == ['Ann', 'Bea']
+    assert not response_compression._precompressed
+
+    catalog = client.get('/get_courses', headers={'Accept-Encoding': 'gzip'})
+    assert 'public' in catalog.headers['Cache-Control'] and len(response_compression._precompressed) == 1
+    assert json.loads(gzip.decompress(catalog.data))['success'] is True
+
+# tests/test_spatial_index.py
+import spatial_index
+
+def test_spatial_index_matches_brute_force():
+    """Test that grid lookups return the same object as a full scan, near and far from the data."""
+    rng = np.random.default_rng(3)
+    lat = np.concatenate([rng.normal(33.5, 0.01, 500), rng.normal(40.0, 0.01, 500)])
+    lon = np.concatenate([rng.normal(-112.0, 0.01, 500), rng.normal(-75.0, 0.01, 500)])
+    names = [f"Object {i}" for i in range(len(lat))]
+    index = spatial_index.LocationIndex(names, ['Course'] * len(lat), lat, lon)
+
+    for qlat, qlon in [(33.5, -112.0), (33.52, -111.97), (40.01, -75.02), (36.0, -95.0)]:
+        expected = int(np.argmin((lat - qlat) ** 2 + (lon - qlon) ** 2))
+        name, _, _, _, distance = index.nearest(qlat, qlon)
+        assert name == names[expected]
+        assert np.isclose(distance, (lat[expected] - qlat) ** 2 + (lon[expected] - qlon) ** 2)
+    assert spatial_index.LocationIndex([], [], [], []).nearest(0.0, 0.0) is None
+
+# tests/test_live_round.py
+import live_round
+
+def test_live_round_pushes_only_on_change(monkeypatch):
+    """Test that fixes inside the same distance band do not produce new recommendations."""
+    monkeypatch.setattr(live_round, 'fetch_weather', lambda lat, lon: {
+        "temperature": 21.0, "humidity": 50, "wind_speed": 0.0, "wind_direction": 0})
+    clubs = [
+        {'club_name': '7 Iron', 'carry_distance': 150, 'rollout_distance': 5, 'dispersion_radius': 8},
+        {'club_name': 'PW', 'carry_distance': 115, 'rollout_distance': 3, 'dispersion_radius': 5},
+    ]
+    green = (33.5, -112.0)
+    session = live_round.LiveRound(clubs, {1: green})
+
+    # ~155 yards south of the green, then a yard closer, then ~120 yards out
+    first = session.update(green[0] - 0.001417, green[1])
+    assert first['club'] == '7 Iron' and first['hole'] == 1
+    assert session.update(green[0] - 0.001408, green[1]) is None
+    closer = session.update(green[0] - 0.001097, green[1])
+    assert closer['club'] == 'PW'
+    assert abs(closer['bearing']) < 1 or abs(closer['bearing'] - 360) < 1
+
+def test_live_round_reads_greens_from_kml_geometry(tmp_path):
+    """Test that sessions take green positions from imported KML polygons before the locations markers."""
+    db_path = str(tmp_path / 'golfers.db')
+    migrations.migrate(db_path)
+    create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client().post(
+        '/upload_kml', data={'kml_file': (io.BytesIO(SAMPLE_KML), 'links.kml')}, content_type='multipart/form-data')
+    locations_db = str(tmp_path / 'locations.db')
+    db = sqlite3.connect(locations_db)
+    db.execute("CREATE TABLE locations (Name TEXT, Latitude REAL, Longitude REAL, Course TEXT)")
+    db.execute("INSERT INTO locations VALUES ('Hole 1 Green Center', 40.0, -75.0, 'Test Links')")
+    db.execute("INSERT INTO locations VALUES ('Hole 1 Green Center', 41.0, -76.0, 'Other Links')")
+    db.commit()
+    db.close()
+
+    (latitude, longitude), = live_round.load_greens(locations_db, 'Test Links', db_path).values()
+    assert abs(latitude - 33.5035) < 1e-6 and abs(longitude - -112.0005) < 1e-6
+    assert live_round.load_greens(locations_db, 'Other Links', db_path) == {1: (41.0, -76.0)}
+
+def test_live_round_socket_answers_bad_messages_with_errors(tmp_path, monkeypatch):
+    """Test that malformed messages and database failures get error frames instead of closing the socket."""
+    from fastapi.testclient import TestClient
+    from backend import gpt_plugin_backend
+
+    # A database without the clubs table makes LiveRound.start raise sqlite3.OperationalError
+    monkeypatch.setattr(gpt_plugin_backend, 'GOLFERS_DATABASE_PATH', str(tmp_path / 'empty.db'))
+    with TestClient(gpt_plugin_backend.app).websocket_connect('/live-round/') as socket:
+        for message, error in [([1, 2], "Messages must be JSON objects"),
+                               ({"type": "start", "golfer_id": "1"}, "golfer_id must be an integer"),
+                               ({"type": "start", "golfer_id": 1, "hole": "2"}, "hole must be an integer"),
+                               ({"type": "start", "golfer_id": 1}, "Database error, try again"),
+                               ({"type": "fix", "latitude": "33.5", "longitude": -112.0},
+                                "latitude and longitude must be numbers"),
+                               ({"type": "fix", "latitude": 33.5, "longitude": -112.0}, "Send a start message first")]:
+            socket.send_json(message)
+            assert socket.receive_json() == {"type": "error", "error": error}
+
+# tests/test_gps_tracking.py
+def test_gps_batch_ingestion_tags_holes_and_keeps_latest(tmp_path):
+    """Test that a batch is stored, geofenced to holes from the course KML, and the newest fix per golfer is kept."""
+    db_path = str(tmp_path / 'golfers.db')
+    migrations.migrate(db_path)
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+    points = [
+        {'golfer_id': 1, 'timestamp': 100.0, 'latitude': 33.5010, 'longitude': -112.0001},
+        {'golfer_id': 2, 'timestamp': 100.0, 'latitude': 33.5020, 'longitude': -111.9981},
+        {'golfer_id': 1, 'timestamp': 101.0, 'latitude': 33.5012, 'longitude': -112.0001},
+        {'golfer_id': 2, 'timestamp': 99.0, 'latitude': 33.6000, 'longitude': -111.0000},
+    ]
+    # No geometry imported yet: every fix is off-course
+    response = client.post('/track_positions', json={'course': 'Test Links', 'points': points})
+    assert response.get_json() == {'stored': 4, 'holes': {'1': 0, '2': 0}}
+
+    placemarks = ''.join(
+        f"<Placemark><name>{name}</name><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark>"
+        for name, lat, lon in [('Hole 1 Tee', 33.5000, -112.0000), ('Hole 1 Green Center', 33.5036, -112.0000),
+                               ('Hole 2 Tee', 33.5040, -111.9980), ('Hole 2 Green Center', 33.5000, -111.9980)])
+    kml = f'<kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>Test Links</name>{placemarks}</Document></kml>'
+    client.post('/upload_kml', data={'kml_file': (io.BytesIO(kml.encode()), 'links.kml')}, content_type='multipart/form-data')
+
+    # The upload invalidated the cached (empty) geofence
+    response = client.post('/track_positions', json={'course': 'Test Links', 'points': points})
+    assert response.status_code == 201
+    assert response.get_json() == {'stored': 4, 'holes': {'1': 1, '2': 2}}
+
+    latest = client.get('/latest_position', query_string={'golfer_id': 1}).get_json()
+    assert latest['timestamp'] == 101.0 and latest['hole'] == 1
+    assert client.get('/latest_position', query_string={'golfer_id': 3}).status_code == 404
+
+# tests/test_green_distances.py
+import green_distances
+
+def test_green_distances_front_middle_back():
+    """Test yardages to the green edges, centre and hazards for several positions at once."""
+    course_map = green_distances.CourseMap([
+        ('Hole 1 Green Front', 33.50000, -112.0, 'Links'),
+        ('Hole 1 Green Center', 33.50010, -112.0, 'Links'),
+        ('Hole 1 Green Back', 33.50020, -112.0, 'Links'),
+        ('Hole 1 Bunker', 33.49950, -112.0, 'Links'),
+        ('Hole 2 Green Front', 33.60000, -112.0, 'Links'),
+        ('Hole 2 Green Back', 33.60020, -112.0, 'Links'),
+    ])
+    first, second = course_map.distances('Links', 1, [33.49860, 33.49900], [-112.0, -112.0])
+    assert first['front'] < first['middle'] < first['back']
+    assert abs(first['front'] - 170.2) < 1.0
+    assert abs(first['middle'] - first['front'] - 12.2) < 0.5
+    assert first['hazards'][0]['name'] == 'Hole 1 Bunker'
+    assert second['front'] < first['front']
+
+    # No centre marker: the middle is the centroid of the green markers
+    (only,) = course_map.distances('Links', 2, 33.59900, -112.0)
+    assert abs(only['middle'] - (only['front'] + only['back']) / 2) < 0.5
+    assert course_map.distances('Links', 3, 33.5, -112.0) is None
+
+def test_green_distances_reload_changed_locations(tmp_path, monkeypatch):
+    """Test that a cached course map is rebuilt once the locations table changes."""
+    monkeypatch.setattr(spatial_index, 'REFRESH_SECONDS', 0)
+    db_path = str(tmp_path / 'locations.db')
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE locations (Name TEXT, Latitude REAL, Longitude REAL, Course TEXT)")
+    db.execute("INSERT INTO locations VALUES ('Hole 1 Green Center', 33.5, -112.0, 'Links')")
+    db.commit()
+    assert green_distances.load(db_path).holes('Links') == [1]
+    assert green_distances.load(db_path) is green_distances.load(db_path)
+
+    db.execute("INSERT INTO locations VALUES ('Hole 2 Green Center', 33.6, -112.0, 'Links')")
+    db.commit()
+    db.close()
+    assert green_distances.load(db_path).holes('Links') == [1, 2]
+    green_distances.invalidate(db_path)
+
+# tests/test_course_geometry.py
+import io
+import course_geometry
+
+SAMPLE_KML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>Test Links</name>
+  <Placemark><name>Hole 1 Tee</name><Point><coordinates>-112.0000,33.5000,0</coordinates></Point></Placemark>
+  <Placemark><name>Hole 1 Fairway</name><LineString><coordinates>-112.0,33.5 -112.0,33.502 -112.001,33.503</coordinates></LineString></Placemark>
+  <Placemark><name>Hole 1 Green</name><Polygon>
+    <outerBoundaryIs><LinearRing><coordinates>-112.001,33.503 -112.000,33.503 -112.000,33.504 -112.001,33.504 -112.001,33.503</coordinates></LinearRing></outerBoundaryIs>
+    <innerBoundaryIs><LinearRing><coordinates>-112.0006,33.5034 -112.0004,33.5034 -112.0004,33.5036 -112.0006,33.5034</coordinates></LinearRing></innerBoundaryIs>
+  </Polygon></Placemark>
+</Document></kml>"""
+
+def test_kml_upload_stores_packed_geometry(tmp_path):
+    """Test that uploaded Placemark geometry round-trips through the packed BLOB columns."""
+    db_path = str(tmp_path / 'geometry.db')
+    migrations.migrate(db_path)
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+    response = client.post('/upload_kml', data={'kml_file': (io.BytesIO(SAMPLE_KML), 'links.kml')},
+                           content_type='multipart/form-data')
+    assert response.get_json()['details']['features'] == 3
+
+    db = sqlite3.connect(db_path)
+    assert db.execute("SELECT name FROM courses").fetchone() == ('Test Links',)
+    rows = course_geometry.features_in_bbox(db, -112.0012, 33.5029, -111.9999, 33.5041)
+    by_name = {row[2]: row for row in rows}
+    assert set(by_name) == {'Hole 1 Fairway', 'Hole 1 Green'}
+
+    green = by_name['Hole 1 Green']
+    outer, hole = course_geometry.decode(green[4], green[5])
+    assert outer.shape == (5, 2) and hole.shape == (4, 2)
+    assert not outer.flags.owndata
+    assert abs(green[10] - -112.0005) < 1e-9 and abs(green[11] - 33.5035) < 1e-9
+    db.close()
+
+# tests/test_kml_import.py
+import kml_import
+
+def test_kml_reupload_is_deduplicated_and_incremental(tmp_path):
+    """Test that repeated uploads are skipped and edits to a named course only rewrite changed Placemarks."""
+    db_path = str(tmp_path / 'imports.db')
+    migrations.migrate(db_path)
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+
+    def upload(data, course_id=None):
+        form = {'kml_file': (io.BytesIO(data), 'links.kml')}
+        if course_id is not None:
+            form['course_id'] = str(course_id)
+        response = client.post('/upload_kml', data=form, content_type='multipart/form-data')
+        return response.get_json()['details']
+
+    first = upload(SAMPLE_KML)
+    assert first['added'] == 3 and first['duplicate'] is False
+    db = sqlite3.connect(db_path)
+    ids = dict(db.execute("SELECT name, id FROM course_features").fetchall())
+
+    again = upload(SAMPLE_KML)
+    assert again['duplicate'] is True and again['course_id'] == first['course_id']
+
+    moved = SAMPLE_KML.replace(b'-112.0000,33.5000,0', b'-112.0001,33.5001,0')
+    edited = upload(moved, first['course_id'])
+    assert edited['duplicate'] is False and edited['course_id'] == first['course_id']
+    assert (edited['added'], edited['updated'], edited['removed'], edited['unchanged']) == (0, 1, 0, 2)
+    after = dict(db.execute("SELECT name, id FROM course_features").fetchall())
+    assert after['Hole 1 Green'] == ids['Hole 1 Green'] and after['Hole 1 Fairway'] == ids['Hole 1 Fairway']
+    assert after['Hole 1 Tee'] != ids['Hole 1 Tee']
+
+    # The original file is no longer the course's latest upload, so it is re-applied rather than echoed
+    reverted = upload(SAMPLE_KML)
+    assert reverted['duplicate'] is False and reverted['course_id'] == first['course_id']
+    assert (reverted['added'], reverted['updated'], reverted['removed']) == (0, 1, 0)
+    tee = db.execute("SELECT centroid_lon FROM course_features WHERE name = 'Hole 1 Tee'").fetchone()[0]
+    assert abs(tee - -112.0) < 1e-9
+    assert db.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 1
+
+    # An unrelated file with the same Document name becomes its own course
+    other = upload(SAMPLE_KML.replace(b'Hole 1', b'Hole 9'))
+    assert other['course_id'] != first['course_id'] and other['removed'] == 0
+    assert db.execute("SELECT COUNT(*) FROM course_features WHERE course_id = ?", (first['course_id'],)).fetchone()[0] == 3
+
+    # A stored source key (the bulk importer's file path) also names the course to update
+    sourced = kml_import.import_kml(db, SAMPLE_KML.replace(b'Hole 1', b'Hole 5'), source='/data/links.kml')
+    resourced = kml_import.import_kml(db, moved.replace(b'Hole 1', b'Hole 5'), source='/data/links.kml')
+    assert resourced['course_id'] == sourced['course_id'] and resourced['updated'] == 1
+    db.close()
+
+def test_kml_upload_rejects_bad_files_and_unknown_courses(tmp_path):
+    """Test that invalid KML is a 400 and an unknown course_id a 404, with nothing written."""
+    db_path = str(tmp_path / 'kml_errors.db')
+    migrations.migrate(db_path)
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+
+    def upload(data, course_id=None):
+        form = {'kml_file': (io.BytesIO(data), 'links.kml')}
+        if course_id is not None:
+            form['course_id'] = str(course_id)
+        return client.post('/upload_kml', data=form, content_type='multipart/form-data')
+
+    empty = upload(b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>Empty</name></Document></kml>')
+    assert empty.status_code == 400 and empty.get_json()['success'] is False
+    assert 'no Placemarks' in empty.get_json()['error']
+    assert upload(b'<kml><Document>').status_code == 400
+    unknown = upload(SAMPLE_KML, 999)
+    assert unknown.status_code == 404 and unknown.get_json()['success'] is False
+    db = sqlite3.connect(db_path)
+    assert db.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 0
+    assert db.execute("SELECT COUNT(*) FROM kml_uploads").fetchone()[0] == 0
+    db.close()
+
+# tests/test_kml_bulk_import.py
+import zipfile
+
+def test_bulk_import_streams_kmz_members_across_workers(tmp_path):
+    """Test that a bulk upload parses KML and KMZ members in worker processes and skips duplicates."""
+    db_path = str(tmp_path / 'bulk.db')
+    migrations.migrate(db_path)
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None, 'KML_IMPORT_WORKERS': 2}).test_client()
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as kmz:
+        for n in range(3):
+            kmz.writestr(f'course{n}.kml', SAMPLE_KML.replace(b'Test Links', f'Links {n}'.encode()))
+        kmz.writestr('images/logo.png', b'not kml')
+    archive.seek(0)
+    response = client.post('/bulk_upload_kml', content_type='multipart/form-data', data={
+        'kml_files': [(archive, 'region.kmz'), (io.BytesIO(SAMPLE_KML), 'links.kml'),
+                      (io.BytesIO(SAMPLE_KML), 'copy.kml'), (io.BytesIO(b'<kml>'), 'broken.kml')],
+    })
+    stats = response.get_json()['details']
+    assert (stats['files'], stats['imported'], stats['duplicates'], len(stats['errors'])) == (6, 4, 1, 1)
+    assert stats['placemarks'] == 12 and stats['placemarks_per_sec'] > 0
+
+    db = sqlite3.connect(db_path)
+    assert db.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 4
+    assert db.execute("SELECT COUNT(*) FROM course_features").fetchone()[0] == 12
+    db.close()
+
+# tests/test_seed_loader.py
+import json
+import seed_loader
+
+def test_seed_loader_upserts_idempotently(tmp_path):
+    """Test that loading CSV/NDJSON datasets twice upserts rows instead of duplicating them."""
+    db_path = str(tmp_path / 'seed.db')
+    migrations.migrate(db_path)
+    courses = tmp_path / 'courses.ndjson'
+    courses.write_text("\n".join(json.dumps(course) for course in seed_loader.SEED_COURSES + [
+        {"id": 3, "name": "Augusta National", "location": "", "holes": [{"hole_number": 1, "par": 4, "yardage": 445}]},
+    ]))
+    holes = tmp_path / 'holes.csv'
+    holes.write_text("course_id,hole_number,par,yardage,handicap\n1,1,4,380,\n1,3,4,404,16\n")
+
+    def run():
+        conn = sqlite3.connect(db_path)
+        try:
+            return seed_loader.load(conn, seed_loader.read_records(str(courses)), seed_loader.read_records(str(holes)))
+        finally:
+            conn.close()
+
+    assert run()['holes'] == 3
+    stats = run()
+    assert (stats['courses'], stats['holes']) == (3, 3)
+    db = sqlite3.connect(db_path)
+    assert db.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 3
+    assert db.execute("SELECT yardage, handicap FROM holes WHERE course_id = 1 AND hole_number = 1").fetchall() == [(380, None)]
+    assert db.execute("SELECT COUNT(*) FROM holes").fetchone()[0] == 3
+    db.close()
+
+    def nested_courses():
+        # Each course's holes are already committed by the time the next course record is read
+        for course_id in (4, 5, 6):
+            if course_id > 4:
+                check = sqlite3.connect(db_path)
+                assert check.execute("SELECT COUNT(*) FROM holes WHERE course_id = ?", (course_id - 1,)).fetchone()[0] == 2
+                check.close()
+            yield {"id": course_id, "name": f"Course {course_id}",
+                   "holes": [{"hole_number": n, "par": 4, "yardage": 400} for n in (1, 2)]}
+
+    conn = sqlite3.connect(db_path)
+    assert seed_loader.load(conn, nested_courses(), batch_size=1)['holes'] == 6
+    conn.close()
+
+# tests/test_elevation.py
+import elevation
+
+def test_elevation_model_samples_tiles_bilinearly(tmp_path, monkeypatch):
+    """Test that tiled DEM lookups interpolate across tile edges and feed recommend_shot."""
+    # A plane rising 1 m per row southwards and 0.5 m per column eastwards, over 3x2 tiles of 4x4
+    rows, cols = np.mgrid[0:10, 0:7]
+    path = str(tmp_path / 'dem')
+    for _ in range(3):
+        # Re-imports swap the link; only the current and the previous version stay on disk
+        elevation.save_dem(rows + 0.5 * cols, north=33.51, west=-112.01, cell_lat=0.001, cell_lon=0.001, path=path, tile=4)
+    assert len(list(tmp_path.iterdir())) == 3 and (tmp_path / 'dem').is_symlink()
+    model = elevation.load(path)
+    assert model.tiles.shape == (3, 2, 4, 4) and isinstance(model.tiles, np.memmap)
+    georef = tmp_path / 'dem' / 'georef.json'
+    georef.write_text(georef.read_text().replace('"rows": 10', '"rows": 13'))
+    with pytest.raises(ValueError):
+        elevation.ElevationModel.open(path)
+    georef.write_text(georef.read_text().replace('"rows": 13', '"rows": 10'))
+
+    heights = model.sample([33.51, 33.5065, 33.5015, 33.52], [-112.01, -112.0065, -112.0045, -112.0])
+    assert np.allclose(heights[:3], [0.0, 3.5 + 1.75, 8.5 + 2.75])
+    assert np.isnan(heights[3])
+    change = model.elevation_change([33.51, 33.509], -112.01, 33.505, -112.01)
+    assert np.allclose(change, [5 / 0.9144, 4 / 0.9144])
+
+    monkeypatch.setattr(elevation, 'DEM_PATH', path)
+    db_path = str(tmp_path / 'elevation.db')
+    migrations.migrate(db_path)
+    db = sqlite3.connect(db_path)
+    db.execute("INSERT INTO golfer_profiles (id, name, email) VALUES (1, 'Ann', 'ann@example.com')")
+    db.executemany("INSERT INTO clubs (golfer_id, club_name, carry_distance, rollout_distance, dispersion_radius) "
+                   "VALUES (1, ?, ?, 0, 0)", [('7 Iron', 160), ('8 Iron', 148)])
+    db.commit()
+    db.close()
+    client = create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+    shot = {"golfer_id": 1, "target_distance": 150, "latitude": 33.51, "longitude": -112.01,
+            "target_latitude": 33.501, "target_longitude": -112.01}
+    assert client.post('/recommend_shot', json=shot).get_json()['recommended_club'] == '7 Iron'
+    assert client.post('/recommend_shot', json=dict(shot, elevation_change=0)).get_json()['recommended_club'] == '8 Iron'
+
+# tests/test_weather_cache.py
+import time
+import weather_cache
+
+def test_weather_refresher_keeps_active_cells_warm(tmp_path, monkeypatch):
+    """Test that lookups are served from memory and the refresher refetches only active, stale cells."""
+    calls = []
+    monkeypatch.setattr(weather_cache, 'fetch', lambda lat, lon: calls.append((lat, lon)) or {"temperature": len(calls)})
+    weather_cache.clear()
+    db_path = str(tmp_path / 'weather.db')
+    migrations.migrate(db_path)
+    db = sqlite3.connect(db_path)
+    db.execute("INSERT INTO golfer_positions (golfer_id, recorded_at, latitude, longitude) VALUES (1, ?, 40.0, -75.0)",
+               (int(time.time() * 1000),))
+    db.execute("INSERT INTO golfer_positions (golfer_id, recorded_at, latitude, longitude) VALUES (2, 0, 10.0, 10.0)")
+    db.commit()
+    db.close()
+
+    assert weather_cache.get(33.5, -112.0) == {"temperature": 1}
+    assert weather_cache.get(33.501, -112.001) == {"temperature": 1} and len(calls) == 1
+
+    refresher = weather_cache.Refresher(db_path, interval=60, concurrency=2)
+    # The looked-up cell is still fresh; only the active golfer's cell is fetched
+    assert refresher.refresh_due() == 1
+    assert weather_cache.age(40.0, -75.0) is not None and weather_cache.age(10.0, 10.0) is None
+
+    refresher.interval = 0
+    assert refresher.refresh_due() == 2
+    assert weather_cache.get(33.5, -112.0)["temperature"] in (3, 4)
+    assert len(calls) == 4
+    weather_cache.clear()
+
+def test_weather_refetched_inline_without_refresher(monkeypatch):
+    """Test that stale readings are refetched on the request path only when no refresher keeps them warm."""
+    calls = []
+    monkeypatch.setattr(weather_cache, 'fetch', lambda lat, lon: calls.append((lat, lon)) or {"temperature": len(calls)})
+    monkeypatch.setattr(weather_cache, 'STALE_SECONDS', 0)
+    weather_cache.clear()
+    assert weather_cache.get(33.5, -112.0) == {"temperature": 1}
+    assert weather_cache.get(33.5, -112.0) == {"temperature": 2} and len(calls) == 2
+
+    monkeypatch.setattr(weather_cache, 'refreshing', lambda: True)
+    assert weather_cache.get(33.5, -112.0)["stale"] is True and len(calls) == 2
+    weather_cache.clear()
+
+def test_weather_refreshers_elect_one_leader_and_share_readings(tmp_path, monkeypatch):
+    """Test that only one worker's refresher fetches and the others take its readings from the database."""
+    calls = []
+    monkeypatch.setattr(weather_cache, 'fetch', lambda lat, lon: calls.append((lat, lon)) or {"temperature": len(calls)})
+    db_path = str(tmp_path / 'weather.db')
+    migrations.migrate(db_path)
+    leader, follower = weather_cache.Refresher(db_path, interval=60), weather_cache.Refresher(db_path, interval=60)
+    assert leader.leader() and not follower.leader()
+
+    # A follower's lookups reach the leader through the shared table
+    weather_cache.clear()
+    weather_cache._activity[weather_cache.cell(40.0, -75.0)] = time.time()
+    follower.sync()
+    weather_cache.clear()
+    monkeypatch.setattr(weather_cache, '_store', db_path)
+    assert leader.refresh_due() == 1 and len(calls) == 1
+
+    # ... and the leader's readings reach the follower without another fetch
+    weather_cache.clear()
+    follower.sync()
+    assert weather_cache.get(40.0, -75.0) == {"temperature": 1}
+    weather_cache.clear()
+    assert weather_cache.get(40.0, -75.0) == {"temperature": 1} and len(calls) == 1
+    leader._lock_file.close()
+    weather_cache.clear()
+
+# tests/test_circuit_breaker.py
+import circuit_breaker
+
+def test_weather_breaker_serves_last_known_good(monkeypatch):
+    """Test that a failing feed opens the circuit and recommendations fall back to flagged stale weather."""
+    now = [0.0]
+    breaker = circuit_breaker.CircuitBreaker(failure_rate=0.5, min_calls=2, open_seconds=30, clock=lambda: now[0])
+    monkeypatch.setattr(weather_cache, 'breaker', breaker)
+    weather_cache.clear()
+    upstream = {"up": True, "calls": 0}
+
+    def fetch(lat, lon):
+        upstream["calls"] += 1
+        if not upstream["up"]:
+            return {"error": "timed out"}
+        return {"temperature": 21.0, "humidity": 50, "wind_speed": 0.0, "wind_direction": 0, "condition": "clear"}
+
+    monkeypatch.setattr(weather_cache, 'fetch', fetch)
+    key = weather_cache.cell(36.568, -121.95)
+    assert "error" not in weather_cache.refresh(key)
+
+    upstream["up"] = False
+    weather_cache.refresh(key)
+    assert breaker.state == circuit_breaker.OPEN and upstream["calls"] == 2
+    # While open nothing reaches the feed
+    assert "error" in weather_cache.refresh(key) and upstream["calls"] == 2
+
+    client = create_app({'LOG_FILE': None}).test_client()
+    response = client.post('/recommend_shot', json={
+        "golfer_profile": {"avg_distances": {"7 Iron": 150, "8 Iron": 140}, "dispersion": {"7 Iron": 8, "8 Iron": 7}},
+        "course_details": {"latitude": 36.5681, "longitude": -121.9502, "target_distance": 150},
+    })
+    assert response.status_code == 200
+    assert response.get_json()["weather_fallback"]["stale"] is True
+    # A nearby unseen cell borrows the cached reading instead of failing
+    assert weather_cache.get(36.6, -121.9)["stale"] is True
+
+    # After open_seconds one probe goes through and closes the circuit again
+    now[0] = 31.0
+    upstream["up"] = True
+    assert "error" not in weather_cache.refresh(key) and breaker.state == circuit_breaker.CLOSED
+    assert "stale" not in weather_cache.get(36.568, -121.95)
+    weather_cache.clear()
+
+# tests/test_closest_objects_batch.py
+def test_closest_objects_batch_endpoint(tmp_path, monkeypatch):
+    """Test that the batch endpoint matches single lookups and skips the LLM unless asked to phrase."""
+    from fastapi.testclient import TestClient
+    from backend import gpt_plugin_backend
+
+    rng = np.random.default_rng(5)
+    db_path = str(tmp_path / 'locations.db')
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE locations (Name TEXT, Latitude REAL, Longitude REAL, Course TEXT)")
+    db.executemany("INSERT INTO locations VALUES (?, ?, ?, 'Course 1')",
+                   [(f"Marker {i}", 33.5 + rng.normal(0, 0.01), -112.0 + rng.normal(0, 0.01)) for i in range(300)])
+    db.commit()
+    db.close()
+    monkeypatch.setattr(gpt_plugin_backend, 'DATABASE_PATH', db_path)
+    calls = []
+    monkeypatch.setattr(gpt_plugin_backend, 'ChatCompletion', type('Stub', (), {'create': staticmethod(
+        lambda **kwargs: calls.append(kwargs) or {'choices': [{'message': {'content': 'phrased'}}]})}))
+    client = TestClient(gpt_plugin_backend.app)
+
+    points = [{"latitude": 33.5 + 0.003 * i, "longitude": -112.0 + 0.002 * i} for i in range(-20, 21)] + \
+             [{"latitude": 10.0, "longitude": 10.0}]
+    body = client.post('/closest-objects/', json={"points": points}).json()
+    index = spatial_index.load(db_path)
+    for point, result in zip(points, body["results"]):
+        assert result["name"] == index.nearest(point["latitude"], point["longitude"])[0]
+    assert "result" not in body and not calls
+
+    phrased = client.post('/closest-objects/', json={"points": points[:3], "phrase": True}).json()
+    assert phrased["result"] == 'phrased' and len(calls) == 1
+    spatial_index.invalidate(db_path)
+
+# tests/test_answer_templates.py
+import answer_templates
+
+def test_closest_object_template_fast_path(tmp_path, monkeypatch):
+    """Test that common distance questions are answered from templates and only free-form ones reach the LLM."""
+    from fastapi.testclient import TestClient
+    from backend import gpt_plugin_backend
+
+    db_path = str(tmp_path / 'locations.db')
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE locations (Name TEXT, Latitude REAL, Longitude REAL, Course TEXT)")
+    db.execute("INSERT INTO locations VALUES ('Hole 1 Green Center', 33.501, -112.0, 'Desert Links')")
+    db.commit()
+    db.close()
+    monkeypatch.setattr(gpt_plugin_backend, 'DATABASE_PATH', db_path)
+    calls = []
+    monkeypatch.setattr(gpt_plugin_backend, 'ChatCompletion', type('Stub', (), {'create': staticmethod(
+        lambda **kwargs: calls.append(kwargs) or {'choices': [{'message': {'content': 'Lay up short.'}}]})}))
+    answer_templates.stats.reset()
+    client = TestClient(gpt_plugin_backend.app)
+    position = {"latitude": 33.5, "longitude": -112.0}
+
+    body = client.get('/closest-object/', params=position).json()
+    assert body["mode"] == "template" and not calls
+    assert body["result"].startswith("The closest object to 33.50000, -112.00000 is Hole 1 Green Center on Desert Links, 122 yards")
+    assert client.get('/closest-object/', params=dict(position, question="How far is the nearest green?")).json()["mode"] == "template"
+
+    body = client.get('/closest-object/', params=dict(position, question="Should I lay up before the bunker?")).json()
+    assert body == {"result": "Lay up short.", "mode": "llm", "latency_ms": body["latency_ms"]}
+    assert calls[0]["messages"][-1] == {"role": "user", "content": "Should I lay up before the bunker?"}
+    assert client.get('/closest-object/', params=dict(position, mode="bogus")).status_code == 422
+
+    report = client.get('/response-stats/').json()
+    assert report["template"]["count"] == 2 and report["llm"]["count"] == 1
+    spatial_index.invalidate(db_path)
+
+# tests/test_llm_dispatch.py
+import threading
+import time
+
+import llm_dispatch
+from fake_completion_server import FakeCompletionServer
+
+def test_llm_dispatch_against_fake_server():
+    """Test concurrency limit, coalescing of identical prompts and fast rejection when the queue is full."""
+    with FakeCompletionServer(latency=0.2) as server:
+        dispatcher = llm_dispatch.Dispatcher(llm_dispatch.HTTPCompletion(server.base_url).create,
+                                             max_concurrency=2, max_queue=3, rate=1000, burst=1000)
+        message = lambda text: [{"role": "user", "content": text}]
+
+        futures = [dispatcher.submit("gpt-4", message("same")) for _ in range(10)]
+        assert all(future is futures[0] for future in futures)
+        assert futures[0].result(5)["choices"][0]["message"]["content"] == "echo: same"
+        assert server.calls == 1 and dispatcher.snapshot()["coalesced"] == 9
+
+        # Two calls in flight, three queued: the queue is full
+        futures = [dispatcher.submit("gpt-4", message(f"q{i}")) for i in range(2)]
+        while dispatcher.snapshot()["in_flight"] < 2:
+            time.sleep(0.01)
+        futures += [dispatcher.submit("gpt-4", message(f"q{i}")) for i in range(2, 5)]
+        try:
+            dispatcher.submit("gpt-4", message("one too many"))
+            assert False, "expected Overloaded"
+        except llm_dispatch.Overloaded as e:
+            assert e.retry_after >= 1
+        assert [future.result(5)["choices"][0]["message"]["content"] for future in futures] == [f"echo: q{i}" for i in range(5)]
+        assert server.peak == 2 and server.calls == 6
+        assert dispatcher.snapshot() == dict(submitted=16, coalesced=9, rejected=1, calls=6, errors=0, queued=0, in_flight=0)
+
+        server.status = 503
+        try:
+            dispatcher.complete("gpt-4", message("broken"), timeout=5)
+            assert False, "expected UpstreamError"
+        except llm_dispatch.UpstreamError as e:
+            assert e.status == 503
+
+def test_token_bucket_limits_call_rate():
+    """Test that calls start no faster than the token bucket allows after the burst."""
+    now = [0.0]
+    bucket = llm_dispatch.TokenBucket(rate=2, capacity=3, clock=lambda: now[0])
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == 0.5
+    now[0] = 0.5
+    assert bucket.try_acquire() == 0 and bucket.try_acquire() == 0.5
+
+    with FakeCompletionServer() as server:
+        dispatcher = llm_dispatch.Dispatcher(llm_dispatch.HTTPCompletion(server.base_url).create,
+                                             max_concurrency=4, max_queue=10, rate=20, burst=2)
+        start = time.perf_counter()
+        for future in [dispatcher.submit("gpt-4", [{"role": "user", "content": str(i)}]) for i in range(6)]:
+            future.result(5)
+        # 2 calls from the burst, the other 4 at 20 per second
+        assert time.perf_counter() - start >= 0.18 and server.calls == 6
+
+        unlimited = llm_dispatch.Dispatcher(llm_dispatch.HTTPCompletion(server.base_url).create, max_queue=10, rate=None)
+        start = time.perf_counter()
+        for future in [unlimited.submit("gpt-4", [{"role": "user", "content": f"u{i}"}]) for i in range(6)]:
+            future.result(5)
+        assert unlimited.bucket is None and time.perf_counter() - start < 0.18
+
+def test_plugin_sheds_llm_load_with_429(tmp_path, monkeypatch):
+    """Test that the plugin answers 429 with Retry-After when the LLM queue is full."""
+    from fastapi.testclient import TestClient
+    from backend import gpt_plugin_backend
+
+    db_path = str(tmp_path / 'locations.db')
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE locations (Name TEXT, Latitude REAL, Longitude REAL, Course TEXT)")
+    db.execute("INSERT INTO locations VALUES ('Hole 1 Green Center', 33.501, -112.0, 'Desert Links')")
+    db.commit()
+    db.close()
+    monkeypatch.setattr(gpt_plugin_backend, 'DATABASE_PATH', db_path)
+    release = threading.Event()
+    monkeypatch.setattr(gpt_plugin_backend, 'ChatCompletion', type('Stub', (), {'create': staticmethod(
+        lambda **kwargs: release.wait(5) and {'choices': [{'message': {'content': 'Lay up.'}}]})}))
+    dispatcher = llm_dispatch.Dispatcher(gpt_plugin_backend.create_completion, max_concurrency=1, max_queue=1)
+    monkeypatch.setattr(gpt_plugin_backend, '_dispatcher', dispatcher)
+    client = TestClient(gpt_plugin_backend.app)
+    position = {"latitude": 33.5, "longitude": -112.0, "mode": "llm"}
+
+    # One request in flight and one queued fill the dispatcher; the next is shed at once
+    futures = [dispatcher.submit("gpt-4", [{"role": "user", "content": "busy 0"}])]
+    while dispatcher.snapshot()["in_flight"] < 1:
+        time.sleep(0.01)
+    futures.append(dispatcher.submit("gpt-4", [{"role": "user", "content": "busy 1"}]))
+    response = client.get('/closest-object/', params=dict(position, question="Should I lay up?"))
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+    release.set()
+    assert [future.result(5)['choices'][0]['message']['content'] for future in futures] == ['Lay up.', 'Lay up.']
+
+    body = client.get('/closest-object/', params=dict(position, question="Should I lay up?")).json()
+    assert body["result"] == "Lay up." and body["mode"] == "llm"
+    assert client.get('/response-stats/').json()["llm_queue"]["rejected"] == 1
+
+    # Only the dispatcher's own timeout is a 504; other timeouts are ordinary server errors
+    release.clear()
+    with pytest.raises(llm_dispatch.LLMTimeout):
+        dispatcher.complete("gpt-4", [{"role": "user", "content": "slow"}], timeout=0.05)
+
+    def failing(error):
+        def complete(self, model, messages, **kwargs):
+            raise error
+        return complete
+
+    monkeypatch.setattr(llm_dispatch.Dispatcher, 'complete', failing(llm_dispatch.LLMTimeout("No completion within 30s")))
+    assert client.get('/closest-object/', params=dict(position, question="Should I lay up?")).status_code == 504
+    monkeypatch.setattr(llm_dispatch.Dispatcher, 'complete', failing(TimeoutError("database is locked")))
+    with pytest.raises(TimeoutError):
+        client.get('/closest-object/', params=dict(position, question="Should I lay up?"))
+    release.set()
+    spatial_index.invalidate(db_path)
+
 import unittest
 
 class TestAPI(unittest.TestCase):
@@ -1,44 +1,11 @@
 
-import sqlite3
+from migrations import migrate
 
 DB_PATH = 'golfers.db'
 
-def setup_database():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create golfer_profiles table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS golfer_profiles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    # Create clubs table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS clubs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        club_name TEXT NOT NULL,
-        carry INTEGER NOT NULL,
-        run INTEGER NOT NULL,
-        dispersion INTEGER NOT NULL
-    )
-    """)
-
-    # Create courses table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS courses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        location TEXT NOT NULL
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+def setup_database(db_path=DB_PATH):
+    # Shares the versioned migrations with the root app so both converge on one schema
+    return migrate(db_path)
 
 if __name__ == '__main__':
     setup_database()
@@ -1,63 +1,254 @@
 
 # File: gpt_plugin_backend.py
-from fastapi import FastAPI, Query
-from pydantic import BaseModel
+import logging
+import math
+import os
 import sqlite3
-from openai import ChatCompletion
+import threading
+
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import List, Optional
+import answer_templates
+import json_provider
+import live_round
+import llm_dispatch
+import spatial_index
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON responses rendered with the shared (orjson when available) encoder."""
+
+    def render(self, content):
+        return json_provider.dumps(content)
+
 
 # Initialize FastAPI app
-app = FastAPI(title="Custom GPT Distance Plugin", description="GPT plugin for distance queries")
+app = FastAPI(title="Custom GPT Distance Plugin", description="GPT plugin for distance queries",
+              default_response_class=FastJSONResponse)
 
 # Path to the SQLite database
 DATABASE_PATH = 'optimized_data.db'
+# Golfer profiles and clubs (the Flask app's database)
+GOLFERS_DATABASE_PATH = 'golfers.db'
 
 # GPT API setup (replace 'your-api-key' with your OpenAI API key)
 GPT_API_KEY = "your-api-key"
-ChatCompletion.api_key = GPT_API_KEY
+ChatCompletion = None
+
+
+def get_chat_completion():
+    """Import the OpenAI client on first use so worker start-up stays fast."""
+    global ChatCompletion
+    if ChatCompletion is None:
+        from openai import ChatCompletion as completion
+        completion.api_key = GPT_API_KEY
+        ChatCompletion = completion
+    return ChatCompletion
+
+
+# OpenAI-compatible endpoint to call over HTTP instead of the openai client (e.g. fake_completion_server.py)
+LLM_BASE_URL = os.getenv('LLM_BASE_URL')
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def create_completion(**kwargs):
+    if LLM_BASE_URL:
+        return llm_dispatch.HTTPCompletion(LLM_BASE_URL, GPT_API_KEY).create(**kwargs)
+    return get_chat_completion().create(**kwargs)
+
+
+def get_dispatcher():
+    """This worker's LLM dispatcher (bounded queue, concurrency and rate limits), started on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = llm_dispatch.Dispatcher(create_completion)
+        return _dispatcher
+
+
+@app.exception_handler(llm_dispatch.Overloaded)
+def llm_overloaded(request, exc):
+    return FastJSONResponse({"error": str(exc)}, status_code=429,
+                            headers={"Retry-After": str(int(math.ceil(exc.retry_after)))})
+
+
+@app.exception_handler(llm_dispatch.LLMTimeout)
+def llm_timed_out(request, exc):
+    return FastJSONResponse({"error": "The language model did not answer in time."}, status_code=504)
 
 class DistanceQuery(BaseModel):
     latitude: float
     longitude: float
 
 @app.get("/closest-object/")
-def get_closest_object(latitude: float, longitude: float):
+def get_closest_object(latitude: float, longitude: float, mode: str = "auto", question: Optional[str] = None):
     """
     Query the closest object to a given latitude and longitude.
+
+    ``mode`` picks how the answer is phrased: ``template`` renders it locally,
+    ``llm`` asks GPT (with the optional free-form ``question``), and ``auto``
+    uses the template unless the question needs more than the lookup itself.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
-    # SQL query to find the closest object
-    query = """
-    SELECT Name, Latitude, Longitude, Course,
-           ((Latitude - ?) * (Latitude - ?) + (Longitude - ?) * (Longitude - ?)) AS Distance
-    FROM locations
-    ORDER BY Distance ASC
-    LIMIT 1;
+    try:
+        path = answer_templates.choose(mode, question)
+    except ValueError as e:
+        return FastJSONResponse({"error": str(e)}, status_code=422)
+
+    with answer_templates.stats.timed(path) as timer:
+        # Nearest object from the in-memory grid index (preloaded before fork by server.py)
+        result = spatial_index.load(DATABASE_PATH).nearest(latitude, longitude)
+
+        if not result:
+            return {"error": "No objects found in the database."}
+
+        name, obj_lat, obj_lon, course, distance = result
+
+        if path == answer_templates.TEMPLATE:
+            answer = answer_templates.closest_object(latitude, longitude, name, obj_lat, obj_lon, course)
+        else:
+            # Construct GPT prompt
+            prompt = (
+                f"The closest object to latitude {latitude} and longitude {longitude} is "
+                f"{name} located at {obj_lat}, {obj_lon} on course {course}. "
+                f"The approximate distance is {distance:.2f} units."
+            )
+            messages = [{"role": "system", "content": prompt}]
+            if question:
+                messages.append({"role": "user", "content": question})
+
+            # Query GPT
+            response = get_dispatcher().complete("gpt-4", messages)
+            answer = response['choices'][0]['message']['content']
+
+    return {"result": answer, "mode": path, "latency_ms": round(timer.seconds * 1000, 3)}
+
+@app.get("/response-stats/")
+def get_response_stats():
+    """
+    Request counts and latencies for the template and LLM answer paths.
+    """
+    report = answer_templates.stats.snapshot()
+    if _dispatcher is not None:
+        report["llm_queue"] = _dispatcher.snapshot()
+    return report
+
+MAX_BATCH_POINTS = 1000
+
+
+class BatchDistanceQuery(BaseModel):
+    points: List[DistanceQuery]
+    phrase: bool = False
+
+
+@app.post("/closest-objects/")
+def get_closest_objects(query: BatchDistanceQuery):
+    """
+    Query the closest object to each of many points in one call.
+
+    Every point is resolved against the shared spatial index in one batch. The
+    structured results are always returned; with ``phrase`` set the LLM is
+    asked once to describe them all.
     """
-    cursor.execute(query, (latitude, latitude, longitude, longitude))
-    result = cursor.fetchone()
-    conn.close()
+    if len(query.points) > MAX_BATCH_POINTS:
+        return FastJSONResponse({"error": f"At most {MAX_BATCH_POINTS} points per request."}, status_code=413)
+
+    latitudes = [point.latitude for point in query.points]
+    longitudes = [point.longitude for point in query.points]
+    matches = spatial_index.load(DATABASE_PATH).nearest_many(latitudes, longitudes)
+    results = [
+        {"latitude": latitude, "longitude": longitude, "name": None} if match is None else {
+            "latitude": latitude, "longitude": longitude, "name": match[0],
+            "object_latitude": match[1], "object_longitude": match[2], "course": match[3], "distance": match[4],
+        }
+        for latitude, longitude, match in zip(latitudes, longitudes, matches)
+    ]
+    if not query.phrase:
+        return {"results": results}
 
-    if not result:
-        return {"error": "No objects found in the database."}
+    lines = [
+        f"{i}. ({r['latitude']}, {r['longitude']}): {r['name']} at {r['object_latitude']}, "
+        f"{r['object_longitude']} on course {r['course']}, approximately {r['distance']:.2f} units away."
+        for i, r in enumerate(results, start=1) if r["name"] is not None
+    ]
+    prompt = "The closest objects to each of these points are:\n" + "\n".join(lines)
+    response = get_dispatcher().complete("gpt-4", [{"role": "system", "content": prompt}])
+    return {"results": results, "result": response['choices'][0]['message']['content']}
 
-    name, obj_lat, obj_lon, course, distance = result
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
 
-    # Construct GPT prompt
-    prompt = (
-        f"The closest object to latitude {latitude} and longitude {longitude} is "
-        f"{name} located at {obj_lat}, {obj_lon} on course {course}. "
-        f"The approximate distance is {distance:.2f} units."
-    )
 
-    # Query GPT
-    response = ChatCompletion.create(
-        model="gpt-4",
-        messages=[{"role": "system", "content": prompt}]
-    )
+def live_round_message_error(message):
+    """Why a live-round message is malformed, or None when its fields have the right types."""
+    if not isinstance(message, dict):
+        return "Messages must be JSON objects"
+    kind = message.get("type")
+    if kind in ("start", "hole"):
+        if kind == "start" and (not isinstance(message.get("golfer_id"), int) or isinstance(message["golfer_id"], bool)):
+            return "golfer_id must be an integer"
+        hole = message.get("hole", 1 if kind == "start" else None)
+        if not isinstance(hole, int) or isinstance(hole, bool):
+            return "hole must be an integer"
+        if kind == "start" and not isinstance(message.get("course"), (str, type(None))):
+            return "course must be a string"
+        green = message.get("green")
+        if green is not None and not (isinstance(green, list) and len(green) == 2 and all(map(_is_number, green))):
+            return "green must be [latitude, longitude]"
+    elif kind == "fix":
+        if not (_is_number(message.get("latitude")) and _is_number(message.get("longitude"))):
+            return "latitude and longitude must be numbers"
+        if message.get("elevation_change") is not None and not _is_number(message["elevation_change"]):
+            return "elevation_change must be a number"
+    return None
 
-    return {"result": response['choices'][0]['message']['content']}
+@app.websocket("/live-round/")
+async def live_round_session(websocket: WebSocket):
+    """
+    Live round mode over one WebSocket.
+
+    The client sends {"type": "start", "golfer_id", "course", "hole"[, "green": [lat, lon]]},
+    then {"type": "fix", "latitude", "longitude"[, "elevation_change"]} for each GPS update and
+    {"type": "hole", "hole"[, "green"]} when moving on. The server answers with
+    {"type": "recommendation", ...} only when the club or distance band changes.
+    """
+    await websocket.accept()
+    session = None
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                error = live_round_message_error(message)
+                if error is not None:
+                    await websocket.send_json({"type": "error", "error": error})
+                elif message.get("type") == "start":
+                    session = await run_in_threadpool(
+                        live_round.LiveRound.start, GOLFERS_DATABASE_PATH, DATABASE_PATH,
+                        message["golfer_id"], message.get("course"), message.get("hole", 1), message.get("green")
+                    )
+                    await websocket.send_json({"type": "started", "holes": sorted(session.greens)})
+                elif session is None:
+                    await websocket.send_json({"type": "error", "error": "Send a start message first"})
+                elif message.get("type") == "hole":
+                    session.set_hole(message["hole"], message.get("green"))
+                elif message.get("type") == "fix":
+                    recommendation = await run_in_threadpool(
+                        session.update, message["latitude"], message["longitude"], message.get("elevation_change")
+                    )
+                    if recommendation is not None:
+                        await websocket.send_json({"type": "recommendation", **recommendation})
+                else:
+                    await websocket.send_json({"type": "error", "error": f"Unknown message type {message.get('type')!r}"})
+            except (KeyError, TypeError, ValueError) as e:
+                await websocket.send_json({"type": "error", "error": str(e)})
+            except sqlite3.Error:
+                logging.exception("Live round database error")
+                await websocket.send_json({"type": "error", "error": "Database error, try again"})
+    except WebSocketDisconnect:
+        pass
 
 @app.get("/plugin-manifest/")
 def get_plugin_manifest():
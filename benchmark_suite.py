@@ -0,0 +1,315 @@
+"""In-process latency and throughput benchmarks for the hot endpoints.
+
+Runs the Flask app through its test client and the GPT plugin through
+FastAPI's TestClient against a seeded synthetic database (see
+``synthetic_data.py``). Weather and the LLM are replaced with local stubs so
+only our own code is measured; a cold interpreter start that imports the app
+and calls ``create_app()`` is timed as the ``startup`` case. The plugin's LLM
+dispatcher runs unthrottled; ``llm_dispatch_rate_limited`` times its rate
+limiter separately. Results are written as JSON and can be compared against a
+run from another commit:
+
+    python benchmark_suite.py --scale small --output after.json --compare before.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import sqlite3
+
+import numpy as np
+
+import json_provider
+import llm_dispatch
+import shot_simulator
+import synthetic_data
+
+DEFAULT_DB = 'benchmark.db'
+DEFAULT_OUTPUT = 'benchmark_results.json'
+ITERATIONS = 200
+WARMUP = 10
+MAX_REGRESSION = 0.20  # fail --compare when p95 grows by more than 20%
+STARTUP_RUNS = 5
+STARTUP_SNIPPET = "import app; app.create_app()"
+LIMITED_RATE = 500  # calls/s for the dispatcher rate-limit case, fast enough to keep the run short
+
+STUB_WEATHER = {
+    "temperature": 18.0,
+    "humidity": 60,
+    "wind_speed": 4.0,
+    "wind_direction": 225,
+    "condition": "scattered clouds",
+}
+
+
+def stub_weather(lat, lon, api_key=None):
+    """Weather stub: fixed conditions, no network."""
+    return dict(STUB_WEATHER)
+
+
+class StubChatCompletion:
+    """LLM stub that echoes the prompt back in the OpenAI response shape."""
+
+    calls = 0
+
+    @classmethod
+    def create(cls, model=None, messages=None, **kwargs):
+        cls.calls += 1
+        return {"choices": [{"message": {"role": "assistant", "content": messages[-1]["content"]}}]}
+
+
+def load_flask_app(db_path):
+    """Build the Flask app pointed at ``db_path`` with weather stubbed."""
+    import functional
+    import app as flask_app
+
+    functional.DATABASE = db_path
+    functional.get_weather = stub_weather
+    return flask_app.create_app({'DATABASE': db_path, 'LOG_FILE': None}).test_client()
+
+
+def load_plugin_client(db_path):
+    """Import the GPT plugin pointed at ``db_path`` with the LLM stubbed, or None if unavailable."""
+    try:
+        from fastapi.testclient import TestClient
+        plugin = importlib.import_module('backend.gpt_plugin_backend')
+    except ImportError as e:
+        print(f"Skipping plugin benchmarks: {e}", file=sys.stderr)
+        return None
+    plugin.DATABASE_PATH = db_path
+    plugin.ChatCompletion = StubChatCompletion
+    # Unthrottled, so the LLM cases measure our code path rather than the rate limiter
+    plugin._dispatcher = llm_dispatch.Dispatcher(plugin.create_completion, max_queue=ITERATIONS, rate=None)
+    return TestClient(plugin.app)
+
+
+def build_cases(flask_client, plugin_client, scale, rng):
+    """Return ``{name: callable}``; each callable issues one request and returns its status code."""
+    golfers = scale['golfers']
+
+    def recommend_shot():
+        return flask_client.post('/recommend_shot', json={
+            "golfer_id": int(rng.integers(1, golfers + 1)),
+            "target_distance": float(rng.uniform(80, 260)),
+            "elevation_change": float(rng.uniform(-10, 10)),
+            "wind_speed": float(rng.uniform(0, 8)),
+        }).status_code
+
+    def get_shot_history():
+        return flask_client.get('/get_shot_history', query_string={
+            "golfer_id": int(rng.integers(1, golfers + 1)),
+        }).status_code
+
+    def get_profile():
+        return flask_client.get('/get_profile', query_string={
+            "email": f"golfer{int(rng.integers(1, golfers + 1))}@example.com",
+        }).status_code
+
+    def get_courses():
+        return flask_client.get('/get_courses').status_code
+
+    # A full 14-club bag through the simulator alone, without the request around it
+    bag = [{"club_name": f"club_{i}", "carry_distance": 100 + 12 * i, "rollout_distance": 5 + i,
+            "dispersion_radius": 6 + i} for i in range(14)]
+
+    def simulate_full_bag():
+        shot_simulator.recommend_club(bag, float(rng.uniform(80, 260)), wind_speed=5, wind_direction=45,
+                                      elevation_change=3)
+        return 200
+
+    cases = {
+        'recommend_shot': recommend_shot,
+        'simulate_full_bag': simulate_full_bag,
+        'get_shot_history': get_shot_history,
+        'get_profile': get_profile,
+        'get_courses': get_courses,
+    }
+
+    if plugin_client is not None:
+        def closest_object(mode):
+            return lambda: plugin_client.get('/closest-object/', params={
+                "latitude": float(rng.uniform(25.0, 48.0)),
+                "longitude": float(rng.uniform(-123.0, -70.0)),
+                "mode": mode,
+            }).status_code
+
+        cases['closest_object'] = closest_object('llm')
+        cases['closest_object_template'] = closest_object('template')
+
+    # The dispatcher's own limiter, on purpose: distinct prompts paced at LIMITED_RATE with no burst
+    limited = llm_dispatch.Dispatcher(StubChatCompletion.create, rate=LIMITED_RATE, burst=1)
+    prompts = iter(range(sys.maxsize))
+
+    def llm_dispatch_rate_limited():
+        limited.complete("gpt-4", [{"role": "user", "content": f"prompt {next(prompts)}"}])
+        return 200
+
+    cases['llm_dispatch_rate_limited'] = llm_dispatch_rate_limited
+    return cases
+
+
+def build_serialization_cases(db_path):
+    """Encode the largest payloads (busiest golfer's shot history, full course catalog) with both encoders."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        golfer_id = conn.execute(
+            "SELECT golfer_id FROM shot_tracking GROUP BY golfer_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        payloads = {
+            'shot_history': {"shots": conn.execute("SELECT * FROM shot_tracking WHERE golfer_id = ?", (golfer_id,)).fetchall()},
+            'course_catalog': {"courses": conn.execute("SELECT * FROM courses").fetchall()},
+        }
+    finally:
+        conn.close()
+
+    def encoder(encode, payload):
+        def call():
+            encode(payload)
+            return 200
+        return call
+
+    cases = {}
+    for name, payload in payloads.items():
+        cases[f'json_{name}'] = encoder(json_provider.dumps, payload)
+        cases[f'json_{name}_stdlib'] = encoder(json_provider.stdlib_dumps, payload)
+    return cases
+
+
+def measure(call, iterations=ITERATIONS, warmup=WARMUP):
+    """Time ``iterations`` calls and summarise latency percentiles and throughput."""
+    for _ in range(warmup):
+        call()
+    latencies = np.empty(iterations)
+    errors = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        status = call()
+        latencies[i] = time.perf_counter() - t0
+        if status >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "mean_ms": round(float(latencies.mean() * 1000), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput_rps": round(iterations / elapsed, 1),
+    }
+
+
+def measure_startup(runs=STARTUP_RUNS, snippet=STARTUP_SNIPPET):
+    """Time a cold ``python -c snippet`` (interpreter plus app import and factory) in fresh processes."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    latencies = np.empty(runs)
+    for i in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', snippet], check=True, env=env, cwd=root)
+        latencies[i] = time.perf_counter() - t0
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "iterations": runs,
+        "errors": 0,
+        "mean_ms": round(float(latencies.mean() * 1000), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput_rps": round(runs / latencies.sum(), 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(db_path=DEFAULT_DB, scale=None, seed=0, iterations=ITERATIONS, only=None):
+    """Generate (or reuse) the synthetic database and benchmark every case."""
+    scale = scale or synthetic_data.SCALES['small']
+    synthetic_data.ensure(db_path, seed=seed, **scale)
+    db_path = os.path.abspath(db_path)
+
+    rng = np.random.default_rng(seed)
+    cases = build_cases(load_flask_app(db_path), load_plugin_client(db_path), scale, rng)
+    cases.update(build_serialization_cases(db_path))
+    # Cold start is benchmarked alongside the endpoints so --compare catches import-time regressions
+    cases['startup'] = measure_startup
+    results = {}
+    for name, call in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = call() if call is measure_startup else measure(call, iterations)
+        print(f"{name:28s} p50 {results[name]['p50_ms']:8.3f} ms  p95 {results[name]['p95_ms']:8.3f} ms  "
+              f"p99 {results[name]['p99_ms']:8.3f} ms  {results[name]['throughput_rps']:8.1f} req/s")
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "scale": dict(scale, seed=seed),
+        "results": results,
+    }
+
+
+def compare(current, baseline, max_regression=MAX_REGRESSION):
+    """Print p95 changes against ``baseline`` and return the names of regressed cases."""
+    regressed = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        ratio = result["p95_ms"] / before["p95_ms"] if before["p95_ms"] else float('inf')
+        flag = ""
+        if ratio > 1 + max_regression:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:28s} p95 {before['p95_ms']:8.3f} -> {result['p95_ms']:8.3f} ms ({ratio - 1:+.1%}){flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CaddyGPT endpoints in-process.")
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--scale', choices=sorted(synthetic_data.SCALES), default='small')
+    parser.add_argument('--golfers', type=int)
+    parser.add_argument('--shots', type=int)
+    parser.add_argument('--locations', type=int)
+    parser.add_argument('--courses', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=ITERATIONS)
+    parser.add_argument('--case', dest='cases', action='append', help="Only run this case (repeatable)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', help="Baseline results JSON from another commit")
+    parser.add_argument('--max-regression', type=float, default=MAX_REGRESSION)
+    args = parser.parse_args(argv)
+
+    scale = dict(synthetic_data.SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    report = run(args.db, scale, args.seed, args.iterations, args.cases)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Failure-rate circuit breaker for calls to flaky upstream services.
+
+Outcomes are tracked over a sliding ``window_seconds``. Once at least
+``min_calls`` were made and the share of failures reaches ``failure_rate``
+the circuit opens and :meth:`CircuitBreaker.allow` refuses calls for
+``open_seconds``. After that a single probe is let through (half-open): its
+success closes the circuit, its failure opens it for another period.
+"""
+import collections
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_rate=0.5, min_calls=5, window_seconds=60.0, open_seconds=30.0, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = None
+        self._outcomes = collections.deque()    # (time, succeeded)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream now; in half-open state only one probe at a time."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, succeeded):
+        """Record the outcome of an allowed call."""
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._probing = False
+                self._outcomes.clear()
+                if succeeded:
+                    self.state = CLOSED
+                else:
+                    self.state, self.opened_at = OPEN, now
+                return
+            self._outcomes.append((now, succeeded))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self.state, self.opened_at = OPEN, now
+
+    def snapshot(self):
+        with self._lock:
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {"state": self.state, "calls": len(self._outcomes), "failures": failures}
@@ -0,0 +1,48 @@
+"""In-memory course catalog behind ``/get_courses``.
+
+The catalog is small and read on every course picker keystroke, so it is
+loaded once (before forking in production, see ``server.py``) and searched in
+memory. Each search compares the table's row count and highest id against
+the loaded copy, so courses added by a KML upload in any worker show up on
+the next request.
+"""
+import sqlite3
+import threading
+
+_catalogs = {}
+_lock = threading.Lock()
+
+
+def catalog_version(conn):
+    return conn.execute("SELECT COUNT(*), MAX(id) FROM courses").fetchone()
+
+
+def load(db_path):
+    """Read every course into memory and return the catalog entries."""
+    conn = sqlite3.connect(db_path)
+    try:
+        version = catalog_version(conn)
+        entries = [
+            (name.lower(), {"name": name, "location": location})
+            for name, location in conn.execute("SELECT name, location FROM courses ORDER BY id")
+        ]
+    finally:
+        conn.close()
+    with _lock:
+        _catalogs[db_path] = (version, entries)
+    return entries
+
+
+def search(query, db_path):
+    """Courses whose name contains ``query`` (case-insensitive), like ``name LIKE '%query%'``."""
+    cached = _catalogs.get(db_path)
+    if cached is not None:
+        conn = sqlite3.connect(db_path)
+        try:
+            if catalog_version(conn) != cached[0]:
+                cached = None
+        finally:
+            conn.close()
+    entries = cached[1] if cached is not None else load(db_path)
+    needle = (query or '').lower()
+    return [course for name, course in entries if needle in name]
@@ -0,0 +1,131 @@
+"""Compact binary storage for KML-imported course geometry.
+
+Each Placemark geometry is stored in ``course_features`` as packed
+little-endian float64 ``(lon, lat)`` pairs in a BLOB, with the start offset of
+every ring (polygon boundaries, or the parts of a multi-part line) packed as
+int32 in a second BLOB. The bounding box and centroid sit in plain columns
+next to it, so spatial filters never touch the blobs, and :func:`decode`
+turns a row back into NumPy views over the stored bytes without copying or
+parsing XML.
+"""
+import re
+
+import numpy as np
+
+COORD_DTYPE = np.dtype('<f8')
+OFFSET_DTYPE = np.dtype('<i4')
+EARTH_RADIUS_YARDS = 6_371_008.8 / 0.9144
+
+# Hole number in a marker or Placemark name such as "Hole 7 Green Center"
+HOLE_NAME = re.compile(r'\bHole\s+(\d+)\b', re.IGNORECASE)
+
+FEATURE_COLUMNS = ("id, course_id, name, geom_type, coords, ring_offsets, "
+                   "min_lon, min_lat, max_lon, max_lat, centroid_lon, centroid_lat")
+
+
+def centroid(geom_type, rings):
+    """Area-weighted centroid for polygons, length-weighted for lines, mean for points."""
+    outer = rings[0]
+    if geom_type == 'Polygon' and len(outer) >= 3:
+        # Shoelace formula relative to the first vertex to avoid cancellation at large longitudes
+        origin = outer[0]
+        x, y = (outer - origin).T
+        x1, y1 = np.roll(x, -1), np.roll(y, -1)
+        cross = x * y1 - x1 * y
+        area = cross.sum() / 2
+        if abs(area) > 1e-15:
+            return (float(origin[0] + ((x + x1) * cross).sum() / (6 * area)),
+                    float(origin[1] + ((y + y1) * cross).sum() / (6 * area)))
+    if geom_type == 'LineString' and len(outer) >= 2:
+        lengths = np.hypot(*np.diff(outer, axis=0).T)
+        if lengths.sum() > 0:
+            midpoints = (outer[1:] + outer[:-1]) / 2
+            return tuple(float(v) for v in (midpoints * lengths[:, None]).sum(axis=0) / lengths.sum())
+    return tuple(float(v) for v in outer.mean(axis=0))
+
+
+def haversine_yards(latitudes, longitudes, marker_latitudes, marker_longitudes):
+    """Distances in yards from every position (radians) to every marker (radians), shape (positions, markers)."""
+    phi1 = latitudes[:, None]
+    phi2 = marker_latitudes[None, :]
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin((marker_longitudes[None, :] - longitudes[:, None]) / 2) ** 2)
+    return 2 * EARTH_RADIUS_YARDS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def encode(geom_type, rings):
+    """Pack a geometry; returns a dict of the ``course_features`` columns (minus ids and name)."""
+    arrays = [np.asarray(ring, dtype=COORD_DTYPE).reshape(-1, 2) for ring in rings]
+    coords = np.concatenate(arrays)
+    offsets = np.cumsum([0] + [len(ring) for ring in arrays[:-1]]).astype(OFFSET_DTYPE)
+    min_lon, min_lat = coords.min(axis=0)
+    max_lon, max_lat = coords.max(axis=0)
+    centroid_lon, centroid_lat = centroid(geom_type, arrays)
+    return {
+        "geom_type": geom_type,
+        "coords": coords.tobytes(),
+        "ring_offsets": offsets.tobytes() if len(arrays) > 1 else None,
+        "min_lon": float(min_lon), "min_lat": float(min_lat),
+        "max_lon": float(max_lon), "max_lat": float(max_lat),
+        "centroid_lon": centroid_lon, "centroid_lat": centroid_lat,
+    }
+
+
+def decode(coords, ring_offsets=None):
+    """Return the rings of a stored geometry as ``(n, 2)`` (lon, lat) views over the blob."""
+    points = np.frombuffer(memoryview(coords), dtype=COORD_DTYPE).reshape(-1, 2)
+    if ring_offsets is None:
+        return [points]
+    starts = np.frombuffer(memoryview(ring_offsets), dtype=OFFSET_DTYPE).tolist()
+    return [points[start:end] for start, end in zip(starts, starts[1:] + [len(points)])]
+
+
+def store_features(conn, course_id, placemarks):
+    """Insert every Placemark geometry for ``course_id`` with one ``executemany``; returns the row count.
+
+    Placemarks may carry ``key`` and ``hash`` (see ``kml_import.py``), which are
+    stored so later re-imports can tell which Placemarks changed.
+    """
+    rows = []
+    for placemark in placemarks:
+        for geometry in placemark.get('geometries', []):
+            packed = encode(geometry['type'], geometry['rings'])
+            rows.append((course_id, placemark['name'], packed['geom_type'], packed['coords'], packed['ring_offsets'],
+                         packed['min_lon'], packed['min_lat'], packed['max_lon'], packed['max_lat'],
+                         packed['centroid_lon'], packed['centroid_lat'], placemark.get('key'), placemark.get('hash')))
+    conn.executemany(
+        """
+        INSERT INTO course_features (course_id, name, geom_type, coords, ring_offsets,
+                                     min_lon, min_lat, max_lon, max_lat, centroid_lon, centroid_lat,
+                                     placemark_key, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows
+    )
+    return len(rows)
+
+
+def features_in_bbox(conn, min_lon, min_lat, max_lon, max_lat, course_id=None):
+    """Rows whose bounding box intersects the given box, filtered on the bbox columns only."""
+    sql = f"""
+        SELECT {FEATURE_COLUMNS} FROM course_features
+        WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?
+    """
+    params = [min_lat, max_lat, min_lon, max_lon]
+    if course_id is not None:
+        sql += " AND course_id = ?"
+        params.append(course_id)
+    return conn.execute(sql, params).fetchall()
+
+
+def course_markers(conn, course):
+    """``(name, latitude, longitude)`` per stored feature of the course named ``course``, at its centroid.
+
+    Courses imported from several files contribute the features of each.
+    """
+    return conn.execute("""
+        SELECT f.name, f.centroid_lat, f.centroid_lon FROM course_features f
+        JOIN courses c ON c.id = f.course_id
+        WHERE c.name = ?
+        ORDER BY f.id
+    """, (course,)).fetchall()
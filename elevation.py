@@ -0,0 +1,223 @@
+"""Local elevation model (DEM) for automatic ``elevation_change``.
+
+The raster is stored as a ``.npy`` file of float32 heights in metres, cut into
+square tiles (shape ``tiles_down x tiles_across x TILE x TILE``) so the four
+cells around a point usually share one tile and one page of the memory map.
+A ``georef.json`` beside it holds the georeference: the latitude and
+longitude of the north-west sample and the spacing between samples in
+degrees. Both files live in a version directory and ``<path>`` is a symlink
+to the current one, so an import swaps raster and georeference together.
+Workers memory-map the file on first use and answer lookups with vectorized
+bilinear sampling; points off the raster or on no-data cells come back as NaN.
+
+Build the file from a plain 2-D ``.npy`` grid or, with rasterio installed, a
+GeoTIFF: ``python elevation.py import dem.tif``.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import rasterio
+except ImportError:  # rasterio is optional, only needed to import GeoTIFFs
+    rasterio = None
+
+DEM_PATH = os.getenv('ELEVATION_DEM_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dem'))
+TILE = 256
+METRES_TO_YARDS = 1 / 0.9144
+EDGE_TOLERANCE = 1e-6         # cells
+
+_models = {}
+_lock = threading.Lock()
+
+
+class ElevationModel:
+    """A tiled height raster with its georeference."""
+
+    def __init__(self, tiles, north, west, cell_lat, cell_lon, rows, cols):
+        self.tiles = tiles
+        # Plain ndarray view over the same mapping; indexing an np.memmap is several times slower
+        self._grid = tiles.view(np.ndarray)
+        self.tile = tiles.shape[-1]
+        self.north, self.west = north, west
+        self.cell_lat, self.cell_lon = cell_lat, cell_lon
+        self.rows, self.cols = rows, cols
+
+    @classmethod
+    def open(cls, path):
+        # Resolve the symlink once so both files come from the same version
+        version = os.path.realpath(path)
+        with open(os.path.join(version, 'georef.json')) as f:
+            meta = json.load(f)
+        tiles = np.load(os.path.join(version, 'tiles.npy'), mmap_mode='r')
+        tile, rows, cols = meta['tile'], meta['rows'], meta['cols']
+        if (tiles.ndim != 4 or tiles.shape[2:] != (tile, tile)
+                or tiles.shape[:2] != (-(-rows // tile), -(-cols // tile))):
+            raise ValueError(f"DEM tiles {tiles.shape} do not match {rows}x{cols} samples in {tile}-tiles")
+        return cls(tiles, meta['north'], meta['west'], meta['cell_lat'], meta['cell_lon'], rows, cols)
+
+    def _at(self, rows, cols):
+        tile = self.tile
+        return self._grid[rows // tile, cols // tile, rows % tile, cols % tile]
+
+    def sample(self, latitudes, longitudes):
+        """Bilinearly interpolated heights in metres (NaN off the raster), same shape as the inputs."""
+        latitudes, longitudes = np.broadcast_arrays(np.asarray(latitudes, dtype=np.float64),
+                                                    np.asarray(longitudes, dtype=np.float64))
+        row = ((self.north - latitudes) / self.cell_lat).ravel()
+        col = ((longitudes - self.west) / self.cell_lon).ravel()
+        # Tolerate float error on the outermost samples
+        inside = ((row >= -EDGE_TOLERANCE) & (row <= self.rows - 1 + EDGE_TOLERANCE)
+                  & (col >= -EDGE_TOLERANCE) & (col <= self.cols - 1 + EDGE_TOLERANCE))
+        row0 = np.clip(np.floor(row), 0, self.rows - 2).astype(np.intp)
+        col0 = np.clip(np.floor(col), 0, self.cols - 2).astype(np.intp)
+        fr = np.clip(row - row0, 0.0, 1.0)
+        fc = np.clip(col - col0, 0.0, 1.0)
+        heights = ((self._at(row0, col0) * (1 - fc) + self._at(row0, col0 + 1) * fc) * (1 - fr)
+                   + (self._at(row0 + 1, col0) * (1 - fc) + self._at(row0 + 1, col0 + 1) * fc) * fr)
+        heights = np.where(inside, heights, np.nan)
+        return heights.reshape(latitudes.shape)
+
+    def height(self, latitude, longitude):
+        """Scalar :meth:`sample` in plain Python, for single lookups where NumPy call overhead dominates."""
+        row = (self.north - latitude) / self.cell_lat
+        col = (longitude - self.west) / self.cell_lon
+        if not (-EDGE_TOLERANCE <= row <= self.rows - 1 + EDGE_TOLERANCE
+                and -EDGE_TOLERANCE <= col <= self.cols - 1 + EDGE_TOLERANCE):
+            return math.nan
+        row0 = min(max(int(row), 0), self.rows - 2)
+        col0 = min(max(int(col), 0), self.cols - 2)
+        fr = min(max(row - row0, 0.0), 1.0)
+        fc = min(max(col - col0, 0.0), 1.0)
+        tile, grid = self.tile, self._grid
+        h00, h01, h10, h11 = (float(grid[r // tile, c // tile, r % tile, c % tile])
+                              for r, c in ((row0, col0), (row0, col0 + 1), (row0 + 1, col0), (row0 + 1, col0 + 1)))
+        return (h00 * (1 - fc) + h01 * fc) * (1 - fr) + (h10 * (1 - fc) + h11 * fc) * fr
+
+    def elevation_change(self, from_lat, from_lon, to_lat, to_lon):
+        """Rise in yards from each player position to its target, with one sampling pass for both ends."""
+        if all(np.ndim(value) == 0 for value in (from_lat, from_lon, to_lat, to_lon)):
+            return (self.height(to_lat, to_lon) - self.height(from_lat, from_lon)) * METRES_TO_YARDS
+        lats = np.stack(np.broadcast_arrays(np.asarray(from_lat, dtype=np.float64), np.asarray(to_lat, dtype=np.float64)))
+        lons = np.stack(np.broadcast_arrays(np.asarray(from_lon, dtype=np.float64), np.asarray(to_lon, dtype=np.float64)))
+        heights = self.sample(lats, lons)
+        return (heights[1] - heights[0]) * METRES_TO_YARDS
+
+
+def save_dem(heights, north, west, cell_lat, cell_lon, path=DEM_PATH, nodata=None, tile=TILE):
+    """Tile a 2-D height grid (metres, first row northmost) and atomically install it with its georeference."""
+    heights = np.asarray(heights, dtype=np.float32)
+    if nodata is not None:
+        heights = np.where(heights == nodata, np.nan, heights)
+    rows, cols = heights.shape
+    if rows < 2 or cols < 2:
+        raise ValueError("DEM needs at least 2x2 samples")
+    down, across = -(-rows // tile), -(-cols // tile)
+    padded = np.full((down * tile, across * tile), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = heights
+    tiles = np.ascontiguousarray(padded.reshape(down, tile, across, tile).swapaxes(1, 2))
+
+    directory, name = os.path.split(os.path.abspath(path))
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    version = tempfile.mkdtemp(dir=directory, prefix=name + '.')
+    link = version + '.link'
+    try:
+        np.save(os.path.join(version, 'tiles.npy'), tiles)
+        with open(os.path.join(version, 'georef.json'), 'w') as f:
+            json.dump({'north': north, 'west': west, 'cell_lat': cell_lat, 'cell_lon': cell_lon,
+                       'rows': rows, 'cols': cols, 'tile': tile}, f)
+        # Renaming a fresh symlink over the old one is the single atomic switch
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, path)
+    except BaseException:
+        if os.path.lexists(link):
+            os.unlink(link)
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+    # Keep the version just replaced for readers that resolved the link a moment ago; drop older ones
+    for entry in os.listdir(directory):
+        older = os.path.join(directory, entry)
+        if (entry.startswith(name + '.') and os.path.isdir(older) and not os.path.islink(older)
+                and older not in (version, previous)):
+            shutil.rmtree(older, ignore_errors=True)
+    invalidate(path)
+    return path
+
+
+def load(path=None):
+    """Return the (cached) memory-mapped elevation model, or None when no DEM is installed."""
+    path = path or DEM_PATH
+    model = _models.get(path)
+    if model is None:
+        if not os.path.exists(path):
+            return None
+        model = ElevationModel.open(path)
+        with _lock:
+            _models[path] = model
+    return model
+
+
+def invalidate(path=None):
+    """Drop cached models so the next lookup re-opens the DEM file."""
+    with _lock:
+        if path is None:
+            _models.clear()
+        else:
+            _models.pop(path, None)
+
+
+def elevation_change(from_lat, from_lon, to_lat, to_lon, path=None):
+    """Rise in yards from player to target; 0 when no DEM covers either point."""
+    model = load(path)
+    if model is None:
+        return 0.0 if np.ndim(from_lat) == 0 else np.zeros(np.shape(from_lat))
+    change = model.elevation_change(from_lat, from_lon, to_lat, to_lon)
+    if np.ndim(change) == 0:
+        return 0.0 if math.isnan(change) else float(change)
+    return np.nan_to_num(change)
+
+
+def _read_source(source):
+    if source.endswith('.npy'):
+        return np.load(source), None
+    if rasterio is None:
+        raise SystemExit("Importing GeoTIFFs requires rasterio (pip install rasterio), or pass a .npy grid")
+    with rasterio.open(source) as dataset:
+        transform = dataset.transform
+        # rasterio georeferences pixel corners; samples sit at pixel centres
+        georef = {'north': transform.f + transform.e / 2, 'west': transform.c + transform.a / 2,
+                  'cell_lat': -transform.e, 'cell_lon': transform.a}
+        return dataset.read(1), dict(georef, nodata=dataset.nodata)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the tiled elevation model from a DEM grid.")
+    parser.add_argument('command', choices=('import',))
+    parser.add_argument('source', help="GeoTIFF (needs rasterio) or 2-D .npy grid in metres")
+    parser.add_argument('--output', default=DEM_PATH)
+    parser.add_argument('--north', type=float, help="Latitude of the first row (.npy input)")
+    parser.add_argument('--west', type=float, help="Longitude of the first column (.npy input)")
+    parser.add_argument('--cell', type=float, help="Sample spacing in degrees (.npy input)")
+    parser.add_argument('--nodata', type=float)
+    args = parser.parse_args(argv)
+
+    heights, georef = _read_source(args.source)
+    if georef is None:
+        if None in (args.north, args.west, args.cell):
+            parser.error("--north, --west and --cell are required for .npy input")
+        georef = {'north': args.north, 'west': args.west, 'cell_lat': args.cell, 'cell_lon': args.cell,
+                  'nodata': args.nodata}
+    elif args.nodata is not None:
+        georef['nodata'] = args.nodata
+    path = save_dem(heights, path=args.output, **georef)
+    print(f"Wrote {heights.shape[0]}x{heights.shape[1]} elevation model to {path}")
+
+
+if __name__ == '__main__':
+    main()
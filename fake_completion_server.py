@@ -0,0 +1,110 @@
+"""Local stand-in for an OpenAI-compatible ``/chat/completions`` API.
+
+Answers every completion with an echo of the last message after ``latency``
+seconds, and records how many calls it served and the peak number served at
+once, so tests and load runs can exercise ``llm_dispatch`` without the real
+API. ``latency`` and ``status`` (an HTTP error code to return instead) can be
+changed while the server runs.
+
+    python fake_completion_server.py --port 8099 --latency 0.5
+    LLM_BASE_URL=http://127.0.0.1:8099/v1 gunicorn ... server:plugin
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeCompletionServer:
+    def __init__(self, latency=0.0, status=None, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.status = status
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with fake._lock:
+                    fake.calls += 1
+                    fake.active += 1
+                    fake.peak = max(fake.peak, fake.active)
+                try:
+                    time.sleep(fake.latency)
+                    if fake.status is not None:
+                        self._send(fake.status, {"error": {"message": "injected failure"}})
+                    elif not self.path.endswith('/chat/completions'):
+                        self._send(404, {"error": {"message": "not found"}})
+                    else:
+                        content = body.get('messages', [{}])[-1].get('content', '')
+                        self._send(200, {
+                            "object": "chat.completion",
+                            "model": body.get('model'),
+                            "choices": [{"index": 0, "finish_reason": "stop",
+                                         "message": {"role": "assistant", "content": f"echo: {content}"}}],
+                        })
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-completions', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake chat completions with injectable latency.")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds before each answer")
+    parser.add_argument('--status', type=int, help="Answer every call with this HTTP error status")
+    args = parser.parse_args(argv)
+
+    server = FakeCompletionServer(args.latency, args.status, port=args.port)
+    print(f"Serving fake completions at {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
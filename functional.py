@@ -7,52 +7,55 @@ LOG_FILE_PATH = os.path.join(os.path.dirname(__file__), 'backend_debug.log')
 
 logging.basicConfig(filename=LOG_FILE_PATH, level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 import sqlite3
-from kml_parser.kml_parser import parse_kml
+import course_catalog
+import kml_import
 
 DATABASE = 'golfers.db'
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
+def get_db_connection(db_path=None):
+    conn = sqlite3.connect(db_path or DATABASE)
     conn.row_factory = sqlite3.Row
     return conn
 
-def get_courses_from_db(query):
-    conn = get_db_connection()
-    courses = conn.execute("SELECT * FROM courses WHERE name LIKE ?", ('%' + query + '%',)).fetchall()
-    conn.close()
+def get_courses_from_db(query, db_path=None):
+    # Served from the preloaded in-memory catalog; it reloads itself when courses change
+    courses_list = course_catalog.search(query, db_path or DATABASE)
+    logging.debug("Matched %d courses for query %r", len(courses_list), query)
+    return courses_list
 
-    # Log the raw data fetched from the database
-    logging.debug("Raw courses data: %s", courses)
-
-    # Convert rows to dictionaries for JSON compatibility
+def handle_kml_upload(file, db_path=None, course_id=None):
+    # Without course_id the file becomes a new course unless it repeats an earlier upload byte for byte;
+    # with it only the course's changed Placemarks are rewritten
+    conn = get_db_connection(db_path)
     try:
-        courses_list = [{"name": course["name"], "location": course["location"]} for course in courses]
-        logging.debug("Converted courses list: %s", courses_list)
-        return courses_list
-    except Exception as e:
-        logging.error("Error converting courses data: %s", str(e))
-        raise
-def handle_kml_upload(file):
-    parsed_data = parse_kml(file)
-    if parsed_data:
-        # Here, insert the parsed data into your database (mock insert for now)
-        conn = get_db_connection()
-        for course in parsed_data:
-            conn.execute("INSERT INTO courses (name) VALUES (?)", (course['name'],))
+        result = kml_import.import_kml(conn, file.read(), getattr(file, 'filename', None), course_id)
         conn.commit()
-        conn.close()
-        return {"message": "KML file processed successfully"}
-    else:
+    except (ValueError, LookupError):
+        # Bad file or unknown course: the caller reports these to the client
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        logging.error("Error processing KML: %s", str(e))
         return {"message": "Error processing KML file"}
+    finally:
+        conn.close()
+    return result
+
 
 
+import adjustments
+import shot_simulator
 
-import requests
+WEATHER_TIMEOUT_SECONDS = float(os.getenv('WEATHER_TIMEOUT_SECONDS', 2.0))
 
 def get_weather(lat, lon, api_key='YOUR_API_KEY'):
+    import requests  # deferred: only needed once a live weather lookup happens
+
     try:
         url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&units=metric&appid={api_key}"
-        response = requests.get(url)
+        # Bounded so a slow feed cannot hold a request (or the refresher) for long
+        response = requests.get(url, timeout=WEATHER_TIMEOUT_SECONDS)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
         data = response.json()
         # Extract relevant weather details
@@ -74,41 +77,66 @@ def recommend_shot(golfer_profile, weather, course_details):
         # Extract golfer stats
         avg_distances = golfer_profile["avg_distances"]  # Dict with club names and average distances
         dispersion = golfer_profile["dispersion"]       # Dict with club dispersion values
+        rollout = golfer_profile.get("rollout", {})     # Optional dict with club rollout distances
 
         # Extract weather data
         wind_speed = weather["wind_speed"]
         wind_direction = weather["wind_direction"]
         temperature = weather["temperature"]
+        humidity = weather.get("humidity", adjustments.REFERENCE_HUMIDITY)
 
         # Extract course details
         target_distance = course_details["target_distance"]
-        wind_factor = wind_speed * 0.1  # Simplified adjustment for wind
-
-        # Determine recommended club
-        best_club = None
+        shot_bearing = course_details.get("shot_bearing", 0)
+        elevation_change = course_details.get("elevation_change", 0)
+
+        # Plays-like adjustments from the shared lookup tables
+        headwind, crosswind = adjustments.wind_components(wind_speed, wind_direction, shot_bearing)
+        conditions = adjustments.effects(
+            target_distance, elevation_change, headwind, crosswind, temperature, humidity
+        )
+        wind_factor = -conditions["wind_effect"]  # Yards the wind adds to each club
+
+        # Simulate every club at once and pick the one most likely to finish near the target
+        clubs = [
+            {"club_name": club, "carry_distance": distance,
+             "rollout_distance": rollout.get(club, 0), "dispersion_radius": dispersion[club]}
+            for club, distance in avg_distances.items()
+        ]
+        simulation = shot_simulator.recommend_club(
+            clubs, target_distance,
+            target_radius=course_details.get("target_radius", shot_simulator.DEFAULT_TARGET_RADIUS),
+            wind_speed=wind_speed,
+            wind_direction=wind_direction,
+            shot_bearing=shot_bearing,
+            elevation_change=elevation_change,
+            temperature=temperature,
+            humidity=humidity,
+        )
+        best_club = simulation["club"] if simulation and simulation["probability"] > 0 else None
+
+        # Track the closest club as a fallback
         closest_club = None
         closest_distance_diff = float("inf")
         for club, distance in avg_distances.items():
-            adjusted_distance = distance + wind_factor  # Adjust for wind
-            distance_diff = abs(adjusted_distance - target_distance)
-            
-            if adjusted_distance >= target_distance and distance_diff < dispersion[club]:
-                best_club = club
-                break
-            elif distance_diff < closest_distance_diff:  # Track the closest club as a fallback
+            distance_diff = abs(distance - conditions["plays_like_distance"])
+            if distance_diff < closest_distance_diff:
                 closest_club = club
                 closest_distance_diff = distance_diff
 
         # Construct the response
         if best_club:
-            # Predicted shot outcome (simplified)
+            # Predicted shot outcome
             predicted_outcome = {
                 "club": best_club,
                 "carry": avg_distances[best_club],
                 "adjusted_carry": avg_distances[best_club] + wind_factor,
                 "dispersion": dispersion[best_club],
                 "wind_factor": wind_factor,
-                "temperature_adjustment": temperature * 0.05  # Example: adjustment based on temp
+                "temperature_adjustment": -conditions["temperature_effect"],
+                "plays_like_distance": conditions["plays_like_distance"],
+                "landing_probability": simulation["probability"],
+                "club_probabilities": simulation["probabilities"]
             }
             return {"success": True, "recommendation": predicted_outcome}
         else:
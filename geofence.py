@@ -0,0 +1,121 @@
+"""Per-course hole geofences built from the KML-imported course geometry.
+
+Each hole is reduced to the line from its tee to its green (the centroids of
+the "Hole N Tee" / "Hole N Green ..." Placemarks in ``course_features``),
+projected to local metres around the course. A GPS fix belongs to the hole whose line is
+nearest, as long as it is within ``MAX_OFF_HOLE_METERS``; whole batches of
+fixes are located with one vectorized pass. Holes with only one kind of
+marker fall back to the centroid of their markers.
+
+Cached fences are rebuilt when the course's features change: the KML upload
+endpoints invalidate them, and other workers notice within
+``REFRESH_SECONDS``.
+"""
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import course_geometry
+
+MAX_OFF_HOLE_METERS = 120.0
+METERS_PER_DEGREE = 111_320.0
+REFRESH_SECONDS = 30  # how often a worker checks a cached course for changed features
+
+_fences = {}
+_checked = {}
+_lock = threading.Lock()
+
+
+class CourseGeofence:
+    """Tee-to-green segments for every hole of one course."""
+
+    def __init__(self, holes, starts, ends, version=None):
+        self.version = version
+        self.holes = np.asarray(holes, dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        points = np.vstack([starts, ends]) if len(starts) else np.zeros((1, 2))
+        self.origin = points.mean(axis=0)
+        self.scale = np.array([METERS_PER_DEGREE, METERS_PER_DEGREE * np.cos(np.radians(self.origin[0]))])
+        self.starts = (starts - self.origin) * self.scale
+        self.segments = (ends - self.origin) * self.scale - self.starts
+        self.lengths = np.maximum((self.segments ** 2).sum(axis=1), 1e-9)
+
+    @classmethod
+    def from_markers(cls, markers, version=None):
+        """Build from ``(name, latitude, longitude)`` rows; names carry "Hole N" and Tee/Green."""
+        tees, greens, others = {}, {}, {}
+        for name, latitude, longitude in markers:
+            match = course_geometry.HOLE_NAME.search(name or '')
+            if not match:
+                continue
+            hole = int(match.group(1))
+            lowered = name.lower()
+            target = tees if 'tee' in lowered else greens if 'green' in lowered else others
+            target.setdefault(hole, []).append((latitude, longitude))
+        holes, starts, ends = [], [], []
+        for hole in sorted(set(tees) | set(greens) | set(others)):
+            every = tees.get(hole, []) + greens.get(hole, []) + others.get(hole, [])
+            centroid = np.mean(every, axis=0)
+            holes.append(hole)
+            starts.append(np.mean(tees[hole], axis=0) if hole in tees else centroid)
+            ends.append(np.mean(greens[hole], axis=0) if hole in greens else centroid)
+        return cls(holes, starts, ends, version)
+
+    def locate(self, latitudes, longitudes):
+        """Hole number for each fix, or 0 when it is not near any hole."""
+        points = np.column_stack([np.atleast_1d(latitudes), np.atleast_1d(longitudes)]).astype(np.float64)
+        if not len(self.holes):
+            return np.zeros(len(points), dtype=np.int64)
+        local = (points - self.origin) * self.scale
+        # Distance from every fix to every hole's segment, shape (fixes, holes)
+        offset = local[:, None, :] - self.starts[None, :, :]
+        t = np.clip((offset * self.segments).sum(axis=2) / self.lengths, 0.0, 1.0)
+        nearest = offset - t[:, :, None] * self.segments[None, :, :]
+        distance = np.sqrt((nearest ** 2).sum(axis=2))
+        best = distance.argmin(axis=1)
+        inside = distance[np.arange(len(points)), best] <= MAX_OFF_HOLE_METERS
+        return np.where(inside, self.holes[best], 0)
+
+
+def course_version(conn, course):
+    """Cheap change marker for a course's features (re-imports replace rows with higher ids)."""
+    return conn.execute("""
+        SELECT COUNT(*), MAX(f.id) FROM course_features f JOIN courses c ON c.id = f.course_id WHERE c.name = ?
+    """, (course,)).fetchone()
+
+
+def load(db_path, course):
+    """Return the (cached) geofence for ``course``, rebuilt when its features have changed."""
+    key = (db_path, course)
+    fence = _fences.get(key)
+    now = time.monotonic()
+    if fence is not None and now - _checked.get(key, 0.0) >= REFRESH_SECONDS:
+        conn = sqlite3.connect(db_path)
+        try:
+            if course_version(conn, course) != fence.version:
+                fence = None
+        finally:
+            conn.close()
+        _checked[key] = now
+    if fence is None:
+        conn = sqlite3.connect(db_path)
+        try:
+            version = course_version(conn, course)
+            fence = CourseGeofence.from_markers(course_geometry.course_markers(conn, course), version)
+        finally:
+            conn.close()
+        with _lock:
+            _fences[key] = fence
+            _checked[key] = now
+    return fence
+
+
+def invalidate(db_path=None, course=None):
+    """Drop cached geofences (all, one database's, or one course's) after a geometry import."""
+    with _lock:
+        for key in list(_fences):
+            if (db_path is None or key[0] == db_path) and (course is None or key[1] == course):
+                del _fences[key]
@@ -0,0 +1,76 @@
+"""Batched GPS track ingestion.
+
+Fixes arrive in batches (a whole field at 1 Hz), are tagged with the hole
+they fall on by the course geofence, and are appended to ``gps_points`` with
+one ``executemany`` inside a single transaction. Coordinates are stored as
+integer microdegrees and times as epoch milliseconds, which SQLite packs into
+small varints. ``golfer_positions`` keeps the newest fix per golfer under its
+primary key, so the latest position is a single key lookup.
+"""
+import numpy as np
+
+import geofence
+
+MICRODEGREES = 1_000_000
+
+
+def ingest(conn, points, course=None, db_path=None):
+    """Store a batch of ``{golfer_id, timestamp, latitude, longitude}`` fixes; returns counts and holes.
+
+    ``timestamp`` is in epoch seconds. When ``course`` and ``db_path`` (the
+    database ``conn`` is on, holding the course's KML geometry) are given
+    every fix is tagged with its hole (0 when off the course).
+    """
+    if not points:
+        return {"stored": 0, "holes": {}}
+    golfers = np.array([point["golfer_id"] for point in points], dtype=np.int64)
+    recorded = np.rint(np.array([point["timestamp"] for point in points], dtype=np.float64) * 1000).astype(np.int64)
+    latitudes = np.array([point["latitude"] for point in points], dtype=np.float64)
+    longitudes = np.array([point["longitude"] for point in points], dtype=np.float64)
+    if course is not None and db_path is not None:
+        holes = geofence.load(db_path, course).locate(latitudes, longitudes)
+    else:
+        holes = np.zeros(len(points), dtype=np.int64)
+
+    conn.executemany(
+        "INSERT INTO gps_points (golfer_id, recorded_at, latitude_e6, longitude_e6, course, hole) VALUES (?, ?, ?, ?, ?, ?)",
+        zip(golfers.tolist(), recorded.tolist(),
+            np.rint(latitudes * MICRODEGREES).astype(np.int64).tolist(),
+            np.rint(longitudes * MICRODEGREES).astype(np.int64).tolist(),
+            [course] * len(points), holes.tolist())
+    )
+
+    # Newest fix per golfer in this batch: sort by (golfer, time) and take each golfer's last row
+    order = np.lexsort((recorded, golfers))
+    last = order[np.append(golfers[order][1:] != golfers[order][:-1], True)]
+    conn.executemany(
+        """
+        INSERT INTO golfer_positions (golfer_id, recorded_at, latitude, longitude, course, hole)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (golfer_id) DO UPDATE SET
+            recorded_at = excluded.recorded_at,
+            latitude = excluded.latitude,
+            longitude = excluded.longitude,
+            course = excluded.course,
+            hole = excluded.hole
+        WHERE excluded.recorded_at >= golfer_positions.recorded_at
+        """,
+        zip(golfers[last].tolist(), recorded[last].tolist(), latitudes[last].tolist(), longitudes[last].tolist(),
+            [course] * len(last), holes[last].tolist())
+    )
+    return {
+        "stored": len(points),
+        "holes": {str(golfer): hole for golfer, hole in zip(golfers[last].tolist(), holes[last].tolist())},
+    }
+
+
+def latest_position(conn, golfer_id):
+    """Return the newest stored fix for ``golfer_id`` (timestamp in epoch seconds), or None."""
+    row = conn.execute(
+        "SELECT recorded_at, latitude, longitude, course, hole FROM golfer_positions WHERE golfer_id = ?", (golfer_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    recorded_at, latitude, longitude, course, hole = row
+    return {"golfer_id": golfer_id, "timestamp": recorded_at / 1000, "latitude": latitude,
+            "longitude": longitude, "course": course, "hole": hole}
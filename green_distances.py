@@ -0,0 +1,149 @@
+"""Front/middle/back green and hazard yardages from the imported course map.
+
+:func:`load` reads the ``locations`` table and groups every marker into
+contiguous per-hole arrays (latitude and longitude in radians plus a marker
+kind), so a lookup is a dictionary hit followed by one vectorized haversine
+pass from any number of positions to every marker on the hole. Like the
+spatial index, the map is rebuilt when the table's version changes.
+
+Green yardages: front and back are the nearest and farthest green markers,
+middle is the "Green Center" marker when one is mapped and the centroid of the
+green markers otherwise. Bunkers, water and other hazards are reported by name.
+"""
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import course_geometry
+import spatial_index
+
+GREEN, GREEN_CENTER, HAZARD, OTHER = 0, 1, 2, 3
+_HAZARD_WORDS = ('bunker', 'water', 'hazard', 'penalty', 'out of bounds')
+
+_maps = {}
+_checked = {}
+_lock = threading.Lock()
+
+
+def marker_kind(name):
+    lowered = name.lower()
+    if 'green' in lowered:
+        return GREEN_CENTER if ('center' in lowered or 'centre' in lowered or 'middle' in lowered) else GREEN
+    if any(word in lowered for word in _HAZARD_WORDS):
+        return HAZARD
+    return OTHER
+
+
+class CourseMap:
+    """Every mapped marker, grouped into one contiguous slice per (course, hole)."""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        keyed = [
+            (course, int(match.group(1)), name, latitude, longitude)
+            for name, latitude, longitude, course in rows
+            if name and (match := course_geometry.HOLE_NAME.search(name))
+        ]
+        keyed.sort(key=lambda row: (str(row[0]), row[1]))
+        self.names = [row[2] for row in keyed]
+        self.latitudes = np.radians(np.array([row[3] for row in keyed], dtype=np.float64))
+        self.longitudes = np.radians(np.array([row[4] for row in keyed], dtype=np.float64))
+        self.kinds = np.array([marker_kind(row[2]) for row in keyed], dtype=np.int8)
+        self.slices = {}
+        start = 0
+        for i in range(1, len(keyed) + 1):
+            if i == len(keyed) or keyed[i][:2] != keyed[start][:2]:
+                self.slices[keyed[start][:2]] = slice(start, i)
+                start = i
+
+    @classmethod
+    def from_db(cls, db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            version = spatial_index.location_version(conn)
+            return cls(conn.execute("SELECT Name, Latitude, Longitude, Course FROM locations").fetchall(), version)
+        finally:
+            conn.close()
+
+    def holes(self, course):
+        return sorted(hole for key_course, hole in self.slices if key_course == course)
+
+    def green_center(self, course, hole):
+        """(latitude, longitude) in degrees of the middle of the green, or None if it is not mapped."""
+        part = self.slices.get((course, int(hole)))
+        if part is None:
+            return None
+        kinds = self.kinds[part]
+        chosen = kinds == GREEN_CENTER if (kinds == GREEN_CENTER).any() else kinds == GREEN
+        if not chosen.any():
+            return None
+        return (float(np.degrees(self.latitudes[part][chosen].mean())),
+                float(np.degrees(self.longitudes[part][chosen].mean())))
+
+    def distances(self, course, hole, latitudes, longitudes):
+        """Yardages from each position to the hole's green and hazards; None if the hole has no markers."""
+        part = self.slices.get((course, int(hole)))
+        if part is None:
+            return None
+        lat = np.radians(np.atleast_1d(np.asarray(latitudes, dtype=np.float64)))
+        lon = np.radians(np.atleast_1d(np.asarray(longitudes, dtype=np.float64)))
+        kinds = self.kinds[part]
+        marker_lat, marker_lon = self.latitudes[part], self.longitudes[part]
+
+        green = kinds <= GREEN_CENTER
+        centre = kinds == GREEN_CENTER
+        if green.any() and not centre.any():
+            # No centre marker: aim at the centroid of the green edge markers
+            marker_lat = np.append(marker_lat, marker_lat[green].mean())
+            marker_lon = np.append(marker_lon, marker_lon[green].mean())
+            centre = np.append(np.zeros_like(centre), True)
+            green = np.append(green, False)
+            kinds = np.append(kinds, GREEN_CENTER)
+
+        yards = course_geometry.haversine_yards(lat, lon, marker_lat, marker_lon)
+        has_green = bool(green.any())
+        front = np.where(green, yards, np.inf).min(axis=1).round(1).tolist() if has_green else [None] * len(yards)
+        back = np.where(green, yards, -np.inf).max(axis=1).round(1).tolist() if has_green else [None] * len(yards)
+        middle = yards[:, np.argmax(centre)].round(1).tolist() if has_green else [None] * len(yards)
+        hazards = np.flatnonzero(kinds == HAZARD)
+        hazard_yards = yards[:, hazards].round(1).tolist()
+        names = self.names[part]
+        return [
+            {
+                "front": front[i],
+                "middle": middle[i],
+                "back": back[i],
+                "hazards": [{"name": names[h], "distance": d} for h, d in zip(hazards.tolist(), hazard_yards[i])],
+            }
+            for i in range(len(yards))
+        ]
+
+
+def load(db_path):
+    """Return the course map for ``db_path``, rebuilt when the locations table has changed.
+
+    Changes are looked for at most every ``spatial_index.REFRESH_SECONDS``.
+    """
+    course_map = _maps.get(db_path)
+    now = time.monotonic()
+    if course_map is not None and now - _checked.get(db_path, 0.0) >= spatial_index.REFRESH_SECONDS:
+        if spatial_index.current_version(db_path) != course_map.version:
+            course_map = None
+        _checked[db_path] = now
+    if course_map is None:
+        course_map = CourseMap.from_db(db_path)
+        with _lock:
+            _maps[db_path] = course_map
+            _checked[db_path] = now
+    return course_map
+
+
+def invalidate(db_path=None):
+    """Drop cached course maps so the next lookup re-reads the locations table."""
+    with _lock:
+        if db_path is None:
+            _maps.clear()
+        else:
+            _maps.pop(db_path, None)
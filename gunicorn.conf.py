@@ -0,0 +1,36 @@
+"""Gunicorn settings for server.py; every knob can be overridden from the environment."""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Worker sizing: processes for CPU-bound work (simulations, serialization), threads for I/O waits
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 2))
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+
+# Build shared data once in the master; workers inherit it copy-on-write
+preload_app = True
+
+# Recycle workers gradually, and give in-flight requests time to finish on reload/shutdown
+max_requests = int(os.getenv('MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 500))
+timeout = int(os.getenv('TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def on_reload(arbiter):
+    # SIGHUP: refresh the preloaded data in the master before the replacement workers fork
+    import server
+    server.preload()
+
+
+def post_fork(arbiter, worker):
+    # Background threads (weather refresher) must be started inside each worker; one of them leads
+    import server
+    server.start_worker()
@@ -0,0 +1,141 @@
+"""Hole strategy planner: club sequences that minimise expected strokes.
+
+Remaining distance to the green is discretized into bins and solved with
+value iteration over every bin at once. A solution depends only on the
+golfer's bag (carry, rollout and dispersion of each club), so it is memoized
+on the bag and shared by every golfer who carries the same clubs. Course
+plans are memoized on the bag plus the course's hole data, so any change to
+clubs or holes produces a fresh plan.
+"""
+from functools import lru_cache
+
+import numpy as np
+from numpy.polynomial.hermite_e import hermegauss
+
+DISTANCE_STEP = 5.0        # yards per bin
+MAX_DISTANCE = 700.0       # longest remaining distance planned for
+GREEN_RADIUS = 10.0        # yards; inside this the ball is on the green and putted out
+DISPERSION_SIGMAS = 2.0    # dispersion_radius covers ~2 standard deviations
+PARTIAL_DISPERSION = 0.08  # sigma of a partial wedge as a fraction of its distance
+QUADRATURE_POINTS = 5      # Gauss-Hermite points per axis for the landing distribution
+MAX_ITERATIONS = 200
+MAX_SHOTS = 8
+PARTIAL_SHOT = "Partial wedge"
+
+_distances = np.arange(0.0, MAX_DISTANCE + DISTANCE_STEP, DISTANCE_STEP)
+_nodes, _weights = hermegauss(QUADRATURE_POINTS)
+_weights = _weights / _weights.sum()
+# Every (long/short, left/right) quadrature pair, flattened
+_long = np.repeat(_nodes, QUADRATURE_POINTS)
+_lateral = np.tile(_nodes, QUADRATURE_POINTS)
+_pair_weights = np.repeat(_weights, QUADRATURE_POINTS) * np.tile(_weights, QUADRATURE_POINTS)
+
+
+def expected_putts(distance):
+    """Expected putts from ``distance`` yards: 1.5 next to the hole, 2 at the green's edge."""
+    return 1.5 + 0.5 * np.minimum(distance, GREEN_RADIUS) / GREEN_RADIUS
+
+
+def bag_key(clubs):
+    """Hashable signature of a bag; golfers with the same signature share plans."""
+    return tuple(sorted(
+        (club['club_name'], float(club['carry_distance']), float(club['rollout_distance']),
+         float(club['dispersion_radius']))
+        for club in clubs
+    ))
+
+
+def _bin(distance):
+    return np.clip(np.rint(distance / DISTANCE_STEP).astype(np.intp), 0, len(_distances) - 1)
+
+
+@lru_cache(maxsize=512)
+def solve_bag(bag):
+    """Return ``(expected_strokes, best_action, action_names, action_totals)`` for every bin."""
+    names = [club[0] for club in bag] + [PARTIAL_SHOT]
+    totals = np.array([club[1] + club[2] for club in bag])
+    sigmas = np.array([club[3] for club in bag]) / DISPERSION_SIGMAS
+
+    # Mean shot length and spread for every action from every bin, shape (actions, bins)
+    n_bins = len(_distances)
+    shortest = totals.min() if len(totals) else MAX_DISTANCE
+    mean = np.vstack([np.repeat(totals[:, None], n_bins, axis=1), _distances[None, :]])
+    sigma = np.vstack([
+        np.repeat(sigmas[:, None], n_bins, axis=1),
+        np.maximum(PARTIAL_DISPERSION * _distances, 1.0)[None, :],
+    ])
+    allowed = np.ones_like(mean, dtype=bool)
+    allowed[-1] = _distances <= shortest
+
+    # Landing bins for every quadrature pair, shape (actions, bins, pairs)
+    along = _distances[None, :, None] - (mean[:, :, None] + sigma[:, :, None] * _long)
+    across = sigma[:, :, None] * _lateral
+    landing = _bin(np.hypot(along, across))
+
+    on_green = _distances <= GREEN_RADIUS
+    value = np.where(on_green, expected_putts(_distances), _distances / max(shortest, 1.0) + 2.0)
+    for _ in range(MAX_ITERATIONS):
+        expected = 1.0 + (value[landing] * _pair_weights).sum(axis=2)
+        expected[~allowed] = np.inf
+        updated = np.where(on_green, value, expected.min(axis=0))
+        converged = np.max(np.abs(updated - value)) < 1e-6
+        value = updated
+        if converged:
+            break
+    best = np.where(on_green, -1, expected.argmin(axis=0))
+    return value, best, tuple(names), np.append(totals, np.nan)
+
+
+def plan_hole(bag, yardage):
+    """Plan one hole: expected strokes and the club sequence along the expected path."""
+    value, best, names, totals = solve_bag(bag)
+    remaining = float(yardage)
+    sequence = []
+    while remaining > GREEN_RADIUS and len(sequence) < MAX_SHOTS:
+        action = int(best[_bin(remaining)])
+        sequence.append(names[action])
+        shot = remaining if names[action] == PARTIAL_SHOT else totals[action]
+        remaining = abs(remaining - shot)
+    return {
+        "expected_strokes": round(float(value[_bin(yardage)]), 2),
+        "clubs": sequence,
+    }
+
+
+@lru_cache(maxsize=1024)
+def _plan_course(bag, holes):
+    plans = []
+    for hole_number, par, yardage in holes:
+        plan = plan_hole(bag, yardage)
+        plan.update({
+            "hole_number": hole_number,
+            "par": par,
+            "yardage": yardage,
+            "strokes_vs_par": round(plan["expected_strokes"] - par, 2),
+        })
+        plans.append(plan)
+    return tuple(plans)
+
+
+def plan_course(clubs, holes):
+    """Plan every hole of a course in one call.
+
+    ``clubs`` are rows from the ``clubs`` table and ``holes`` rows with
+    ``hole_number``, ``par`` and ``yardage``. Results are cached on the content
+    of both, so edits to either are picked up on the next call.
+    """
+    if not clubs:
+        raise ValueError("Golfer has no clubs")
+    hole_key = tuple((hole['hole_number'], hole['par'], hole['yardage']) for hole in holes)
+    plans = _plan_course(bag_key(clubs), hole_key)
+    return {
+        "holes": [{**plan, "clubs": list(plan["clubs"])} for plan in plans],
+        "expected_score": round(sum(plan["expected_strokes"] for plan in plans), 2),
+        "par": sum(plan["par"] for plan in plans),
+    }
+
+
+def clear_cache():
+    """Drop every memoized bag solution and course plan."""
+    solve_bag.cache_clear()
+    _plan_course.cache_clear()
@@ -0,0 +1,63 @@
+"""JSON encoding shared by the Flask apps and the FastAPI plugin.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both paths serialize ``sqlite3.Row`` objects (and NumPy scalars or
+arrays) directly, so views can hand query results straight to ``jsonify``.
+"""
+import json
+import sqlite3
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, sqlite3.Row):
+        return dict(zip(obj.keys(), obj))
+    if hasattr(obj, 'tolist'):
+        # NumPy scalars and arrays without importing NumPy here
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj):
+        """Serialize ``obj`` to UTF-8 JSON bytes."""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj):
+        """Serialize ``obj`` to UTF-8 JSON bytes."""
+        return _encoder.encode(obj).encode()
+
+    loads = json.loads
+
+
+def stdlib_dumps(obj):
+    """Reference encoder (what ``jsonify`` did before), kept for benchmarks."""
+    return json.dumps(obj, default=_default).encode()
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by :func:`dumps` and :func:`loads`; also parses ``request.json``."""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
@@ -0,0 +1,161 @@
+"""Parallel bulk import of KML and KMZ files.
+
+The parent process walks the inputs and reads one KML document at a time
+(KMZ archives member by member, straight out of the zip, never extracted to
+disk), skipping byte-identical documents that were already imported. Parsing
+and hashing fan out across a process pool, while a single writer applies the
+results in large transactions through :func:`kml_import.apply`. At most
+``window`` documents are in flight, so memory stays bounded however many
+files are imported.
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import kml_import
+
+DB_PATH = 'golfers.db'
+BATCH_SIZE = 200
+KML_SUFFIXES = ('.kml', '.kmz')
+# Start method for pools created inside a threaded server process, where a plain fork is unsafe
+SERVER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _kmz_members(name, archive):
+    with zipfile.ZipFile(archive) as kmz:
+        for member in kmz.infolist():
+            if not member.is_dir() and member.filename.lower().endswith('.kml'):
+                yield f"{name}:{member.filename}", kmz.read(member)
+
+
+def file_documents(name, fileobj):
+    """Yield ``(label, kml_bytes)`` for one uploaded KML or KMZ file object."""
+    if name.lower().endswith('.kmz'):
+        yield from _kmz_members(name, fileobj)
+    else:
+        yield name, fileobj.read()
+
+
+def path_documents(paths):
+    """Yield ``(label, kml_bytes)`` for every KML/KMZ file under ``paths`` (files or directories)."""
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, filename)
+                for root, _, filenames in os.walk(path)
+                for filename in filenames
+                if filename.lower().endswith(KML_SUFFIXES)
+            )
+        else:
+            files = [path]
+        for file_path in files:
+            with open(file_path, 'rb') as fileobj:
+                yield from file_documents(file_path, fileobj)
+
+
+def _prepare(job):
+    label, data, digest = job[:3]
+    name = os.path.splitext(os.path.basename(label.split(':')[-1]))[0]
+    try:
+        return label, kml_import.prepare(data, name, digest), None
+    except Exception as e:
+        return label, None, str(e)
+
+
+def _parallel(jobs, workers, window, start_method=None):
+    """Run ``_prepare`` over ``jobs`` with at most ``window`` in flight, yielding results in order."""
+    if workers == 0:
+        yield from map(_prepare, jobs)
+        return
+    context = multiprocessing.get_context(start_method) if start_method else None
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = collections.deque()
+        for job in jobs:
+            pending.append(pool.submit(_prepare, job))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def bulk_import(conn, documents, workers=None, batch_size=BATCH_SIZE, window=None, source_keys=False,
+                start_method=None):
+    """Import ``(label, kml_bytes)`` documents; commits every ``batch_size`` files and returns throughput stats.
+
+    ``workers`` defaults to the CPU count; ``0`` parses in-process. With
+    ``source_keys`` each label is stored as the document's source, so
+    importing an edited file from the same path updates its course; otherwise
+    every new document becomes a new course. ``start_method`` picks how pool
+    processes start (the platform default when None).
+    """
+    workers = os.cpu_count() if workers is None else workers
+    window = window or max(4 * (workers or 1), 16)
+    stats = {"files": 0, "imported": 0, "duplicates": 0, "placemarks": 0, "features": 0, "errors": []}
+    seen = set()
+
+    def jobs():
+        for label, data in documents:
+            stats["files"] += 1
+            digest = kml_import.content_hash(data)
+            source = label if source_keys else None
+            if digest in seen or kml_import.previous_upload(conn, digest, source=source) is not None:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+            yield label, data, digest, source
+
+    start = time.perf_counter()
+    pending = 0
+    try:
+        for label, prepared, error in _parallel(jobs(), workers, window, start_method):
+            if error is not None:
+                stats["errors"].append({"file": label, "error": error})
+                continue
+            result = kml_import.apply(conn, prepared, source=label if source_keys else None)
+            stats["imported"] += 1
+            stats["placemarks"] += len(prepared['placemarks'])
+            stats["features"] += result['added'] + result['updated']
+            pending += 1
+            if pending >= batch_size:
+                conn.commit()
+                pending = 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    seconds = time.perf_counter() - start
+    stats["seconds"] = round(seconds, 3)
+    stats["files_per_sec"] = round(stats["files"] / seconds, 1) if seconds else None
+    stats["placemarks_per_sec"] = round(stats["placemarks"] / seconds, 1) if seconds else None
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import KML/KMZ course files in parallel.")
+    parser.add_argument('paths', nargs='+', help="KML/KMZ files or directories to scan")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database path")
+    parser.add_argument('--workers', type=int, help="Parser processes (default: CPU count, 0 = in-process)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Files per write transaction")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        # Absolute paths are the source keys, so re-running over edited files updates their courses
+        documents = path_documents([os.path.abspath(path) for path in args.paths])
+        stats = bulk_import(conn, documents, args.workers, args.batch_size, source_keys=True)
+    finally:
+        conn.close()
+    for error in stats["errors"]:
+        print(f"Skipped {error['file']}: {error['error']}")
+    print(f"Imported {stats['imported']} of {stats['files']} files ({stats['duplicates']} duplicates, "
+          f"{len(stats['errors'])} errors), {stats['placemarks']} Placemarks in {stats['seconds']}s: "
+          f"{stats['files_per_sec']} files/sec, {stats['placemarks_per_sec']} Placemarks/sec")
+
+
+if __name__ == '__main__':
+    main()
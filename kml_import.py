@@ -0,0 +1,162 @@
+"""KML course import with content-hash deduplication.
+
+Every upload is hashed on arrival and recorded in ``kml_uploads`` against the
+course it was imported into. Each Placemark is keyed by its name (plus an
+ordinal for repeated names) and hashed over its name and packed geometry.
+
+An upload updates an existing course only when that course is named
+explicitly: by ``course_id``, by a ``source`` key (e.g. the file path the
+bulk importer read it from) the course was imported from before, or by being
+byte-identical to an earlier upload of it. Anything else becomes a new
+course, so unrelated files that share a Document name never touch each
+other's features. When the file matches the course's latest upload the
+recorded result is returned without parsing; otherwise only Placemarks whose
+hash changed are rewritten, new ones are added and missing ones removed.
+"""
+import hashlib
+import io
+import json
+from xml.parsers.expat import ExpatError
+
+import course_geometry
+from kml_parser import parse_kml_document
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def placemark_hash(placemark):
+    """Stable hash of a Placemark's name and geometry (over the packed coordinates)."""
+    digest = hashlib.sha256((placemark['name'] or '').encode())
+    for geometry in placemark['geometries']:
+        packed = course_geometry.encode(geometry['type'], geometry['rings'])
+        digest.update(packed['geom_type'].encode())
+        digest.update(packed['coords'])
+        digest.update(packed['ring_offsets'] or b'')
+    return digest.hexdigest()
+
+
+def keyed_placemarks(placemarks):
+    """Attach ``key`` (name#ordinal) and ``hash`` to each Placemark."""
+    seen = {}
+    keyed = []
+    for placemark in placemarks:
+        name = placemark['name'] or ''
+        ordinal = seen.get(name, 0)
+        seen[name] = ordinal + 1
+        keyed.append(dict(placemark, key=f"{name}#{ordinal}", hash=placemark_hash(placemark)))
+    return keyed
+
+
+def target_course(conn, digest, course_id=None, source=None):
+    """The course an upload updates: ``course_id``, else the course ``source`` or the same bytes were imported into.
+
+    Returns None for a new course; raises ``LookupError`` for an unknown ``course_id``.
+    """
+    if course_id is not None:
+        if conn.execute("SELECT 1 FROM courses WHERE id = ?", (course_id,)).fetchone() is None:
+            raise LookupError(f"Unknown course_id {course_id}")
+        return course_id
+    row = None
+    if source is not None:
+        row = conn.execute("SELECT course_id FROM kml_uploads WHERE source = ? ORDER BY id DESC LIMIT 1",
+                           (source,)).fetchone()
+    if row is None:
+        row = conn.execute("SELECT course_id FROM kml_uploads WHERE content_hash = ? ORDER BY id DESC LIMIT 1",
+                           (digest,)).fetchone()
+    return row[0] if row else None
+
+
+def previous_upload(conn, digest, course_id=None, source=None):
+    """Recorded result when ``digest`` is the latest upload of its target course, else None."""
+    course_id = target_course(conn, digest, course_id, source)
+    if course_id is None:
+        return None
+    row = conn.execute("SELECT content_hash, result FROM kml_uploads WHERE course_id = ? ORDER BY id DESC LIMIT 1",
+                       (course_id,)).fetchone()
+    return json.loads(row[1]) if row and row[0] == digest else None
+
+
+def prepare(data, fallback_name=None, digest=None):
+    """Hash and parse raw KML bytes without touching the database; safe to run in a worker process.
+
+    Raises ``ValueError`` when the file is not well-formed XML or holds no Placemarks.
+    """
+    try:
+        document = parse_kml_document(io.BytesIO(data))
+    except ExpatError as e:
+        raise ValueError(f"Invalid KML: {e}") from e
+    placemarks = keyed_placemarks(document['placemarks'])
+    if not placemarks:
+        raise ValueError("KML file has no Placemarks")
+    return {
+        "hash": digest or content_hash(data),
+        "name": document['name'] or fallback_name or placemarks[0]['name'],
+        "placemarks": placemarks,
+    }
+
+
+def apply(conn, prepared, course_id=None, source=None):
+    """Write a :func:`prepare` result, touching only changed Placemarks; the caller commits.
+
+    ``course_id`` and ``source`` pick the course to update (see :func:`target_course`).
+    """
+    course_id = target_course(conn, prepared['hash'], course_id, source)
+    previous = previous_upload(conn, prepared['hash'], course_id)
+    if previous is not None:
+        return dict(previous, duplicate=True)
+    name = prepared['name']
+    placemarks = prepared['placemarks']
+
+    if course_id is None:
+        course_id = conn.execute("INSERT INTO courses (name) VALUES (?)", (name,)).lastrowid
+        existing = {}
+    else:
+        existing = dict(conn.execute(
+            "SELECT placemark_key, content_hash FROM course_features WHERE course_id = ? GROUP BY placemark_key",
+            (course_id,)
+        ).fetchall())
+
+    wanted = {placemark['key']: placemark for placemark in placemarks}
+    changed = [key for key, placemark in wanted.items() if key in existing and existing[key] != placemark['hash']]
+    added = [key for key in wanted if key not in existing]
+    removed = [key for key in existing if key not in wanted]
+
+    conn.executemany("DELETE FROM course_features WHERE course_id = ? AND placemark_key = ?",
+                     [(course_id, key) for key in changed + removed])
+    course_geometry.store_features(conn, course_id, [wanted[key] for key in added + changed])
+    conn.execute("""
+        UPDATE courses SET
+            latitude = (SELECT AVG(centroid_lat) FROM course_features WHERE course_id = ?),
+            longitude = (SELECT AVG(centroid_lon) FROM course_features WHERE course_id = ?)
+        WHERE id = ?
+    """, (course_id, course_id, course_id))
+
+    result = {
+        "message": "KML file processed successfully",
+        "course_id": course_id,
+        "features": conn.execute("SELECT COUNT(*) FROM course_features WHERE course_id = ?", (course_id,)).fetchone()[0],
+        "added": len(added),
+        "updated": len(changed),
+        "removed": len(removed),
+        "unchanged": len(wanted) - len(added) - len(changed),
+    }
+    conn.execute("INSERT INTO kml_uploads (content_hash, course_id, course_name, source, result) VALUES (?, ?, ?, ?, ?)",
+                 (prepared['hash'], course_id, name, source, json.dumps(result)))
+    return dict(result, duplicate=False)
+
+
+def import_kml(conn, data, fallback_name=None, course_id=None, source=None):
+    """Import raw KML bytes into ``courses``/``course_features``; the caller commits.
+
+    Returns the upload result; ``duplicate`` is true when the bytes match the
+    latest upload of the target course. Raises ``ValueError`` when the file is
+    not valid KML with Placemarks and ``LookupError`` when ``course_id`` does
+    not exist.
+    """
+    digest = content_hash(data)
+    previous = previous_upload(conn, digest, course_id, source)
+    if previous is not None:
+        return dict(previous, duplicate=True)
+    return apply(conn, prepare(data, fallback_name, digest), course_id, source)
@@ -1,15 +1,64 @@
 from xml.dom import minidom
 
+GEOMETRY_TAGS = ('Point', 'LineString', 'LinearRing', 'Polygon')
+
+
+def _text(node, tag):
+    elements = node.getElementsByTagName(tag)
+    if not elements or elements[0].firstChild is None:
+        return None
+    return elements[0].firstChild.data.strip()
+
+
+def parse_coordinates(text):
+    """Parse a KML ``<coordinates>`` string into ``[(lon, lat), ...]`` (altitude is dropped)."""
+    coordinates = []
+    for tuple_text in (text or '').split():
+        values = tuple_text.split(',')
+        coordinates.append((float(values[0]), float(values[1])))
+    return coordinates
+
+
+def _geometry(element):
+    kind = element.tagName
+    if kind == 'Polygon':
+        # Outer boundary first, then any holes
+        rings = [parse_coordinates(_text(boundary, 'coordinates'))
+                 for tag in ('outerBoundaryIs', 'innerBoundaryIs')
+                 for boundary in element.getElementsByTagName(tag)]
+    else:
+        rings = [parse_coordinates(_text(element, 'coordinates'))]
+    return {'type': 'LineString' if kind == 'LinearRing' else kind, 'rings': [ring for ring in rings if ring]}
+
+
+def parse_kml_document(file):
+    """Parse a KML file into its document name and placemarks with their geometry."""
+    xmldoc = minidom.parse(file)
+    documents = xmldoc.getElementsByTagName('Document')
+    name_nodes = [node for node in documents[0].childNodes if getattr(node, 'tagName', None) == 'name'] if documents else []
+    placemarks = []
+    for placemark in xmldoc.getElementsByTagName('Placemark'):
+        geometries = [
+            _geometry(element)
+            for tag in GEOMETRY_TAGS
+            for element in placemark.getElementsByTagName(tag)
+            # Rings inside a polygon belong to that polygon
+            if not (tag == 'LinearRing' and element.parentNode.tagName in ('outerBoundaryIs', 'innerBoundaryIs'))
+        ]
+        placemarks.append({
+            'name': _text(placemark, 'name'),
+            'geometries': [geometry for geometry in geometries if geometry['rings']],
+        })
+    return {
+        'name': name_nodes[0].firstChild.data.strip() if name_nodes and name_nodes[0].firstChild else None,
+        'placemarks': placemarks,
+    }
+
+
 def parse_kml(file):
     try:
-        # Basic KML parsing logic
-        xmldoc = minidom.parse(file)
-        courses = []
-        for course in xmldoc.getElementsByTagName('Placemark'):
-            name = course.getElementsByTagName('name')[0].firstChild.data
-            courses.append({'name': name})
-        return courses
+        # Placemarks with their name and geometry
+        return parse_kml_document(file)['placemarks']
     except Exception as e:
         print(f"Error parsing KML: {e}")
         return None
-
@@ -0,0 +1,173 @@
+"""Live round sessions: recommendations pushed from a stream of GPS fixes.
+
+A session loads the golfer's clubs, the course's green positions (from the
+KML-imported geometry when the course has it) and the weather once, then
+turns each GPS fix into a distance and bearing to the current green. A new
+recommendation is produced only when the player moves into a different
+``DISTANCE_BAND`` or the recommended club changes, so a
+client streaming fixes every second receives a handful of messages per hole.
+The session is transport-agnostic; ``backend/gpt_plugin_backend.py`` serves
+it over a WebSocket.
+"""
+import math
+import sqlite3
+import time
+
+import course_geometry
+import elevation
+import shot_simulator
+
+DISTANCE_BAND = 5.0             # yards; moves within a band do not trigger a new recommendation
+WEATHER_REFRESH_SECONDS = 600
+
+# Preferred green marker per hole when several are mapped
+_GREEN_PRIORITY = ('green center', 'green', 'green middle', 'green front', 'green back')
+
+
+def distance_and_bearing(lat1, lon1, lat2, lon2):
+    """Great-circle distance in yards and initial compass bearing in degrees from point 1 to point 2."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    distance = 2 * course_geometry.EARTH_RADIUS_YARDS * math.asin(math.sqrt(a))
+    y = math.sin(dlambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlambda)
+    return distance, math.degrees(math.atan2(y, x)) % 360
+
+
+def _kml_greens(golfers_db, course):
+    conn = sqlite3.connect(golfers_db)
+    try:
+        return [row for row in course_geometry.course_markers(conn, course) if 'green' in (row[0] or '').lower()]
+    except sqlite3.OperationalError:
+        # Database without the course_features table yet
+        return []
+    finally:
+        conn.close()
+
+
+def load_greens(locations_db, course, golfers_db=None):
+    """Return ``{hole_number: (latitude, longitude)}`` for every mapped green on ``course``.
+
+    Greens imported from KML into ``golfers_db`` (a green polygon's centroid is
+    its middle) take precedence over the ``locations`` markers.
+    """
+    rows = _kml_greens(golfers_db, course) if golfers_db is not None else []
+    if not rows:
+        conn = sqlite3.connect(locations_db)
+        try:
+            rows = conn.execute(
+                "SELECT Name, Latitude, Longitude FROM locations WHERE Course = ? AND Name LIKE '%Green%'", (course,)
+            ).fetchall()
+        finally:
+            conn.close()
+    greens = {}
+    for name, latitude, longitude in rows:
+        match = course_geometry.HOLE_NAME.search(name or '')
+        if not match:
+            continue
+        kind = course_geometry.HOLE_NAME.sub('', name).strip().lower()
+        rank = _GREEN_PRIORITY.index(kind) if kind in _GREEN_PRIORITY else len(_GREEN_PRIORITY)
+        hole = int(match.group(1))
+        if hole not in greens or rank < greens[hole][0]:
+            greens[hole] = (rank, (latitude, longitude))
+    return {hole: position for hole, (_, position) in greens.items()}
+
+
+def load_clubs(golfers_db, golfer_id):
+    conn = sqlite3.connect(golfers_db)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT club_name, carry_distance, rollout_distance, dispersion_radius FROM clubs WHERE golfer_id = ?",
+            (golfer_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def fetch_weather(latitude, longitude):
+    import weather_cache
+    return weather_cache.get(latitude, longitude)
+
+
+class LiveRound:
+    """State for one golfer's round; feed it fixes with :meth:`update`."""
+
+    def __init__(self, clubs, greens, hole=1, weather=None):
+        if not clubs:
+            raise ValueError("Golfer has no clubs")
+        self.clubs = clubs
+        self.greens = greens
+        self.hole = hole
+        self.weather = weather
+        self.weather_time = time.monotonic() if weather is not None else None
+        self.last = None
+
+    @classmethod
+    def start(cls, golfers_db, locations_db, golfer_id, course=None, hole=1, green=None):
+        """Open a session from the database; ``green`` (lat, lon) overrides the mapped green."""
+        greens = load_greens(locations_db, course, golfers_db) if course is not None else {}
+        if green is not None:
+            greens[hole] = tuple(green)
+        return cls(load_clubs(golfers_db, golfer_id), greens, hole)
+
+    def set_hole(self, hole, green=None):
+        if green is not None:
+            self.greens[hole] = tuple(green)
+        self.hole = hole
+        self.last = None
+
+    def _weather_stale(self):
+        return self.weather_time is None or time.monotonic() - self.weather_time >= WEATHER_REFRESH_SECONDS
+
+    def _refresh_weather(self, latitude, longitude):
+        weather = fetch_weather(latitude, longitude)
+        # Keep the last good reading if the feed fails mid-round
+        if "error" not in weather:
+            self.weather = weather
+        self.weather_time = time.monotonic()
+
+    def update(self, latitude, longitude, elevation_change=None):
+        """Process one GPS fix; return a recommendation if it differs from the last one pushed, else None.
+
+        Without an ``elevation_change`` the rise to the green is read from the local elevation model.
+        """
+        if self.hole not in self.greens:
+            raise ValueError(f"No green mapped for hole {self.hole}")
+        green_lat, green_lon = self.greens[self.hole]
+        distance, bearing = distance_and_bearing(latitude, longitude, green_lat, green_lon)
+        band = int(distance // DISTANCE_BAND)
+
+        stale = self._weather_stale()
+        if self.last is not None and band == self.last["band"] and not stale:
+            return None
+        if stale:
+            self._refresh_weather(latitude, longitude)
+
+        if elevation_change is None:
+            elevation_change = elevation.elevation_change(latitude, longitude, green_lat, green_lon)
+        weather = self.weather or {}
+        simulation = shot_simulator.recommend_club(
+            self.clubs, distance,
+            wind_speed=weather.get("wind_speed", 0.0),
+            wind_direction=weather.get("wind_direction", 0.0),
+            shot_bearing=bearing,
+            elevation_change=elevation_change,
+            **{key: weather[key] for key in ("temperature", "humidity") if key in weather}
+        )
+        club = simulation["club"] if simulation else None
+        if self.last is not None and band == self.last["band"] and club == self.last["club"]:
+            return None
+
+        self.last = {"band": band, "club": club}
+        return {
+            "hole": self.hole,
+            "distance": round(distance, 1),
+            "bearing": round(bearing, 1),
+            "club": club,
+            "probability": round(simulation["probability"], 3) if simulation else 0.0,
+            "weather": weather,
+        }
@@ -0,0 +1,194 @@
+"""Bounded, rate-limited dispatch of chat completion calls.
+
+Every LLM call from the plugin goes through one :class:`Dispatcher` per
+process instead of straight to the upstream API:
+
+* at most ``max_concurrency`` calls are in flight, run by a fixed pool of
+  worker threads;
+* calls start no faster than a token bucket allows (``rate`` per second with
+  bursts of ``burst``), so upstream rate limits are respected up front rather
+  than discovered through 429s and retries;
+* identical requests (same model and messages) that are queued or in flight
+  share one upstream call;
+* at most ``max_queue`` distinct requests wait for a worker; beyond that
+  :meth:`Dispatcher.submit` raises :class:`Overloaded` at once, which the
+  plugin turns into a fast HTTP 429.
+
+Chat completions take one conversation per call, so batching here means
+coalescing: a burst of identical prompts costs one call and one queue slot.
+Endpoints that need many answers at once (``/closest-objects/``) put them in
+one prompt.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', 32))
+RATE_PER_SECOND = float(os.getenv('LLM_RATE_PER_SECOND', 5))
+BURST = int(os.getenv('LLM_BURST', 10))
+TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 30))
+
+
+class Overloaded(Exception):
+    """The queue is full; the caller should back off for ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LLMTimeout(TimeoutError):
+    """No completion arrived within the caller's timeout; the call may still finish in the background."""
+
+
+class UpstreamError(Exception):
+    """The completion API answered with an error status."""
+
+    def __init__(self, status, body):
+        super().__init__(f"Completion API returned {status}: {body[:200]}")
+        self.status = status
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise return the seconds until one is."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+def request_key(model, messages):
+    return json.dumps([model, messages], sort_keys=True, separators=(',', ':'))
+
+
+class Dispatcher:
+    """Queue, concurrency limit, rate limit and request coalescing around ``create(**kwargs)``.
+
+    ``rate=None`` disables the rate limit (e.g. in benchmarks against a stub).
+    """
+
+    def __init__(self, create, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE,
+                 rate=RATE_PER_SECOND, burst=BURST):
+        self.create = create
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate, burst) if rate is not None else None
+        self._queue = queue.Queue()
+        self._pending = {}        # request key -> Future, while queued or in flight
+        self._queued = 0
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "coalesced": 0, "rejected": 0, "calls": 0, "errors": 0}
+        self._workers = [
+            threading.Thread(target=self._work, name=f'llm-dispatch-{i}', daemon=True)
+            for i in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, model, messages, **kwargs):
+        """Queue a completion; returns a Future. Raises :class:`Overloaded` when the queue is full."""
+        key = request_key(model, messages)
+        with self._lock:
+            self.stats["submitted"] += 1
+            future = self._pending.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            if self._queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                # Roughly how long the queue ahead needs to drain at the configured rate
+                raise Overloaded(max(1.0, self._queued / self.bucket.rate) if self.bucket else 1.0)
+            future = Future()
+            self._pending[key] = future
+            self._queued += 1
+        self._queue.put((key, dict(kwargs, model=model, messages=messages), future))
+        return future
+
+    def complete(self, model, messages, timeout=TIMEOUT_SECONDS, **kwargs):
+        """Submit and wait for the completion response; raises :class:`LLMTimeout` after ``timeout`` seconds."""
+        future = self.submit(model, messages, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if future.done():
+                # The call itself timed out (e.g. a socket timeout); pass its error on unchanged
+                raise
+            raise LLMTimeout(f"No completion within {timeout:g}s") from None
+
+    def _work(self):
+        while True:
+            self._call(*self._queue.get())
+
+    def _call(self, key, kwargs, future):
+        if self.bucket is not None:
+            self.bucket.acquire()
+        with self._lock:
+            self._queued -= 1
+            self.stats["calls"] += 1
+        try:
+            result = self.create(**kwargs)
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+                self._pending.pop(key, None)
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_result(result)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, queued=self._queued, in_flight=len(self._pending) - self._queued)
+
+
+class HTTPCompletion:
+    """Minimal OpenAI-compatible ``/chat/completions`` client returning the decoded JSON response."""
+
+    def __init__(self, base_url, api_key=None, timeout=TIMEOUT_SECONDS):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def create(self, **kwargs):
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        request = urllib.request.Request(self.url, data=json.dumps(kwargs).encode(), headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise UpstreamError(e.code, e.read().decode(errors='replace')) from None
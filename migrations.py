@@ -0,0 +1,308 @@
+"""Versioned schema migrations for the golfers database.
+
+Each migration runs in its own short ``BEGIN IMMEDIATE`` transaction and is
+recorded in ``schema_version``, so running the migrator again (or from two
+workers at once) is safe. The database is switched to WAL journaling first so
+readers keep working while a migration holds the write lock, which lets the
+migrations be applied to a live production database.
+"""
+import sqlite3
+
+DB_PATH = 'golfers.db'
+BUSY_TIMEOUT_MS = 30_000
+
+# The converged clubs schema used by app.py and the recommenders
+CLUBS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    golfer_id INTEGER,
+    club_name TEXT NOT NULL,
+    carry_distance REAL NOT NULL,
+    rollout_distance REAL NOT NULL,
+    dispersion_radius REAL NOT NULL,
+    FOREIGN KEY (golfer_id) REFERENCES golfer_profiles (id)
+)
+"""
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def create_base_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS golfer_profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute(CLUBS_TABLE.format(name='clubs'))
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        location TEXT NOT NULL DEFAULT '',
+        latitude REAL,
+        longitude REAL,
+        par INTEGER,
+        yardage INTEGER
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS holes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_id INTEGER NOT NULL,
+        hole_number INTEGER NOT NULL,
+        par INTEGER NOT NULL,
+        yardage INTEGER NOT NULL,
+        handicap INTEGER,
+        FOREIGN KEY (course_id) REFERENCES courses (id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS shot_tracking (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        golfer_id INTEGER NOT NULL,
+        club_name TEXT NOT NULL,
+        distance REAL NOT NULL,
+        accuracy REAL NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (golfer_id) REFERENCES golfer_profiles (id)
+    )
+    """)
+
+
+def converge_clubs(conn):
+    """Rebuild a legacy ``clubs`` table (name/club_name, carry, run, dispersion) into the converged schema."""
+    columns = _columns(conn, 'clubs')
+    if {'carry_distance', 'rollout_distance', 'dispersion_radius', 'golfer_id'} <= columns:
+        return
+    name_column = 'club_name' if 'club_name' in columns else 'name'
+    golfer_column = 'golfer_id' if 'golfer_id' in columns else 'NULL'
+    conn.execute(CLUBS_TABLE.format(name='clubs_converged'))
+    conn.execute(f"""
+        INSERT INTO clubs_converged (id, golfer_id, club_name, carry_distance, rollout_distance, dispersion_radius)
+        SELECT id, {golfer_column}, {name_column}, carry, run, dispersion FROM clubs
+    """)
+    conn.execute("DROP TABLE clubs")
+    conn.execute("ALTER TABLE clubs_converged RENAME TO clubs")
+
+
+def converge_courses(conn):
+    """Add the map and scorecard columns backend/api.py reads to an older ``courses`` table."""
+    columns = _columns(conn, 'courses')
+    for column, column_type in (('latitude', 'REAL'), ('longitude', 'REAL'), ('par', 'INTEGER'), ('yardage', 'INTEGER')):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE courses ADD COLUMN {column} {column_type}")
+
+
+def create_hot_path_indexes(conn):
+    # clubs WHERE golfer_id = ? (profile reads, recommendations, planner)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clubs_golfer_club ON clubs (golfer_id, club_name)")
+    # holes WHERE course_id = ? ORDER BY hole_number
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_holes_course_hole ON holes (course_id, hole_number)")
+    # shot_tracking WHERE golfer_id = ? [AND timestamp range]
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shot_tracking_golfer_time ON shot_tracking (golfer_id, timestamp)")
+
+
+def add_profile_version(conn):
+    """Version counter bumped on every profile or clubs write; profile_cache keys and ETags use it."""
+    if 'profile_version' not in _columns(conn, 'golfer_profiles'):
+        conn.execute("ALTER TABLE golfer_profiles ADD COLUMN profile_version INTEGER NOT NULL DEFAULT 0")
+
+
+def unique_golfer_clubs(conn):
+    """Keep the newest row per (golfer_id, club_name) and enforce it, so club edits can upsert."""
+    conn.execute("""
+        DELETE FROM clubs WHERE golfer_id IS NOT NULL AND id NOT IN (
+            SELECT MAX(id) FROM clubs WHERE golfer_id IS NOT NULL GROUP BY golfer_id, club_name
+        )
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_clubs_golfer_club")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_clubs_golfer_club ON clubs (golfer_id, club_name)")
+
+
+def create_gps_tables(conn):
+    """Append-only GPS track (microdegrees and epoch milliseconds as integers) plus the latest fix per golfer."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS gps_points (
+        golfer_id INTEGER NOT NULL,
+        recorded_at INTEGER NOT NULL,
+        latitude_e6 INTEGER NOT NULL,
+        longitude_e6 INTEGER NOT NULL,
+        course TEXT,
+        hole INTEGER
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_gps_points_golfer_time ON gps_points (golfer_id, recorded_at)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS golfer_positions (
+        golfer_id INTEGER PRIMARY KEY,
+        recorded_at INTEGER NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        course TEXT,
+        hole INTEGER
+    )
+    """)
+
+
+def create_course_features(conn):
+    """Packed KML geometry per course (see course_geometry.py) with bbox and centroid columns."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS course_features (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_id INTEGER NOT NULL,
+        name TEXT,
+        geom_type TEXT NOT NULL,
+        coords BLOB NOT NULL,
+        ring_offsets BLOB,
+        min_lon REAL NOT NULL,
+        min_lat REAL NOT NULL,
+        max_lon REAL NOT NULL,
+        max_lat REAL NOT NULL,
+        centroid_lon REAL NOT NULL,
+        centroid_lat REAL NOT NULL,
+        FOREIGN KEY (course_id) REFERENCES courses (id)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_course_features_course ON course_features (course_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_course_features_bbox ON course_features (min_lat, max_lat)")
+
+
+def track_kml_imports(conn):
+    """Content hashes for whole KML uploads and for each stored Placemark, for dedupe and re-import."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS kml_uploads (
+        content_hash TEXT PRIMARY KEY,
+        course_id INTEGER NOT NULL,
+        course_name TEXT,
+        result TEXT NOT NULL,
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (course_id) REFERENCES courses (id)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_kml_uploads_course_name ON kml_uploads (course_name, uploaded_at)")
+    columns = _columns(conn, 'course_features')
+    if 'placemark_key' not in columns:
+        conn.execute("ALTER TABLE course_features ADD COLUMN placemark_key TEXT")
+    if 'content_hash' not in columns:
+        conn.execute("ALTER TABLE course_features ADD COLUMN content_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_course_features_placemark ON course_features (course_id, placemark_key)")
+
+
+def unique_course_holes(conn):
+    """Keep the newest row per (course_id, hole_number) and enforce it, so seed loads can upsert."""
+    conn.execute("""
+        DELETE FROM holes WHERE id NOT IN (SELECT MAX(id) FROM holes GROUP BY course_id, hole_number)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_holes_course_hole")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_holes_course_hole ON holes (course_id, hole_number)")
+
+
+def key_kml_uploads_by_course(conn):
+    """Keep every KML upload as a row per course (and source file), so re-imports target an explicit course."""
+    conn.execute("""
+    CREATE TABLE kml_uploads_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_hash TEXT NOT NULL,
+        course_id INTEGER NOT NULL,
+        course_name TEXT,
+        source TEXT,
+        result TEXT NOT NULL,
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (course_id) REFERENCES courses (id)
+    )
+    """)
+    conn.execute("""
+    INSERT INTO kml_uploads_new (content_hash, course_id, course_name, result, uploaded_at)
+    SELECT content_hash, course_id, course_name, result, uploaded_at FROM kml_uploads ORDER BY uploaded_at, rowid
+    """)
+    conn.execute("DROP TABLE kml_uploads")
+    conn.execute("ALTER TABLE kml_uploads_new RENAME TO kml_uploads")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_kml_uploads_hash ON kml_uploads (content_hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_kml_uploads_course ON kml_uploads (course_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_kml_uploads_source ON kml_uploads (source)")
+
+
+def create_weather_readings(conn):
+    """Weather readings and lookups per grid cell, shared by every worker (see weather_cache.py)."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS weather_readings (
+        cell_lat INTEGER NOT NULL,
+        cell_lon INTEGER NOT NULL,
+        fetched_at REAL,
+        weather TEXT,
+        requested_at REAL,
+        PRIMARY KEY (cell_lat, cell_lon)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_weather_readings_fetched ON weather_readings (fetched_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_weather_readings_requested ON weather_readings (requested_at)")
+
+
+# (version, name, function); append new migrations, never reorder or edit applied ones
+MIGRATIONS = [
+    (1, 'create_base_tables', create_base_tables),
+    (2, 'converge_clubs', converge_clubs),
+    (3, 'converge_courses', converge_courses),
+    (4, 'create_hot_path_indexes', create_hot_path_indexes),
+    (5, 'add_profile_version', add_profile_version),
+    (6, 'unique_golfer_clubs', unique_golfer_clubs),
+    (7, 'create_gps_tables', create_gps_tables),
+    (8, 'create_course_features', create_course_features),
+    (9, 'track_kml_imports', track_kml_imports),
+    (10, 'unique_course_holes', unique_course_holes),
+    (11, 'key_kml_uploads_by_course', key_kml_uploads_by_course),
+    (12, 'create_weather_readings', create_weather_readings),
+]
+
+
+def current_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(db_path=DB_PATH, target=None):
+    """Apply every pending migration up to ``target`` and return the versions applied."""
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        current_version(conn)
+        applied = []
+        for version, name, migration in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-check under the write lock in case another worker got here first
+                if version <= current_version(conn):
+                    conn.execute("COMMIT")
+                    continue
+                migration(conn)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version)
+        if applied:
+            # Refresh planner statistics so the new indexes get used
+            conn.execute("ANALYZE")
+        return applied
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    applied = migrate()
+    print(f"Applied migrations: {applied}" if applied else "Database schema is up to date")
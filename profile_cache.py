@@ -0,0 +1,97 @@
+"""Per-golfer cache of serialized ``/get_profile`` responses.
+
+Every write to a profile or its clubs bumps ``golfer_profiles.profile_version``
+in the same transaction, so a cached body is served only while its version
+still matches the database. That check is a single indexed lookup and stays
+exact across worker processes; writers in this process also drop their entry
+as soon as they commit. The version doubles as the response ETag.
+
+Entries are keyed on the database path as well as the email, since golfer
+ids and versions repeat across databases.
+"""
+import threading
+from collections import OrderedDict
+
+import json_provider
+
+MAX_ENTRIES = 10_000
+
+PROFILE_QUERY = """
+SELECT g.id, g.name, g.email, g.created_at, g.profile_version,
+       c.id AS club_id, c.golfer_id, c.club_name, c.carry_distance, c.rollout_distance, c.dispersion_radius
+FROM golfer_profiles g
+LEFT JOIN clubs c ON c.golfer_id = g.id
+WHERE g.email = ?
+ORDER BY c.id
+"""
+VERSION_QUERY = "SELECT id, profile_version FROM golfer_profiles WHERE email = ?"
+
+_entries = OrderedDict()    # (db_path, email) -> (etag, body)
+_lock = threading.Lock()
+
+
+def etag(golfer_id, version):
+    return f"{golfer_id}-{version}"
+
+
+def serialize(rows):
+    """Build ``(etag, body)`` for one golfer from the rows of ``PROFILE_QUERY``."""
+    first = rows[0]
+    golfer = {"id": first["id"], "name": first["name"], "email": first["email"], "created_at": first["created_at"]}
+    clubs = [
+        {
+            "id": row["club_id"],
+            "golfer_id": row["golfer_id"],
+            "club_name": row["club_name"],
+            "carry_distance": row["carry_distance"],
+            "rollout_distance": row["rollout_distance"],
+            "dispersion_radius": row["dispersion_radius"],
+        }
+        for row in rows
+        if row["club_id"] is not None
+    ]
+    body = json_provider.dumps({"golfer": golfer, "clubs": clubs})
+    return etag(first["id"], first["profile_version"]), body
+
+
+def get(conn, email, db_path=None):
+    """Return ``(etag, body)`` for ``email`` in the database at ``db_path``, or None if there is no such golfer."""
+    key = (db_path, email)
+    with _lock:
+        cached = _entries.get(key)
+    if cached is not None:
+        current = conn.execute(VERSION_QUERY, (email,)).fetchone()
+        if current is not None and etag(current["id"], current["profile_version"]) == cached[0]:
+            with _lock:
+                _entries.move_to_end(key)
+            return cached
+    rows = conn.execute(PROFILE_QUERY, (email,)).fetchall()
+    if not rows:
+        with _lock:
+            _entries.pop(key, None)
+        return None
+    entry = serialize(rows)
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return entry
+
+
+def bump_version(conn, golfer_id=None):
+    """Mark one golfer's profile (or every profile) as changed; call inside the writing transaction."""
+    if golfer_id is None:
+        conn.execute("UPDATE golfer_profiles SET profile_version = profile_version + 1")
+    else:
+        conn.execute("UPDATE golfer_profiles SET profile_version = profile_version + 1 WHERE id = ?", (golfer_id,))
+
+
+def invalidate(email=None):
+    """Drop the cached responses for ``email``, or every cached response."""
+    with _lock:
+        if email is None:
+            _entries.clear()
+        else:
+            for key in [key for key in _entries if key[1] == email]:
+                del _entries[key]
@@ -0,0 +1,165 @@
+"""Negotiated response compression (zstd, brotli, gzip) for the Flask apps.
+
+``init_app(app)`` installs an ``after_request`` hook that picks the best
+encoding the client accepts and we can produce. Bodies under
+``MIN_SIZE`` bytes are left alone, streamed responses are compressed chunk by
+chunk as they are generated, and shared responses (a strong ETag plus
+``Cache-Control: public``, i.e. the course catalog) are compressed once at a
+high level and served from memory after that, keyed on a digest of the body.
+Per-user bodies such as profiles are compressed at the dynamic level on every
+request. brotli and zstandard are optional; gzip is always available.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_SIZE = 1024
+PRECOMPRESSED_ENTRIES = 256
+COMPRESSIBLE_TYPES = ('application/json', 'application/vnd.apache.arrow.stream', 'text/')
+
+# (dynamic level, precompressed level) per encoding
+LEVELS = {'zstd': (3, 19), 'br': (4, 11), 'gzip': (6, 9)}
+
+_precompressed = OrderedDict()
+_lock = threading.Lock()
+
+
+def available_encodings():
+    """Encodings this process can produce, in order of preference."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def negotiate(accept_encoding):
+    """Pick the preferred encoding allowed by an ``Accept-Encoding`` header, or None."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None):
+    """Compress a whole body in one call."""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level or LEVELS['zstd'][0]).compress(data)
+    if encoding == 'br':
+        return brotli.compress(data, quality=level or LEVELS['br'][0])
+    compressor = zlib.compressobj(level or LEVELS['gzip'][0], zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks, flushing after each so clients see data as it is produced."""
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=LEVELS['zstd'][0]).compressobj()
+        process = compressor.compress
+        flush = lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        finish = compressor.flush
+    elif encoding == 'br':
+        compressor = brotli.Compressor(quality=LEVELS['br'][0])
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(LEVELS['gzip'][0], zlib.DEFLATED, 31)
+        process = compressor.compress
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+        finish = compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def precompressed(body, encoding):
+    """Return ``body`` compressed at the high level, memoized on a digest of the body and the encoding."""
+    key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+    with _lock:
+        data = _precompressed.get(key)
+        if data is not None:
+            _precompressed.move_to_end(key)
+            return data
+    data = compress(body, encoding, LEVELS[encoding][1])
+    with _lock:
+        _precompressed[key] = data
+        while len(_precompressed) > PRECOMPRESSED_ENTRIES:
+            _precompressed.popitem(last=False)
+    return data
+
+
+def _compressible(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_response(response):
+    """``after_request`` hook: compress ``response`` in place when it is worth it."""
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_SIZE:
+            return response
+        etag, weak = response.get_etag()
+        if etag and not weak and response.cache_control.public:
+            data = precompressed(body, encoding)
+        else:
+            data = compress(body, encoding)
+        response.set_data(data)
+        if etag:
+            # The compressed bytes differ from the identity representation
+            response.set_etag(etag, weak=True)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
+    return app
+
+
+def clear_cache():
+    """Drop every precompressed body."""
+    with _lock:
+        _precompressed.clear()
@@ -0,0 +1,186 @@
+"""Idempotent bulk loader for course and hole datasets.
+
+Records are streamed from CSV, NDJSON (``.ndjson``/``.jsonl``) or JSON
+files and upserted with ``executemany`` in large transactions: courses on
+their ``id``, holes on ``(course_id, hole_number)``, so loading the same
+dataset twice leaves the database unchanged. JSON course records may nest
+their holes under a ``holes`` key. During the load ``synchronous`` is off and
+the secondary indexes of both tables are dropped and rebuilt once at the end;
+the unique indexes the upserts rely on stay in place.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import time
+
+import migrations
+
+DB_PATH = 'golfers.db'
+BATCH_SIZE = 50_000
+
+COURSE_FIELDS = ('id', 'name', 'location', 'latitude', 'longitude', 'par', 'yardage')
+HOLE_FIELDS = ('course_id', 'hole_number', 'par', 'yardage', 'handicap')
+_CASTS = {
+    'id': int, 'course_id': int, 'hole_number': int, 'par': int, 'yardage': int, 'handicap': int,
+    'latitude': float, 'longitude': float,
+}
+
+# The sample data backend/preload_data.py used to insert
+SEED_COURSES = [
+    {"id": 1, "name": "Pebble Beach Golf Links", "location": "California, USA", "par": 72, "yardage": 6828},
+    {"id": 2, "name": "St Andrews Links", "location": "Scotland, UK", "par": 72, "yardage": 7310},
+]
+SEED_HOLES = [
+    {"course_id": 1, "hole_number": 1, "par": 4, "yardage": 377, "handicap": 12},
+    {"course_id": 1, "hole_number": 2, "par": 5, "yardage": 502, "handicap": 8},
+    {"course_id": 2, "hole_number": 1, "par": 4, "yardage": 376, "handicap": 10},
+    {"course_id": 2, "hole_number": 2, "par": 4, "yardage": 453, "handicap": 4},
+]
+
+COURSE_UPSERT = """
+    INSERT INTO courses (id, name, location, latitude, longitude, par, yardage)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        name = excluded.name,
+        location = excluded.location,
+        latitude = excluded.latitude,
+        longitude = excluded.longitude,
+        par = excluded.par,
+        yardage = excluded.yardage
+"""
+HOLE_UPSERT = """
+    INSERT INTO holes (course_id, hole_number, par, yardage, handicap)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (course_id, hole_number) DO UPDATE SET
+        par = excluded.par,
+        yardage = excluded.yardage,
+        handicap = excluded.handicap
+"""
+
+
+def read_records(path):
+    """Stream dict records from a CSV, NDJSON or JSON (array) file."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='' if extension == '.csv' else None, encoding='utf-8') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension in ('.ndjson', '.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            yield from (data.get('courses', []) if isinstance(data, dict) else data)
+
+
+def _row(record, fields):
+    row = []
+    for field in fields:
+        value = record.get(field)
+        if value == '':
+            value = None
+        if value is not None and field in _CASTS:
+            value = _CASTS[field](float(value)) if _CASTS[field] is int else _CASTS[field](value)
+        row.append(value)
+    return tuple(row)
+
+
+def _course_row(record):
+    row = _row(record, COURSE_FIELDS)
+    if row[0] is None:
+        raise ValueError(f"Course record without an id: {record.get('name')!r}")
+    # location is NOT NULL in the schema
+    return row[:2] + (row[2] or '',) + row[3:]
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _deferred_indexes(conn):
+    """CREATE statements for the non-unique indexes on courses and holes."""
+    return conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name IN ('courses', 'holes') AND sql IS NOT NULL
+          AND sql NOT LIKE 'CREATE UNIQUE%'
+    """).fetchall()
+
+
+def load(conn, courses=(), holes=(), batch_size=BATCH_SIZE):
+    """Upsert course and hole records; returns row counts and elapsed seconds.
+
+    Course records with a ``holes`` list have those holes loaded too, in the
+    same transaction as their course. Every ``batch_size`` records are written
+    with one ``executemany`` per table and committed.
+    """
+    start = time.perf_counter()
+    counts = {"courses": 0, "holes": 0}
+
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    indexes = _deferred_indexes(conn)
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        for batch in _batched(courses, batch_size):
+            course_rows = [_course_row(record) for record in batch]
+            # Nested holes are written with their batch, so at most one batch of them is in memory
+            nested = [_row(dict(hole, course_id=course[0]), HOLE_FIELDS)
+                      for record, course in zip(batch, course_rows) for hole in record.get('holes') or ()]
+            conn.executemany(COURSE_UPSERT, course_rows)
+            conn.executemany(HOLE_UPSERT, nested)
+            counts["courses"] += len(course_rows)
+            counts["holes"] += len(nested)
+            conn.commit()
+        for batch in _batched((_row(record, HOLE_FIELDS) for record in holes), batch_size):
+            conn.executemany(HOLE_UPSERT, batch)
+            counts["holes"] += len(batch)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Rebuild each dropped index once, after the data is in
+        for _, sql in indexes:
+            conn.execute(sql)
+        conn.commit()
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute("ANALYZE courses")
+    conn.execute("ANALYZE holes")
+    return dict(counts, seconds=round(time.perf_counter() - start, 3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upsert course and hole datasets (CSV, NDJSON or JSON).")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database path")
+    parser.add_argument('--courses', action='append', default=[], help="Course dataset file (repeatable)")
+    parser.add_argument('--holes', action='append', default=[], help="Hole dataset file (repeatable)")
+    parser.add_argument('--seed', action='store_true', help="Load the built-in sample courses")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    migrations.migrate(args.db)
+    courses = itertools.chain(SEED_COURSES if args.seed else (),
+                              (record for path in args.courses for record in read_records(path)))
+    holes = itertools.chain(SEED_HOLES if args.seed else (),
+                            (record for path in args.holes for record in read_records(path)))
+    conn = sqlite3.connect(args.db)
+    try:
+        stats = load(conn, courses, holes, args.batch_size)
+    finally:
+        conn.close()
+    print(f"Loaded {stats['courses']} courses and {stats['holes']} holes in {stats['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Production entry point for the Flask app (WSGI) and the GPT plugin (ASGI).
+
+    gunicorn -c gunicorn.conf.py server:application
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker server:plugin
+
+With ``preload_app`` the master imports this module and calls :func:`preload`
+before forking, so the course catalog, the locations spatial index, the
+per-hole green and hazard arrays, the adjustment tables and the elevation
+model are built once and shared copy-on-write by every worker.
+``gc.freeze()`` moves those objects out of the collector's reach so workers
+do not dirty their pages during garbage collection.
+
+Threads do not survive the fork, so each worker starts its weather
+refresher from the ``post_fork`` hook (:func:`start_worker`). The refreshers
+elect one leader through a lock file, and only the leader calls the weather
+feed; the others share its readings through the database.
+
+Sending the master ``SIGHUP`` refreshes the preloaded data (see
+``gunicorn.conf.py``), starts new workers from it and lets the old workers
+finish their in-flight requests before exiting. New code needs the usual
+``USR2`` + ``QUIT`` master swap.
+"""
+import gc
+import logging
+import os
+
+import adjustments
+import course_catalog
+import elevation
+import green_distances
+import spatial_index
+import weather_cache
+
+DATABASE = os.getenv('DATABASE', 'golfers.db')
+LOCATIONS_DATABASE = os.getenv('LOCATIONS_DATABASE', 'optimized_data.db')
+
+logger = logging.getLogger(__name__)
+
+
+def preload():
+    """Load every read-mostly structure into this process and freeze it for sharing."""
+    # On a reload the previous copies become garbage once they are unfrozen
+    gc.unfreeze()
+    adjustments.load_table()
+    elevation.invalidate()
+    elevation.load()
+    if os.path.exists(DATABASE):
+        course_catalog.load(DATABASE)
+    if os.path.exists(LOCATIONS_DATABASE):
+        spatial_index.invalidate(LOCATIONS_DATABASE)
+        spatial_index.load(LOCATIONS_DATABASE)
+        green_distances.invalidate(LOCATIONS_DATABASE)
+        green_distances.load(LOCATIONS_DATABASE)
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded shared data (%d frozen objects)", gc.get_freeze_count())
+
+
+def start_worker():
+    """Start the per-process background tasks; called in each worker after the fork."""
+    if weather_cache.REFRESH_SECONDS > 0:
+        weather_cache.start(DATABASE)
+
+
+def __getattr__(name):
+    # Built on first access so gunicorn only constructs the app it was asked for
+    global application, plugin
+    if name == 'application':
+        import app
+        preload()
+        application = app.create_app({'DATABASE': DATABASE, 'LOCATIONS_DATABASE': LOCATIONS_DATABASE, 'LOG_FILE': None})
+        return application
+    if name == 'plugin':
+        from backend import gpt_plugin_backend
+        gpt_plugin_backend.DATABASE_PATH = LOCATIONS_DATABASE
+        gpt_plugin_backend.GOLFERS_DATABASE_PATH = DATABASE
+        preload()
+        plugin = gpt_plugin_backend.app
+        return plugin
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,252 @@
+"""Columnar bulk export of the shot_tracking table.
+
+Rows are read in fixed-size chunks and transposed straight into column
+buffers, so memory stays bounded by the chunk size no matter how many shots
+are exported. Arrow IPC and Parquet need pyarrow; without it the export
+falls back to a NumPy ``.npz`` archive.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import zipfile
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, .npz works with NumPy alone
+    pa = None
+    pq = None
+
+DB_PATH = 'golfers.db'
+CHUNK_SIZE = 50_000
+FORMATS = ('arrow', 'parquet', 'npz')
+CONTENT_TYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+    'npz': 'application/octet-stream',
+}
+
+# Exported columns and their NumPy dtypes; club_name is dictionary encoded.
+# timestamp is exported as Unix epoch seconds (0 when missing or unparseable).
+COLUMNS = (
+    ('id', np.int64),
+    ('golfer_id', np.int64),
+    ('club_name', None),
+    ('distance', np.float64),
+    ('accuracy', np.float64),
+    ('timestamp', np.int64),
+)
+
+SELECT_SQL = """
+    SELECT id, golfer_id, club_name, distance, accuracy,
+           IFNULL(CAST(strftime('%s', timestamp) AS INTEGER), 0)
+    FROM shot_tracking
+"""
+
+
+def resolve_format(fmt):
+    """Pick the concrete output format, falling back to npz without pyarrow."""
+    if fmt in (None, '', 'auto'):
+        return 'arrow' if pa is not None else 'npz'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt in ('arrow', 'parquet') and pa is None:
+        raise ValueError(f"Format '{fmt}' requires pyarrow")
+    return fmt
+
+
+def _where_clause(golfer_ids=None, club_names=None, since=None, until=None):
+    clauses, params = [], []
+    if golfer_ids:
+        clauses.append(f"golfer_id IN ({', '.join('?' * len(golfer_ids))})")
+        params.extend(golfer_ids)
+    if club_names:
+        clauses.append(f"club_name IN ({', '.join('?' * len(club_names))})")
+        params.extend(club_names)
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def count_shots(conn, **filters):
+    """Count the rows an export with these filters would produce."""
+    where, params = _where_clause(**filters)
+    return conn.execute("SELECT COUNT(*) FROM shot_tracking" + where, params).fetchone()[0]
+
+
+def iter_shot_columns(conn, chunk_size=CHUNK_SIZE, **filters):
+    """Yield one tuple of raw column sequences per chunk of shot rows."""
+    where, params = _where_clause(**filters)
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples, never sqlite3.Row or dicts
+    cursor.execute(SELECT_SQL + where + " ORDER BY id", params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield tuple(zip(*rows))
+    cursor.close()
+
+
+class _ChunkSink:
+    """Write-only file object that hands buffered bytes back to a generator."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_batch(columns):
+    arrays = [pa.array(values) for values in columns]
+    return pa.RecordBatch.from_arrays(arrays, names=[name for name, _ in COLUMNS])
+
+
+def _stream_arrow(conn, fmt, chunk_size, filters):
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('golfer_id', pa.int64()),
+        ('club_name', pa.string()),
+        ('distance', pa.float64()),
+        ('accuracy', pa.float64()),
+        ('timestamp', pa.int64()),
+    ])
+    sink = _ChunkSink()
+    target = pa.PythonFile(sink, mode='w')
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(target, schema)
+    else:
+        writer = pa.ipc.new_stream(target, schema)
+    for columns in iter_shot_columns(conn, chunk_size, **filters):
+        writer.write_batch(_arrow_batch(columns).cast(schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def _stream_npz(conn, chunk_size, filters):
+    with tempfile.TemporaryDirectory(prefix='shot_export_') as tmpdir:
+        # Count and scan in one read transaction: rows written in between
+        # would not fit the buffers sized by the count.
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            total = count_shots(conn, **filters)
+            # Fill one on-disk .npy per column so memory stays bounded by the chunk.
+            buffers = {
+                name: np.lib.format.open_memmap(
+                    os.path.join(tmpdir, name + '.npy'), mode='w+',
+                    dtype=dtype or np.int32, shape=(total,),
+                )
+                for name, dtype in COLUMNS
+            }
+            categories = {}
+            offset = 0
+            for columns in iter_shot_columns(conn, chunk_size, **filters):
+                end = offset + len(columns[0])
+                for (name, dtype), values in zip(COLUMNS, columns):
+                    if dtype is None:
+                        values = [categories.setdefault(v, len(categories)) for v in values]
+                        dtype = np.int32
+                    buffers[name][offset:end] = np.fromiter(values, dtype=dtype, count=end - offset)
+                offset = end
+        finally:
+            if own_transaction:
+                conn.rollback()  # read-only; just ends the snapshot
+        for buffer in buffers.values():
+            buffer.flush()
+        del buffers
+        np.save(os.path.join(tmpdir, 'club_name_categories.npy'), np.array(list(categories), dtype=str))
+
+        sink = _ChunkSink()
+        names = [name for name, _ in COLUMNS] + ['club_name_categories']
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name in names:
+                with open(os.path.join(tmpdir, name + '.npy'), 'rb') as src, \
+                        archive.open(name + '.npy', mode='w', force_zip64=True) as dst:
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        dst.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+        yield sink.drain()
+
+
+def stream_shots(conn, fmt='auto', chunk_size=CHUNK_SIZE, **filters):
+    """Yield the encoded export as a sequence of byte strings."""
+    fmt = resolve_format(fmt)
+    if fmt == 'npz':
+        yield from _stream_npz(conn, chunk_size, filters)
+    else:
+        yield from _stream_arrow(conn, fmt, chunk_size, filters)
+
+
+def export_shots(conn, out, fmt='auto', chunk_size=CHUNK_SIZE, **filters):
+    """Write the export to a binary file object and return the bytes written."""
+    written = 0
+    for data in stream_shots(conn, fmt, chunk_size, **filters):
+        out.write(data)
+        written += len(data)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export shot_tracking rows in a columnar format.")
+    parser.add_argument('output', help="Output file path")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database path")
+    parser.add_argument('--format', default='auto', choices=('auto',) + FORMATS)
+    parser.add_argument('--golfer', dest='golfer_ids', type=int, action='append', help="Golfer id (repeatable)")
+    parser.add_argument('--club', dest='club_names', action='append', help="Club name (repeatable)")
+    parser.add_argument('--since', help="Only shots at or after this timestamp (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument('--until', help="Only shots before this timestamp")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        with open(args.output, 'wb') as out:
+            written = export_shots(
+                conn, out, args.format, args.chunk_size,
+                golfer_ids=args.golfer_ids, club_names=args.club_names,
+                since=args.since, until=args.until,
+            )
+    finally:
+        conn.close()
+    print(f"Wrote {written} bytes to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Grid index over the ``locations`` table for nearest-object lookups.
+
+Locations are bucketed into square cells of ``CELL_DEGREES`` and stored as
+NumPy arrays sorted by cell, so the whole index is a handful of contiguous
+buffers that forked workers share copy-on-write. A lookup scans rings of
+cells around the query point and stops once no unscanned cell can hold a
+closer object; queries far from every course fall back to one vectorized
+pass over all locations.
+
+Distances use the same metric as the original SQL query: squared differences
+of latitude and longitude in degrees.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CELL_DEGREES = 0.01   # ~1 km; a course spans a few cells
+MAX_RING = 8          # rings scanned before falling back to a full pass
+REFRESH_SECONDS = 30  # how often a worker checks the locations table for changes
+_COLUMNS = 36_001     # cells per latitude row: 360 / CELL_DEGREES + 1
+
+_indexes = {}
+_checked = {}
+_connections = {}
+_lock = threading.Lock()
+
+
+def _cells(lat, lon):
+    return (np.floor((np.asarray(lat) + 90.0) / CELL_DEGREES).astype(np.int64),
+            np.floor((np.asarray(lon) + 180.0) / CELL_DEGREES).astype(np.int64))
+
+
+class LocationIndex:
+    """Immutable nearest-neighbour index over named map objects."""
+
+    def __init__(self, names, courses, latitudes, longitudes, version=None):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        row, column = _cells(latitudes, longitudes)
+        keys = row * _COLUMNS + column
+        order = np.argsort(keys, kind='stable')
+
+        self.names = [names[i] for i in order.tolist()]
+        self.courses = [courses[i] for i in order.tolist()]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self.cell_keys, self.cell_starts = np.unique(keys[order], return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(order))
+        self.version = version
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    @classmethod
+    def from_db(cls, db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            version = location_version(conn)
+            rows = conn.execute("SELECT Name, Course, Latitude, Longitude FROM locations").fetchall()
+        finally:
+            conn.close()
+        names, courses, latitudes, longitudes = zip(*rows) if rows else ((), (), (), ())
+        return cls(list(names), list(courses), latitudes, longitudes, version)
+
+    def _ring(self, row, column, radius):
+        if radius == 0:
+            rows, columns = np.array([row]), np.array([column])
+        else:
+            span = np.arange(-radius, radius + 1)
+            edge = np.full(len(span) - 2, radius)
+            rows = row + np.concatenate([np.full(len(span), -radius), np.full(len(span), radius), span[1:-1], span[1:-1]])
+            columns = column + np.concatenate([span, span, -edge, edge])
+        keys = rows * _COLUMNS + columns
+        slots = np.searchsorted(self.cell_keys, keys)
+        inside = slots < len(self.cell_keys)
+        slots, keys = slots[inside], keys[inside]
+        slots = slots[self.cell_keys[slots] == keys]
+        if not len(slots):
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([np.arange(self.cell_starts[s], self.cell_ends[s]) for s in slots.tolist()])
+
+    def _closest(self, candidates, latitude, longitude):
+        distances = (self.latitudes[candidates] - latitude) ** 2 + (self.longitudes[candidates] - longitude) ** 2
+        best = int(np.argmin(distances))
+        return int(candidates[best]), float(distances[best])
+
+    def nearest(self, latitude, longitude):
+        """Return ``(name, latitude, longitude, course, distance)`` of the closest object, or None."""
+        if not len(self):
+            return None
+        row, column = (int(v) for v in _cells(latitude, longitude))
+        best = None
+        for radius in range(MAX_RING + 1):
+            candidates = self._ring(row, column, radius)
+            if len(candidates):
+                found = self._closest(candidates, latitude, longitude)
+                if best is None or found[1] < best[1]:
+                    best = found
+            # Anything outside this ring is at least radius cells away
+            if best is not None and math.sqrt(best[1]) <= radius * CELL_DEGREES:
+                break
+        else:
+            best = self._closest(np.arange(len(self)), latitude, longitude)
+        i, distance = best
+        return self._result(i, distance)
+
+    def _result(self, i, distance):
+        return self.names[i], float(self.latitudes[i]), float(self.longitudes[i]), self.courses[i], distance
+
+    def nearest_many(self, latitudes, longitudes):
+        """:meth:`nearest` for many points, one vectorized pass per occupied query cell.
+
+        Points sharing a cell are matched against the objects in the 3x3 block
+        of cells around it at once; a match no further than one cell away is
+        exact, anything else goes through the ring search.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if not len(self):
+            return [None] * len(latitudes)
+        rows, columns = _cells(latitudes, longitudes)
+        keys = rows * _COLUMNS + columns
+        results = [None] * len(latitudes)
+        for key in np.unique(keys).tolist():
+            members = np.flatnonzero(keys == key)
+            row, column = divmod(key, _COLUMNS)
+            candidates = np.concatenate([self._ring(row, column, 0), self._ring(row, column, 1)])
+            if len(candidates):
+                distances = ((self.latitudes[candidates][None, :] - latitudes[members][:, None]) ** 2
+                             + (self.longitudes[candidates][None, :] - longitudes[members][:, None]) ** 2)
+                best = distances.argmin(axis=1)
+                best_distances = distances[np.arange(len(members)), best]
+            for j, i in enumerate(members.tolist()):
+                if len(candidates) and math.sqrt(best_distances[j]) <= CELL_DEGREES:
+                    results[i] = self._result(int(candidates[best[j]]), float(best_distances[j]))
+                else:
+                    results[i] = self.nearest(float(latitudes[i]), float(longitudes[i]))
+        return results
+
+
+def _connection(db_path):
+    """This process's shared read connection for ``db_path``; callers hold ``_lock``."""
+    # Keyed by pid: a connection inherited across fork must not be reused
+    key = (os.getpid(), db_path)
+    conn = _connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        _connections[key] = conn
+    return conn
+
+
+def location_version(conn):
+    """Cheap change marker for the locations table (rows are only ever appended or replaced wholesale)."""
+    return conn.execute("SELECT COUNT(*), MAX(rowid) FROM locations").fetchone()
+
+
+def current_version(db_path):
+    """:func:`location_version` of ``db_path`` over this process's pooled connection."""
+    with _lock:
+        return location_version(_connection(db_path))
+
+
+def load(db_path):
+    """Return the index for ``db_path``, rebuilt when the locations table has changed.
+
+    Changes are looked for at most every ``REFRESH_SECONDS``; writers in this
+    process can call :func:`invalidate` to force a rebuild on the next lookup.
+    """
+    index = _indexes.get(db_path)
+    now = time.monotonic()
+    if index is not None and now - _checked.get(db_path, 0.0) >= REFRESH_SECONDS:
+        if current_version(db_path) != index.version:
+            index = None
+        _checked[db_path] = now
+    if index is None:
+        with _lock:
+            index = LocationIndex.from_db(db_path)
+            _indexes[db_path] = index
+            _checked[db_path] = now
+    return index
+
+
+def invalidate(db_path=None):
+    """Forget the index for ``db_path`` (or every index) so the next lookup rebuilds it."""
+    with _lock:
+        if db_path is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(db_path, None)
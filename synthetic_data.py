@@ -0,0 +1,237 @@
+"""Seeded generator for a production-scale synthetic CaddyGPT database.
+
+Builds golfer profiles, clubs, shot history, courses, holes and map
+locations with NumPy, and bulk-loads them with ``executemany`` in large
+transactions. The same seed and scale always produce the same database, so
+benchmark numbers from different commits are comparable.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+import migrations
+
+SCALES = {
+    'small': {'golfers': 1_000, 'shots': 100_000, 'locations': 10_000, 'courses': 200},
+    'medium': {'golfers': 10_000, 'shots': 1_000_000, 'locations': 100_000, 'courses': 2_000},
+    'production': {'golfers': 100_000, 'shots': 10_000_000, 'locations': 1_000_000, 'courses': 16_000},
+}
+BATCH_SIZE = 100_000
+
+# (club_name, carry, rollout, dispersion) for a scratch golfer; bags are scaled per golfer
+BAG = (
+    ('Driver', 250, 20, 15), ('3 Wood', 230, 15, 12), ('5 Wood', 215, 12, 11),
+    ('4 Iron', 195, 8, 10), ('5 Iron', 185, 6, 9), ('6 Iron', 175, 5, 8),
+    ('7 Iron', 163, 4, 7), ('8 Iron', 150, 4, 6), ('9 Iron', 138, 3, 6),
+    ('PW', 125, 3, 5), ('GW', 110, 2, 5), ('SW', 95, 2, 4), ('LW', 80, 1, 4),
+)
+LOCATION_TYPES = ('Tee', 'Green Front', 'Green Center', 'Green Back', 'Bunker', 'Water Hazard', 'Fairway Marker')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS golfer_profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS clubs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    golfer_id INTEGER,
+    club_name TEXT NOT NULL,
+    carry_distance REAL NOT NULL,
+    rollout_distance REAL NOT NULL,
+    dispersion_radius REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shot_tracking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    golfer_id INTEGER NOT NULL,
+    club_name TEXT NOT NULL,
+    distance REAL NOT NULL,
+    accuracy REAL NOT NULL,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    location TEXT,
+    latitude REAL,
+    longitude REAL,
+    par INTEGER,
+    yardage INTEGER
+);
+CREATE TABLE IF NOT EXISTS holes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id INTEGER NOT NULL,
+    hole_number INTEGER NOT NULL,
+    par INTEGER NOT NULL,
+    yardage INTEGER NOT NULL,
+    handicap INTEGER
+);
+CREATE TABLE IF NOT EXISTS locations (
+    Name TEXT,
+    Latitude REAL,
+    Longitude REAL,
+    Course TEXT
+);
+CREATE TABLE IF NOT EXISTS synthetic_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load(conn, sql, rows):
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+
+
+def _clubs(skill):
+    for golfer_index, factor in enumerate(skill.tolist(), start=1):
+        spread = 2.0 - factor
+        for name, carry, rollout, dispersion in BAG:
+            yield golfer_index, name, round(carry * factor, 1), round(rollout * factor, 1), round(dispersion * spread, 1)
+
+
+def _shots(rng, n_shots, skill, start_epoch=1_672_531_200):
+    club_names = [club[0] for club in BAG]
+    carries = np.array([club[1] for club in BAG], dtype=np.float64)
+    for offset in range(0, n_shots, BATCH_SIZE):
+        size = min(BATCH_SIZE, n_shots - offset)
+        golfer = rng.integers(0, len(skill), size)
+        club = rng.integers(0, len(BAG), size)
+        distance = carries[club] * skill[golfer] + rng.normal(0, 8, size)
+        accuracy = np.clip(rng.normal(0.75, 0.15, size), 0, 1)
+        seconds = start_epoch + rng.integers(0, 2 * 365 * 86400, size)
+        stamps = np.datetime_as_string(seconds.astype('datetime64[s]')).tolist()
+        yield from zip(
+            (golfer + 1).tolist(), [club_names[i] for i in club.tolist()],
+            np.round(distance, 1).tolist(), np.round(accuracy, 3).tolist(),
+            [stamp.replace('T', ' ') for stamp in stamps],
+        )
+
+
+def _courses(rng, n_courses):
+    lat = rng.uniform(25.0, 48.0, n_courses)
+    lon = rng.uniform(-123.0, -70.0, n_courses)
+    pars = rng.choice([3, 4, 4, 4, 5], size=(n_courses, 18))
+    yardages = np.where(pars == 3, rng.integers(120, 230, pars.shape),
+                        np.where(pars == 4, rng.integers(320, 470, pars.shape), rng.integers(480, 600, pars.shape)))
+    courses = [
+        (i + 1, f"Course {i + 1}", f"Region {i % 50}", float(lat[i]), float(lon[i]), int(pars[i].sum()), int(yardages[i].sum()))
+        for i in range(n_courses)
+    ]
+    holes = [
+        (i + 1, hole + 1, int(pars[i, hole]), int(yardages[i, hole]), int(handicap))
+        for i in range(n_courses)
+        for hole, handicap in enumerate(rng.permutation(18) + 1)
+    ]
+    return courses, holes, lat, lon
+
+
+def _locations(rng, n_locations, lat, lon):
+    course = rng.integers(0, len(lat), n_locations)
+    kind = rng.integers(0, len(LOCATION_TYPES), n_locations)
+    hole = rng.integers(1, 19, n_locations)
+    obj_lat = lat[course] + rng.normal(0, 0.004, n_locations)
+    obj_lon = lon[course] + rng.normal(0, 0.004, n_locations)
+    for c, k, h, la, lo in zip(course.tolist(), kind.tolist(), hole.tolist(), obj_lat.tolist(), obj_lon.tolist()):
+        yield f"Hole {h} {LOCATION_TYPES[k]}", la, lo, f"Course {c + 1}"
+
+
+def generate(db_path, golfers, shots, locations, courses, seed=0):
+    """Create ``db_path`` from scratch with the requested number of rows."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        skill = rng.uniform(0.7, 1.1, golfers)
+        _load(conn, "INSERT INTO golfer_profiles (id, name, email) VALUES (?, ?, ?)",
+              ((i, f"Golfer {i}", f"golfer{i}@example.com") for i in range(1, golfers + 1)))
+        _load(conn, """INSERT INTO clubs (golfer_id, club_name, carry_distance, rollout_distance, dispersion_radius)
+                       VALUES (?, ?, ?, ?, ?)""", _clubs(skill))
+        _load(conn, """INSERT INTO shot_tracking (golfer_id, club_name, distance, accuracy, timestamp)
+                       VALUES (?, ?, ?, ?, ?)""", _shots(rng, shots, skill))
+
+        course_rows, hole_rows, lat, lon = _courses(rng, courses)
+        _load(conn, "INSERT INTO courses (id, name, location, latitude, longitude, par, yardage) VALUES (?, ?, ?, ?, ?, ?, ?)",
+              course_rows)
+        _load(conn, "INSERT INTO holes (course_id, hole_number, par, yardage, handicap) VALUES (?, ?, ?, ?, ?)",
+              hole_rows)
+        _load(conn, "INSERT INTO locations (Name, Latitude, Longitude, Course) VALUES (?, ?, ?, ?)",
+              _locations(rng, locations, lat, lon))
+
+        meta = {'golfers': golfers, 'shots': shots, 'locations': locations, 'courses': courses, 'seed': seed}
+        conn.executemany("INSERT INTO synthetic_meta (key, value) VALUES (?, ?)",
+                         [(key, str(value)) for key, value in meta.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def read_meta(db_path):
+    """Return the generation parameters stored in ``db_path``, or None."""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT key, value FROM synthetic_meta").fetchall()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return {key: int(value) for key, value in rows}
+
+
+def ensure(db_path, seed=0, **scale):
+    """Generate ``db_path`` unless it already holds this exact scale and seed, then migrate it."""
+    wanted = dict(scale, seed=seed)
+    created = read_meta(db_path) != wanted
+    if created:
+        generate(db_path, seed=seed, **scale)
+    # Indexes are built after the bulk load, and older files pick up new migrations
+    migrations.migrate(db_path)
+    return created
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic CaddyGPT database.")
+    parser.add_argument('--db', default='benchmark.db')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--golfers', type=int)
+    parser.add_argument('--shots', type=int)
+    parser.add_argument('--locations', type=int)
+    parser.add_argument('--courses', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    start = time.perf_counter()
+    generate(args.db, seed=args.seed, **scale)
+    migrations.migrate(args.db)
+    print(f"Generated {args.db} {scale} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
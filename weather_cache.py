@@ -0,0 +1,327 @@
+"""In-process weather cache kept warm by one background refresher per host.
+
+Readings are cached per grid cell of ``CELL_DEGREES`` (about a kilometre, so
+one entry covers a course). :func:`get` answers from memory whenever the cell
+has a fresh reading, and every lookup marks its cell active.
+
+Every worker process runs a :class:`Refresher` thread (see ``server.py``),
+but only the one holding the lock file next to the database fetches from the
+feed. Each ``interval`` seconds every refresher publishes the cells its
+process served and pulls the readings the others stored in the shared
+``weather_readings`` table; the leader then refetches the active cells
+(lookups from any worker plus the positions of golfers who sent GPS fixes or
+tracked shots lately) whose reading is older than the interval, at most
+``concurrency`` at a time. Upstream load is therefore bounded by
+``concurrency`` however many workers there are. When the leader exits
+another worker takes the lock on its next tick.
+
+Without a running refresher (the dev server, plain ``gunicorn app:app``,
+tests, ``WEATHER_REFRESH_SECONDS=0``) a reading older than ``STALE_SECONDS``
+is refetched on the request path.
+
+Upstream calls go through a circuit breaker. While the feed is failing the
+cached readings act as the last-known-good store: :func:`get` returns the
+cell's previous reading (or the nearest cell's, within ``FALLBACK_CELLS``)
+marked ``stale`` with its ``age_seconds``, instead of waiting on the feed.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from circuit_breaker import CircuitBreaker
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CELL_DEGREES = 0.01
+REFRESH_SECONDS = int(os.getenv('WEATHER_REFRESH_SECONDS', 300))
+CONCURRENCY = int(os.getenv('WEATHER_REFRESH_CONCURRENCY', 4))
+ACTIVE_SECONDS = int(os.getenv('WEATHER_ACTIVE_SECONDS', 3600))
+# Older readings are flagged, and refetched inline when no refresher keeps them warm
+STALE_SECONDS = int(os.getenv('WEATHER_STALE_SECONDS', 2 * REFRESH_SECONDS or 600))
+FALLBACK_CELLS = 50            # nearest cached reading used for an unseen cell, up to ~50 km away
+
+logger = logging.getLogger(__name__)
+
+_readings = {}      # cell -> (epoch fetch time, weather dict)
+_activity = {}      # cell -> epoch time of the last lookup
+_failed = set()     # cells whose latest refresh failed; their reading is a fallback
+_store = None       # database holding the shared weather_readings table (set by start)
+_lock = threading.Lock()
+
+breaker = CircuitBreaker(
+    failure_rate=float(os.getenv('WEATHER_BREAKER_FAILURE_RATE', 0.5)),
+    min_calls=int(os.getenv('WEATHER_BREAKER_MIN_CALLS', 5)),
+    open_seconds=float(os.getenv('WEATHER_BREAKER_OPEN_SECONDS', 30)),
+)
+
+
+def cell(latitude, longitude):
+    return (round(latitude / CELL_DEGREES), round(longitude / CELL_DEGREES))
+
+
+def _centre(key):
+    return key[0] * CELL_DEGREES, key[1] * CELL_DEGREES
+
+
+def fetch(latitude, longitude):
+    import functional
+    return functional.get_weather(latitude, longitude)
+
+
+def _shared(db_path, sql, params=(), many=False):
+    """Run ``sql`` against the shared table; returns the rows, or [] when the table does not exist yet."""
+    conn = sqlite3.connect(db_path, timeout=5)
+    try:
+        cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+        rows = cursor.fetchall()
+        conn.commit()
+        return rows
+    except sqlite3.OperationalError as e:
+        logger.debug("Shared weather store unavailable: %s", e)
+        return []
+    finally:
+        conn.close()
+
+
+def refresh(key):
+    """Fetch the reading for ``key`` and cache it; failed fetches keep the previous reading."""
+    if not breaker.allow():
+        weather = {"error": "Weather service unavailable (circuit open)"}
+    else:
+        weather = fetch(*_centre(key))
+        breaker.record("error" not in weather)
+    fetched_at = time.time()
+    with _lock:
+        if "error" in weather:
+            _failed.add(key)
+        else:
+            _readings[key] = (fetched_at, weather)
+            _failed.discard(key)
+    if _store is not None and "error" not in weather:
+        _shared(_store, """
+            INSERT INTO weather_readings (cell_lat, cell_lon, fetched_at, weather) VALUES (?, ?, ?, ?)
+            ON CONFLICT (cell_lat, cell_lon) DO UPDATE SET fetched_at = excluded.fetched_at, weather = excluded.weather
+        """, (key[0], key[1], fetched_at, json.dumps(weather)))
+    return weather
+
+
+def pull(db_path, since=0.0):
+    """Copy shared readings fetched after ``since`` that are newer than ours; returns how many were taken."""
+    rows = _shared(db_path, """
+        SELECT cell_lat, cell_lon, fetched_at, weather FROM weather_readings
+        WHERE fetched_at > ? AND weather IS NOT NULL
+    """, (since,))
+    taken = 0
+    with _lock:
+        for cell_lat, cell_lon, fetched_at, weather in rows:
+            key = (cell_lat, cell_lon)
+            if key not in _readings or _readings[key][0] < fetched_at:
+                _readings[key] = (fetched_at, json.loads(weather))
+                _failed.discard(key)
+                taken += 1
+    return taken
+
+
+def publish(db_path, since=0.0):
+    """Record this process's lookups since ``since`` in the shared table, so the leader refreshes them."""
+    with _lock:
+        seen = [(key[0], key[1], at) for key, at in _activity.items() if at >= since]
+    if seen:
+        _shared(db_path, """
+            INSERT INTO weather_readings (cell_lat, cell_lon, requested_at) VALUES (?, ?, ?)
+            ON CONFLICT (cell_lat, cell_lon) DO UPDATE
+            SET requested_at = MAX(COALESCE(requested_at, 0), excluded.requested_at)
+        """, seen, many=True)
+    return len(seen)
+
+
+def _stale(cached):
+    return dict(cached[1], stale=True, age_seconds=round(time.time() - cached[0]))
+
+
+def _nearest(key):
+    """Closest cached reading within ``FALLBACK_CELLS`` of ``key``, or None."""
+    with _lock:
+        candidates = [(max(abs(other[0] - key[0]), abs(other[1] - key[1])), cached)
+                      for other, cached in _readings.items()]
+    candidates = [candidate for candidate in candidates if candidate[0] <= FALLBACK_CELLS]
+    return min(candidates, key=lambda candidate: candidate[0])[1] if candidates else None
+
+
+def refreshing():
+    """Whether a refresher thread is running in this process."""
+    return _refresher is not None and _refresher.is_alive()
+
+
+def get(latitude, longitude):
+    """Weather for a position, from memory while the cell's reading is fresh.
+
+    Without a running refresher a reading older than ``STALE_SECONDS`` is
+    refetched first. Readings kept because the latest refresh failed, or older
+    than ``STALE_SECONDS``, are flagged ``stale``. An unseen cell is taken from
+    the shared table or fetched, falling back to the nearest cached reading.
+    """
+    key = cell(latitude, longitude)
+    with _lock:
+        _activity[key] = time.time()
+        cached = _readings.get(key)
+        failed = key in _failed
+    if cached is None and _store is not None:
+        # Another worker may have fetched this cell already
+        for fetched_at, weather in _shared(_store, """
+            SELECT fetched_at, weather FROM weather_readings WHERE cell_lat = ? AND cell_lon = ? AND weather IS NOT NULL
+        """, key):
+            cached = (fetched_at, json.loads(weather))
+            with _lock:
+                _readings[key] = cached
+    if cached is not None and time.time() - cached[0] > STALE_SECONDS and not refreshing():
+        weather = refresh(key)
+        if "error" not in weather:
+            return weather
+        failed = True
+    if cached is not None:
+        return _stale(cached) if failed or time.time() - cached[0] > STALE_SECONDS else cached[1]
+    weather = refresh(key)
+    if "error" in weather:
+        nearby = _nearest(key)
+        if nearby is not None:
+            return _stale(nearby)
+    return weather
+
+
+def age(latitude, longitude):
+    """Seconds since the cell's reading was fetched, or None if it has none."""
+    cached = _readings.get(cell(latitude, longitude))
+    return None if cached is None else time.time() - cached[0]
+
+
+def clear():
+    with _lock:
+        _readings.clear()
+        _activity.clear()
+        _failed.clear()
+
+
+def recent_positions(db_path, since_seconds=ACTIVE_SECONDS):
+    """Latest positions of golfers with GPS fixes or tracked shots in the last ``since_seconds``."""
+    now = datetime.now(timezone.utc)
+    since_ms = int((now.timestamp() - since_seconds) * 1000)
+    since_text = (now - timedelta(seconds=since_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("""
+            SELECT latitude, longitude FROM golfer_positions
+            WHERE recorded_at >= ?
+               OR golfer_id IN (SELECT DISTINCT golfer_id FROM shot_tracking WHERE timestamp >= ?)
+        """, (since_ms, since_text)).fetchall()
+    except sqlite3.OperationalError:
+        # Database without the GPS tables yet
+        return []
+    finally:
+        conn.close()
+
+
+def active_cells(db_path=None, since_seconds=ACTIVE_SECONDS):
+    """Cells looked up (by any worker) or occupied by golfers within ``since_seconds``; forgets older lookups."""
+    cutoff = time.time() - since_seconds
+    with _lock:
+        for key in [key for key, seen in _activity.items() if seen < cutoff]:
+            del _activity[key]
+        cells = set(_activity)
+    if db_path is not None:
+        cells.update(cell(latitude, longitude) for latitude, longitude in recent_positions(db_path, since_seconds))
+        cells.update(_shared(db_path, "SELECT cell_lat, cell_lon FROM weather_readings WHERE requested_at >= ?",
+                             (cutoff,)))
+    return cells
+
+
+class Refresher(threading.Thread):
+    """Daemon thread sharing lookups and readings every ``interval`` seconds; fetches only while it leads."""
+
+    def __init__(self, db_path=None, interval=REFRESH_SECONDS, concurrency=CONCURRENCY):
+        super().__init__(name='weather-refresher', daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.concurrency = concurrency
+        self.stopped = threading.Event()
+        self._lock_file = None
+        self._synced = 0.0
+
+    def leader(self):
+        """Take (or keep) the host-wide refresh lock; True when this process should fetch."""
+        if self.db_path is None or fcntl is None:
+            return True
+        if self._lock_file is None:
+            lock_file = open(f"{self.db_path}.weather.lock", 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+        return True
+
+    def sync(self):
+        """Publish this process's lookups and take newer readings from the shared table."""
+        if self.db_path is None:
+            return
+        since, self._synced = self._synced, time.time()
+        publish(self.db_path, since)
+        pull(self.db_path, since - self.interval)
+
+    def refresh_due(self):
+        """Refresh every active cell whose reading is older than the interval; returns how many were fetched."""
+        now = time.time()
+        due = [key for key in active_cells(self.db_path)
+               if key not in _readings or now - _readings[key][0] >= self.interval]
+        if due:
+            with ThreadPoolExecutor(min(self.concurrency, len(due)), thread_name_prefix='weather') as pool:
+                list(pool.map(refresh, due))
+        return len(due)
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.sync()
+                if self.leader():
+                    refreshed = self.refresh_due()
+                    logger.debug("Refreshed weather for %d active cells", refreshed)
+            except Exception:
+                logger.exception("Weather refresh failed")
+            self.stopped.wait(self.interval)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stop(self):
+        self.stopped.set()
+
+
+_refresher = None
+
+
+def start(db_path=None, interval=REFRESH_SECONDS, concurrency=CONCURRENCY):
+    """Start this process's refresher once, sharing readings through ``db_path``; later calls return the running one."""
+    global _refresher, _store
+    with _lock:
+        _store = db_path
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = Refresher(db_path, interval, concurrency)
+            _refresher.start()
+        return _refresher
+
+
+def stop():
+    global _refresher
+    with _lock:
+        if _refresher is not None:
+            _refresher.stop()
+            _refresher = None